@@ -16,6 +16,10 @@ from app.gallery.models.gallery_model import Gallery, Photo, Branding
 from app.leads.models.lead_model import Lead, LeadStage
 from app.brand.watermark import BrandSettings
 from app.gallery.models.favorite_model import Favorite
+from app.gallery.models.rendition_model import PhotoRendition
+from app.gallery.models.zip_build_model import ZipBuild
+from app.gallery.models.rerender_job_model import RerenderJob
+from app.gallery.models.rendition_usage_model import RenditionUsage
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
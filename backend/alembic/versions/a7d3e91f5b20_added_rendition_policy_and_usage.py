@@ -0,0 +1,41 @@
+"""added rendition policy and usage
+
+Revision ID: a7d3e91f5b20
+Revises: f2b86d04c1e7
+Create Date: 2026-10-19 17:03:12.118470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e91f5b20'
+down_revision: Union[str, Sequence[str], None] = 'f2b86d04c1e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('galleries', sa.Column('rendition_policy', sa.JSON(), nullable=True))
+    op.create_table('rendition_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('rendition', sa.String(length=20), nullable=False),
+    sa.Column('requests', sa.BigInteger(), nullable=False),
+    sa.Column('generated', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'rendition', name='uq_rendition_usage')
+    )
+    op.create_index(op.f('ix_rendition_usage_id'), 'rendition_usage', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rendition_usage_id'), table_name='rendition_usage')
+    op.drop_table('rendition_usage')
+    with op.batch_alter_table('galleries') as batch_op:
+        batch_op.drop_column('rendition_policy')
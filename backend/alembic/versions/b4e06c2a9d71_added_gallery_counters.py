@@ -0,0 +1,53 @@
+"""added gallery counters
+
+Revision ID: b4e06c2a9d71
+Revises: a7d3e91f5b20
+Create Date: 2026-10-19 18:22:40.517309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e06c2a9d71'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e91f5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('galleries', sa.Column('photo_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('galleries', sa.Column('total_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('galleries', sa.Column('favorites_total', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('galleries', sa.Column('cover_photo_id', sa.Integer(), nullable=True))
+    op.add_column('galleries', sa.Column('last_activity_at', sa.TIMESTAMP(timezone=True),
+                                         server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True))
+    # backfill; app.gallery.services.gallery_stats_service.reconcile computes the same
+    op.execute("""
+        UPDATE galleries SET
+            photo_count = (SELECT count(*) FROM photos p WHERE p.gallery_id = galleries.id),
+            total_bytes = (
+                SELECT coalesce(sum(r.bytes), 0) FROM photo_renditions r JOIN photos p ON p.id = r.photo_id
+                WHERE p.gallery_id = galleries.id AND r.kind = 'original'
+            ),
+            favorites_total = (SELECT count(*) FROM favorites f WHERE f.gallery_id = galleries.id),
+            cover_photo_id = (
+                SELECT p.id FROM photos p WHERE p.gallery_id = galleries.id
+                ORDER BY CASE WHEN p.is_cover THEN 0 ELSE 1 END, p.uploaded_at, p.id LIMIT 1
+            ),
+            last_activity_at = coalesce(updated_at, created_at)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('galleries') as batch_op:
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('cover_photo_id')
+        batch_op.drop_column('favorites_total')
+        batch_op.drop_column('total_bytes')
+        batch_op.drop_column('photo_count')
@@ -0,0 +1,45 @@
+"""added photo renditions
+
+Revision ID: b7c41e2d9a10
+Revises: dce5d9801572
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c41e2d9a10'
+down_revision: Union[str, Sequence[str], None] = 'dce5d9801572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('photo_renditions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('photo_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=1024), nullable=False),
+    sa.Column('bytes', sa.BigInteger(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('settings_hash', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['photo_id'], ['photos.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('photo_id', 'kind', 'size', 'format', name='uq_photo_rendition')
+    )
+    op.create_index(op.f('ix_photo_renditions_id'), 'photo_renditions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_photo_renditions_id'), table_name='photo_renditions')
+    op.drop_table('photo_renditions')
@@ -0,0 +1,28 @@
+"""added rendition crc32
+
+Revision ID: c3e8a1f0b6d2
+Revises: b7c41e2d9a10
+Create Date: 2026-10-19 11:40:02.511937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f0b6d2'
+down_revision: Union[str, Sequence[str], None] = 'b7c41e2d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('photo_renditions', sa.Column('crc32', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('photo_renditions', 'crc32')
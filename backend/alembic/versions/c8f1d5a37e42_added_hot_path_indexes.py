@@ -0,0 +1,55 @@
+"""added hot path indexes
+
+Revision ID: c8f1d5a37e42
+Revises: b4e06c2a9d71
+Create Date: 2026-10-19 19:05:51.204716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f1d5a37e42'
+down_revision: Union[str, Sequence[str], None] = 'b4e06c2a9d71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns); app/services/query_plans.py checks the queries they serve
+INDEXES = [
+    ('ix_photos_gallery_order', 'photos', ['gallery_id', 'order_index', 'id']),
+    ('ix_favorites_gallery_selector', 'favorites', ['gallery_id', 'selector']),
+    ('ix_galleries_owner_created', 'galleries', ['owner_id', 'created_at', 'id']),
+    ('ix_galleries_status_created', 'galleries', ['status', 'created_at']),
+    ('ix_whatsapp_messages_from_created', 'whatsapp_messages', ['from_number', 'created_at']),
+    ('ix_whatsapp_messages_direction_from', 'whatsapp_messages', ['direction', 'from_number', 'created_at']),
+    ('ix_leads_stage', 'leads', ['stage']),
+]
+
+
+def _existing():
+    # whatsapp_messages is created by init_db, not by a migration
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = _existing()
+    # on Postgres build them without locking out writes; that can't run in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if table in tables:
+                op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                                postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tables = _existing()
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            if table in tables:
+                op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,49 @@
+"""added zip builds
+
+Revision ID: d91f4c7a2e35
+Revises: c3e8a1f0b6d2
+Create Date: 2026-10-19 14:05:47.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91f4c7a2e35'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a1f0b6d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('zip_builds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('gallery_id', sa.Integer(), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=False),
+    sa.Column('digest', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=1024), nullable=True),
+    sa.Column('entries_total', sa.Integer(), nullable=True),
+    sa.Column('entries_done', sa.Integer(), nullable=False),
+    sa.Column('bytes_total', sa.BigInteger(), nullable=True),
+    sa.Column('bytes_done', sa.BigInteger(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('notify_email', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('finished_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['gallery_id'], ['galleries.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('gallery_id', 'size', 'digest', name='uq_zip_build')
+    )
+    op.create_index(op.f('ix_zip_builds_id'), 'zip_builds', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_zip_builds_id'), table_name='zip_builds')
+    op.drop_table('zip_builds')
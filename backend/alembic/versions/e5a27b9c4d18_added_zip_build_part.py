@@ -0,0 +1,34 @@
+"""added zip build part
+
+Revision ID: e5a27b9c4d18
+Revises: d91f4c7a2e35
+Create Date: 2026-10-19 16:22:10.734405
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a27b9c4d18'
+down_revision: Union[str, Sequence[str], None] = 'd91f4c7a2e35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('zip_builds') as batch_op:
+        batch_op.add_column(sa.Column('part', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.drop_constraint('uq_zip_build', type_='unique')
+        batch_op.create_unique_constraint('uq_zip_build', ['gallery_id', 'size', 'part', 'digest'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('zip_builds') as batch_op:
+        batch_op.drop_constraint('uq_zip_build', type_='unique')
+        batch_op.create_unique_constraint('uq_zip_build', ['gallery_id', 'size', 'digest'])
+        batch_op.drop_column('part')
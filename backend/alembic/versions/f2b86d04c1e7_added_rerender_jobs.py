@@ -0,0 +1,44 @@
+"""added rerender jobs
+
+Revision ID: f2b86d04c1e7
+Revises: e5a27b9c4d18
+Create Date: 2026-10-19 16:22:31.540918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b86d04c1e7'
+down_revision: Union[str, Sequence[str], None] = 'e5a27b9c4d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rerender_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('settings_hash', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('photos_total', sa.Integer(), nullable=False),
+    sa.Column('photos_done', sa.Integer(), nullable=False),
+    sa.Column('photos_failed', sa.Integer(), nullable=False),
+    sa.Column('renditions_done', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('finished_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('settings_hash')
+    )
+    op.create_index(op.f('ix_rerender_jobs_id'), 'rerender_jobs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rerender_jobs_id'), table_name='rerender_jobs')
+    op.drop_table('rerender_jobs')
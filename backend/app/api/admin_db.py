@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Header, HTTPException
+from app.database import pool_status
+import os
+
+router = APIRouter()
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+@router.get("/admin/db/pool")
+def db_pool_stats(x_api_key: str = Header(None)):
+    """
+    Connection pool of the worker that answers: connections in use,
+    overflow and checkout wait times. Each worker has its own pool, so
+    poll repeatedly (the `pid` tells them apart) to size DB_POOL_SIZE.
+    """
+    if not ADMIN_API_KEY or x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return pool_status()
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.gallery.services import gallery_stats_service
+import os
+
+router = APIRouter()
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+@router.post("/admin/galleries/reconcile-stats")
+def reconcile_gallery_stats(x_api_key: str = Header(None), db: Session = Depends(get_db)):
+    """Recount every gallery's stored counters and repair the ones that drifted."""
+    if not ADMIN_API_KEY or x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return gallery_stats_service.reconcile(db)
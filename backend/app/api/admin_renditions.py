@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.gallery.services import rendition_policy_service, rendition_usage_service
+from app.services import rerender_renditions
+import os
+
+router = APIRouter()
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+def _check_key(x_api_key):
+    if not ADMIN_API_KEY or x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+
+@router.post("/admin/renditions/rerender", status_code=202)
+def start_rerender(x_api_key: str = Header(None), db: Session = Depends(get_db)):
+    """Re-render renditions made with other brand settings (resumes an interrupted run)."""
+    _check_key(x_api_key)
+    job = rerender_renditions.start_rerender(db)
+    return rerender_renditions.job_status(db, job)
+
+
+@router.get("/admin/renditions/rerender")
+def rerender_status(x_api_key: str = Header(None), db: Session = Depends(get_db)):
+    _check_key(x_api_key)
+    return rerender_renditions.job_status(db, rerender_renditions.current_job(db))
+
+
+@router.post("/admin/renditions/rerender/pause")
+def pause_rerender(x_api_key: str = Header(None), db: Session = Depends(get_db)):
+    _check_key(x_api_key)
+    return rerender_renditions.job_status(db, rerender_renditions.pause_rerender(db))
+
+
+@router.get("/admin/renditions/usage")
+def rendition_usage(
+    days: int = Query(30, ge=1, le=366),
+    x_api_key: str = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Requests and renders per rendition next to the default policy, to tune RENDITION_POLICY."""
+    _check_key(x_api_key)
+    stats = rendition_usage_service.usage_stats(db, days)
+    policy = rendition_policy_service.default_policy()
+    for name in list(policy) + ["preview", "thumb"]:
+        stats.setdefault(name, {"requests": 0, "generated": 0})
+    for name, s in stats.items():
+        s["policy"] = policy.get(name, "eager" if name in ("preview", "thumb") else None)
+    return {"days": days, "renditions": stats}
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Header, HTTPException
+from app.storage import storage
+import os
+
+router = APIRouter()
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+
+@router.get("/admin/storage/cache")
+def storage_cache_stats(x_api_key: str = Header(None)):
+    if not ADMIN_API_KEY or x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    stats = {"backend": storage.backend_name()}
+    if hasattr(storage, "cache_stats"):
+        stats["disk_cache"] = storage.cache_stats()
+    if hasattr(storage, "metadata_stats"):
+        stats["metadata_cache"] = storage.metadata_stats()
+    if hasattr(storage, "url_cache"):
+        stats["signed_url_cache"] = storage.url_cache.stats()
+    return stats
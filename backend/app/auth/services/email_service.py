@@ -1,5 +1,6 @@
 # app/services/email_service.py
 import resend # type: ignore
+import html
 from os import getenv
 
 resend.api_key = getenv("RESEND_API_KEY")
@@ -21,4 +22,25 @@ def send_confirmation_email(user_email: str, username: str, full_name: str | Non
         })
         print(f"Confirmation email sent to {user_email}.")
     except Exception as e:
-        print(f"Failed to send email to {user_email}: {e}")
\ No newline at end of file
+        print(f"Failed to send email to {user_email}: {e}")
+
+
+def send_zip_ready_email(user_email: str, gallery_title: str, url: str):
+    """
+    Sends the download link of a gallery ZIP that finished building.
+    Args:
+        user_email: The recipient's email address.
+        gallery_title: Title of the gallery.
+        url: Signed download URL.
+    """
+    title = html.escape(gallery_title)
+    try:
+        resend.Emails.send({
+            "from": SENDER_EMAIL,
+            "to": [user_email],
+            "subject": f"Your download of {gallery_title} is ready",
+            "html": f"<p>Your photos from <b>{title}</b> are ready.</p><p><a href=\"{html.escape(url)}\">Download ZIP</a></p>"
+        })
+        print(f"ZIP ready email sent to {user_email}.")
+    except Exception as e:
+        print(f"Failed to send email to {user_email}: {e}")
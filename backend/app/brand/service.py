@@ -1,6 +1,10 @@
 # app/brand/service.py
 from sqlalchemy.orm import Session #type: ignore
 from .watermark import BrandSettings
+import hashlib, json
+
+# fields that change how a rendition looks
+WATERMARK_FIELDS = ("wm_enabled", "wm_use_logo", "logo_path", "wm_text", "wm_opacity", "wm_position", "wm_scale")
 
 def get_settings(db: Session) -> BrandSettings:
     s = db.query(BrandSettings).first()
@@ -15,3 +19,18 @@ def update_settings(db: Session, data: dict) -> BrandSettings:
         if hasattr(s, k): setattr(s, k, v)
     db.add(s); db.commit(); db.refresh(s)
     return s
+
+
+def settings_hash(s: BrandSettings) -> str:
+    """
+    Short stable digest of the watermark settings; stored with each rendition
+    (and part of its storage key) so stale ones can be found after the brand
+    changes. With the watermark off the other fields don't affect the output,
+    so they don't affect the digest either.
+    """
+    if not getattr(s, "wm_enabled", False):
+        data = {"wm_enabled": False}
+    else:
+        data = {f: getattr(s, f, None) for f in WATERMARK_FIELDS}
+    raw = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
@@ -1,6 +1,7 @@
 # backend/app/config.py
 from pathlib import Path
 import os
+import tempfile
 
 origins = os.getenv("ORIGINS", "")
 
@@ -19,9 +20,40 @@ GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "")
 GCS_SIGNED_URL_EXP_SECONDS = int(os.getenv("GCS_SIGNED_URL_EXP_SECONDS", "3600"))
 GCS_CREDENTIALS_JSON = os.getenv("GCS_CREDENTIALS_JSON", "")
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
+# signed URL expiries are snapped to this grid so repeat requests reuse one URL
+GCS_SIGNED_URL_BUCKET_SECONDS = int(os.getenv("GCS_SIGNED_URL_BUCKET_SECONDS", "900"))
+GCS_SIGNED_URL_CACHE_SIZE = int(os.getenv("GCS_SIGNED_URL_CACHE_SIZE", "20000"))
 
 MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", "./media"))
 
+# --- Database connection pool (per worker process) ---
+# Each worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, plus
+# DB_LOCK_POOL_SIZE + DB_LOCK_MAX_OVERFLOW on Postgres for the advisory locks
+# renders hold (single_flight.process_lock, sized further down), so workers
+# x all of that must stay under the server's max_connections. Connections
+# are checked with a ping before use and replaced after DB_POOL_RECYCLE
+# seconds, before Cloud SQL / proxies drop idle ones.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# SQLite: write-ahead log so readers don't block the writer, and how long a
+# connection waits for a lock before "database is locked"
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# --- Local disk read cache in front of remote storage (gcs/spaces) ---
+# Empty STORAGE_CACHE_DIR disables the cache.
+STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", "")
+STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# --- exists()/stat() TTL cache for remote storage (gcs/spaces) ---
+# STORAGE_META_TTL_SECONDS=0 disables it.
+STORAGE_META_TTL_SECONDS = float(os.getenv("STORAGE_META_TTL_SECONDS", "300"))
+STORAGE_META_NEGATIVE_TTL_SECONDS = float(os.getenv("STORAGE_META_NEGATIVE_TTL_SECONDS", "30"))
+STORAGE_META_MAX_ENTRIES = int(os.getenv("STORAGE_META_MAX_ENTRIES", "100000"))
+
 # --- DigitalOcean Spaces (S3-compatible) ---
 SPACES_BUCKET = os.getenv("SPACES_BUCKET", "")
 SPACES_REGION = os.getenv("SPACES_REGION", "")
@@ -43,6 +75,73 @@ DOWNLOAD_SIZES = {
     "web": 1024,
 }
 
+# ZIP downloads: entries fetched ahead in parallel, bounded by a byte budget
+ZIP_PREFETCH_CONCURRENCY = int(os.getenv("ZIP_PREFETCH_CONCURRENCY", "8"))
+ZIP_PREFETCH_BUFFER_BYTES = int(os.getenv("ZIP_PREFETCH_BUFFER_BYTES", str(64 * 1024 * 1024)))
+# Part size for streaming cached ZIPs into storage (S3 multipart / GCS resumable)
+ZIP_UPLOAD_PART_BYTES = int(os.getenv("ZIP_UPLOAD_PART_BYTES", str(16 * 1024 * 1024)))
+# Single-flight generation: lock files (when the DB is not Postgres) and how
+# long a request waits for another worker generating the same artifact
+LOCK_DIR = os.getenv("LOCK_DIR", os.path.join(tempfile.gettempdir(), "alrs-locks"))
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120"))
+# Cap on the photo bytes in one part of a multi-part gallery download
+ZIP_PART_MAX_BYTES = int(os.getenv("ZIP_PART_MAX_BYTES", str(2 * 1024 ** 3)))
+# Background ZIP builds: worker threads, sizes pre-built when a public gallery
+# changes (comma separated, empty disables), and the debounce before they start
+ZIP_BUILD_WORKERS = int(os.getenv("ZIP_BUILD_WORKERS", "2"))
+ZIP_PREBUILD_SIZES = [s.strip() for s in os.getenv("ZIP_PREBUILD_SIZES", "original").split(",") if s.strip()]
+ZIP_PREBUILD_DELAY_SECONDS = int(os.getenv("ZIP_PREBUILD_DELAY_SECONDS", "120"))
+# a queued/building row not updated for this long is assumed dead and requeued
+ZIP_BUILD_STALE_SECONDS = int(os.getenv("ZIP_BUILD_STALE_SECONDS", "600"))
+# lifetime of the link mailed when a requested ZIP is ready
+ZIP_READY_LINK_EXPIRES_SECONDS = int(os.getenv("ZIP_READY_LINK_EXPIRES_SECONDS", str(3 * 24 * 3600)))
+# Re-rendering after a brand watermark change: photos rendered in parallel,
+# and a cap on photos started per second (0 = no cap) to spare live traffic
+RERENDER_WORKERS = int(os.getenv("RERENDER_WORKERS", "2"))
+RERENDER_MAX_PHOTOS_PER_SECOND = float(os.getenv("RERENDER_MAX_PHOTOS_PER_SECOND", "2"))
+# Postgres advisory-lock pool (see DB_POOL_SIZE): DB_LOCK_POOL_SIZE connections
+# stay open, the overflow is opened on demand. Its default covers what the
+# background work can hold at once: every ZIP build's own lock plus one per
+# render thread, the re-render job lock plus its workers, and
+# DB_LOCK_REQUEST_RENDERS renders started by requests.
+DB_LOCK_POOL_SIZE = int(os.getenv("DB_LOCK_POOL_SIZE", "2"))
+DB_LOCK_REQUEST_RENDERS = int(os.getenv("DB_LOCK_REQUEST_RENDERS", "8"))
+DB_LOCK_MAX_OVERFLOW = int(os.getenv("DB_LOCK_MAX_OVERFLOW") or (
+    ZIP_BUILD_WORKERS * (1 + ZIP_PREFETCH_CONCURRENCY) + 1 + RERENDER_WORKERS + DB_LOCK_REQUEST_RENDERS
+))
+# Default rendition policy per download size ("size=mode,..."): eager renders
+# at upload, lazy on first request, prewarm in the background once a public
+# gallery stops changing. Galleries may override single sizes.
+RENDITION_POLICY = {
+    k.strip(): v.strip()
+    for k, v in (p.split("=", 1) for p in os.getenv("RENDITION_POLICY", "").split(",") if "=" in p)
+}
+RENDITION_PREWARM_DELAY_SECONDS = int(os.getenv("RENDITION_PREWARM_DELAY_SECONDS", "120"))
+# rendition usage counters are written to the DB at most this often
+RENDITION_USAGE_FLUSH_SECONDS = int(os.getenv("RENDITION_USAGE_FLUSH_SECONDS", "60"))
+# On-the-fly resizes (/api/img): requested widths snap up to this ladder so
+# only a few variants per photo are ever stored; output formats allowed
+IMG_WIDTHS = sorted(int(w) for w in os.getenv("IMG_WIDTHS", "320,640,960,1280,1920,2560").split(",") if w.strip())
+IMG_FORMATS = [f.strip() for f in os.getenv("IMG_FORMATS", "jpeg,webp").split(",") if f.strip()]
+IMG_CACHE_MAX_AGE = int(os.getenv("IMG_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+# Sprite sheets of gallery thumbs (columns x rows tiles of SPRITE_TILE px)
+# and printable contact sheets; rebuilt this long after a gallery changes
+SPRITE_COLUMNS = int(os.getenv("SPRITE_COLUMNS", "10"))
+SPRITE_ROWS = int(os.getenv("SPRITE_ROWS", "10"))
+SPRITE_TILE = int(os.getenv("SPRITE_TILE", "160"))
+SPRITE_FORMAT = os.getenv("SPRITE_FORMAT", "webp")
+CONTACT_SHEET_COLUMNS = int(os.getenv("CONTACT_SHEET_COLUMNS", "5"))
+CONTACT_SHEET_ROWS = int(os.getenv("CONTACT_SHEET_ROWS", "6"))
+CONTACT_SHEET_TILE = int(os.getenv("CONTACT_SHEET_TILE", "320"))
+SPRITE_BUILD_DELAY_SECONDS = int(os.getenv("SPRITE_BUILD_DELAY_SECONDS", "30"))
+# Static manifests of public galleries ({gallery_id}/manifest.json in the
+# bucket): public URL the bucket/CDN serves keys from, the debounce
+# before a changed gallery is republished, and how long a superseded
+# manifest/{version}.json stays readable for clients that still hold it
+PUBLIC_MEDIA_BASE_URL = os.getenv("PUBLIC_MEDIA_BASE_URL") or None
+GALLERY_MANIFEST_DELAY_SECONDS = int(os.getenv("GALLERY_MANIFEST_DELAY_SECONDS", "30"))
+GALLERY_MANIFEST_RETAIN_SECONDS = int(os.getenv("GALLERY_MANIFEST_RETAIN_SECONDS", "86400"))
+
 # Watermark application toggles
 WM_APPLY_PREVIEWS = True
 WM_APPLY_THUMBS = True
@@ -1,17 +1,122 @@
-from sqlalchemy import create_engine #type: ignore
+from sqlalchemy import create_engine, event #type: ignore
+from sqlalchemy.exc import TimeoutError as PoolTimeout #type: ignore
 from sqlalchemy.ext.declarative import declarative_base #type: ignore
 from sqlalchemy.orm import sessionmaker #type: ignore
+from sqlalchemy.pool import QueuePool #type: ignore
 from os import getenv
 from dotenv import load_dotenv #type: ignore
+import os, threading, time
 load_dotenv()
+from app import config
 
 SQLALCHEMY_DATABASE_URL = getenv("SQLALCHEMY_DATABASE_URL")
 
+
+class PoolStats:
+    """How long checkouts waited for a connection in this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / n, 6) if (n := self.checkouts + self.timeouts) else 0.0,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    # _do_get is where a checkout blocks when every connection is in use
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            conn = super()._do_get()
+        except PoolTimeout:
+            pool_stats.record(time.monotonic() - start, timed_out=True)
+            raise
+        pool_stats.record(time.monotonic() - start)
+        return conn
+
+
+_pool_args = dict(
+    poolclass=TimedQueuePool,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+)
+
 if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    in_memory = ":memory:" in SQLALCHEMY_DATABASE_URL or SQLALCHEMY_DATABASE_URL.rstrip("/") == "sqlite:"
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+                           **({} if in_memory else _pool_args))
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA busy_timeout = {config.SQLITE_BUSY_TIMEOUT_MS}")
+        if config.SQLITE_WAL and not in_memory:
+            cur.execute("PRAGMA journal_mode = WAL")
+        cur.close()
+
+    lock_engine = None
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)     
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        **_pool_args,
+    )
+    # Advisory locks (single_flight.process_lock) are held on a connection
+    # for as long as a render runs; they get a small pool of their own so
+    # renders never take connections away from requests.
+    lock_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=config.DB_LOCK_POOL_SIZE,
+        max_overflow=config.DB_LOCK_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def pool_status() -> dict:
+    """Connection pool of this worker process: configured size, current use and checkout waits."""
+    pool = engine.pool
+    out = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # negative while fewer than `size` connections have been opened
+            "overflow": pool.overflow(),
+        })
+    out.update(pool_stats.snapshot())
+    if lock_engine is not None:
+        out["lock_pool"] = {"size": lock_engine.pool.size(), "checked_out": lock_engine.pool.checkedout()}
+    return out
 
 Base = declarative_base()
 
@@ -26,6 +131,10 @@ def get_db():
 def init_db():
     import app.auth.models
     import app.gallery.models.gallery_model
+    import app.gallery.models.rendition_model
+    import app.gallery.models.zip_build_model
+    import app.gallery.models.rerender_job_model
+    import app.gallery.models.rendition_usage_model
     import app.whatsapp.models
     import app.leads.models.lead_model
     Base.metadata.create_all(bind=engine)
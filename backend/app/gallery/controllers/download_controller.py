@@ -0,0 +1,250 @@
+# app/gallery/controllers/download_controller.py
+import re
+from typing import Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request #type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse #type: ignore
+from sqlalchemy.orm import Session #type: ignore
+from app import config
+from app.database import get_db, SessionLocal
+from app.rate_limiter import limiter
+from app.auth.services.dependencies import get_optional_current_user
+from app.gallery.utils.download import check_gallery_access
+from app.gallery.services import zip_build_service
+from app.gallery.schemas.gallery_schema import DownloadSelectionRequest, PrepareDownloadRequest
+from app.gallery.services import favorite_service
+from app.gallery.services.rendition_usage_service import record_usage
+from app.gallery.utils.selector import get_selector_for_request
+from app.gallery.services.gallery_download_service import (
+    backfill_zip_checksums, part_entries, split_entries, zip_entries, zip_filename,
+)
+from app.gallery.utils.zip_layout import iter_plan, plan_zip
+from app.gallery.utils.zip_stream import stream_zip
+
+router = APIRouter(prefix="/api/galleries", tags=["Download"])
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range` header into inclusive (start, end).
+    Returns None for no/unsupported ranges (the whole body is sent);
+    raises 416 if the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None  # multi-range or malformed: ignored, as RFC 9110 allows
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else total - 1
+    else:
+        # suffix range: last N bytes
+        start, end = max(0, total - int(m.group(2))), total - 1
+    if start >= total or end < start:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{total}"})
+    return start, min(end, total - 1)
+
+
+def _backfill(entries) -> None:
+    db = SessionLocal()
+    try:
+        backfill_zip_checksums(db, entries)
+    finally:
+        db.close()
+
+
+def _zip_response(request: Request, entries, filename: str):
+    """
+    Stream `entries` as a ZIP. With a deterministic layout the response has
+    Content-Length and an ETag and honours single `Range` requests (with
+    `If-Range`); otherwise it is streamed unsized and the missing checksums
+    are backfilled afterwards.
+    """
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    plan = plan_zip(entries)
+    if plan is None:
+        tasks = BackgroundTasks()
+        tasks.add_task(_backfill, entries)
+        return StreamingResponse(stream_zip(entries), media_type="application/zip",
+                                 headers=headers, background=tasks)
+
+    etag = f'"{plan.etag}"'
+    headers.update({"Accept-Ranges": "bytes", "ETag": etag})
+    if_range = request.headers.get("if-range")
+    rng = _parse_range(request.headers.get("range"), plan.size) if not if_range or if_range == etag else None
+
+    if rng is None:
+        headers["Content-Length"] = str(plan.size)
+        return StreamingResponse(iter_plan(plan), media_type="application/zip", headers=headers)
+
+    start, end = rng
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{plan.size}"
+    return StreamingResponse(iter_plan(plan, start, end), status_code=206,
+                             media_type="application/zip", headers=headers)
+
+
+@router.get("/{gallery_id}/download")
+def download_gallery(
+    gallery_id: str,
+    request: Request,
+    size: str = "original",
+    part: Optional[int] = Query(None, ge=1),
+    linkOnly: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    linkOnly=true: JSON {url, filename} once the cached zip object is built;
+    until then the build is queued (or joined) in the background and a 202
+    with its status is returned; poll GET .../download/status.
+    Otherwise: stream the zip directly, built entry by entry as it is sent.
+
+    When the manifest knows every entry's size and CRC the archive layout is
+    fixed up front: the response carries Content-Length and an ETag, and
+    `Range` requests (with `If-Range`) resume an interrupted download.
+    Otherwise the zip is streamed without a length and the missing
+    checksums are filled in afterwards, so the next request can resume.
+
+    part=k serves only the k-th part of the gallery (see .../download/parts);
+    each part is a complete ZIP of its own, cached and resumable on its own.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+    if size not in config.DOWNLOAD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported size")
+    filename = zip_filename(gallery, size, part)
+    record_usage(size)
+
+    if linkOnly:
+        build = zip_build_service.request_build(db, gallery_id, size, part)
+        status = zip_build_service.build_status(build, gallery, size, part)
+        if build.status == "ready":
+            return {"url": status["url"], "filename": filename}
+        return JSONResponse(status, status_code=202)
+
+    # keys from the manifest; missing sizes are rendered as the stream reaches them
+    entries = part_entries(zip_entries(db, gallery_id, size), part)
+    if entries is None:
+        raise HTTPException(status_code=404, detail="Part not found")
+    return _zip_response(request, entries, filename)
+
+
+@router.post("/{gallery_id}/download")
+def download_selection(
+    gallery_id: str,
+    payload: DownloadSelectionRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    Stream a ZIP of a selection of the gallery: the caller's favorites, an
+    explicit list of photo ids, or (owner only) everyone's favorites.
+    Same engine and Range support as GET .../download.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+    if payload.size not in config.DOWNLOAD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported size")
+
+    if payload.selection == "photos":
+        if not payload.photo_ids:
+            raise HTTPException(status_code=400, detail="photo_ids required")
+        photo_ids = payload.photo_ids
+    elif payload.selection == "all_favorites":
+        if not current_user or gallery.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not allowed")
+        photo_ids = favorite_service.favorite_photo_ids(db, gallery.id)
+    else:
+        selector = get_selector_for_request(request, gallery.id, current_user)
+        photo_ids = favorite_service.favorite_photo_ids(db, gallery.id, selector)
+
+    record_usage(payload.size)
+    entries = zip_entries(db, gallery_id, payload.size, photo_ids=photo_ids)
+    if not entries:
+        raise HTTPException(status_code=404, detail="No photos selected")
+    label = "selection" if payload.selection == "photos" else "favorites"
+    return _zip_response(request, entries, zip_filename(gallery, payload.size, selection=label))
+
+
+@router.post("/{gallery_id}/download/prepare", status_code=202)
+@limiter.limit("10/minute")
+def prepare_gallery_download(
+    gallery_id: str,
+    payload: PrepareDownloadRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    Queue (or join) the background build of the gallery ZIP; `notify_email`
+    is mailed a download link when it is ready. Only the gallery owner may
+    set `notify_email`, so the endpoint can't be used to send mail to
+    arbitrary addresses.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+    if payload.size not in config.DOWNLOAD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported size")
+    if payload.notify_email and (not current_user or gallery.owner_id != current_user.id):
+        raise HTTPException(status_code=403, detail="Not allowed")
+    record_usage(payload.size)
+    build = zip_build_service.request_build(db, gallery_id, payload.size, payload.part,
+                                            notify_email=payload.notify_email)
+    return zip_build_service.build_status(build, gallery, payload.size, payload.part)
+
+
+@router.get("/{gallery_id}/download/status")
+def gallery_download_status(
+    gallery_id: str,
+    request: Request,
+    size: str = "original",
+    part: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    Progress of the ZIP build for the gallery's current content:
+    {status: none|queued|building|ready|failed, entries_done, entries_total,
+    bytes_done, bytes_total, url (when ready), filename}.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+    if size not in config.DOWNLOAD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported size")
+    build = zip_build_service.current_build(db, gallery_id, size, part)
+    return zip_build_service.build_status(build, gallery, size, part)
+
+
+@router.get("/{gallery_id}/download/parts")
+def gallery_download_parts(
+    gallery_id: str,
+    request: Request,
+    size: str = "original",
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    The gallery as independent ZIP parts of at most ZIP_PART_MAX_BYTES of
+    photos each. Every part can be downloaded (in parallel), cached via
+    linkOnly and resumed on its own.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+    if size not in config.DOWNLOAD_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported size")
+    parts = split_entries(zip_entries(db, gallery_id, size), config.ZIP_PART_MAX_BYTES)
+    return {
+        "size": size,
+        "part_max_bytes": config.ZIP_PART_MAX_BYTES,
+        "parts": [
+            {
+                "part": i,
+                "filename": zip_filename(gallery, size, i),
+                "entries": len(entries),
+                "bytes": sum(e.size or 0 for e in entries),  # photo data, excluding ZIP headers
+                "url": f"{router.prefix}/{gallery_id}/download?size={size}&part={i}",
+            }
+            for i, entries in enumerate(parts, start=1)
+        ],
+    }
@@ -1,19 +1,26 @@
 # backend/app/routes/galleries.py
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Response, Request
-from fastapi.responses import StreamingResponse
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, HTTPException, Query, status, Response, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.database import get_db
 import os
 import uuid
 from datetime import datetime
 
-from app.gallery.schemas.gallery_schema import GalleryCreate
+from app.gallery.schemas.gallery_schema import GalleryCreate, PhotoUrlsRequest, RenditionPolicyUpdate
 from app.gallery.models.gallery_model import Gallery, Photo
 from app.gallery.services import gallery_service as crud
-from app.gallery.services.gallery_download_service import stream_gallery_zip
 from app.auth.services.dependencies import get_current_user, get_optional_current_user
 from app.gallery.utils.tokens import create_gallery_access_token, verify_gallery_access_token
+from app.gallery.utils.download import check_gallery_access
+from app.gallery.utils.urls import urls_from_paths
+from app.gallery.utils.cursor import encode_cursor, decode_cursor
+from app.gallery.services.paths import is_valid_rendition
+from app.gallery.services import rendition_service, zip_build_service, rendition_policy_service, sprite_service
+from app.gallery.services import gallery_manifest_service, gallery_stats_service
+from app.gallery.services.rendition_usage_service import record_usage
+from app.gallery.utils.image_pipline import process_image_pipeline
 from app.storage import storage
 
 router = APIRouter(tags=["Gallery"])
@@ -35,9 +42,18 @@ def create_gallery(payload: GalleryCreate, db: Session = Depends(get_db), user=D
 
 
 @router.get("/galleries")
-def list_galleries(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    out = crud.get_galleries_for_owner_with_cover(db, user.id)
-    return {"galleries": out}
+def list_galleries(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    The caller's galleries, newest first, with cover photo and URL.
+    Keyset-paginated: pass back `next_cursor` until it is null.
+    """
+    out, next_after = crud.get_galleries_for_owner_with_cover(db, user.id, limit, after=decode_cursor(cursor))
+    return {"galleries": out, "next_cursor": encode_cursor(next_after) if next_after else None}
 
 
 @router.delete("/galleries/{gallery_id}")
@@ -71,6 +87,8 @@ def delete_gallery(
     except Exception:
         pass
 
+    gallery_manifest_service.unpublish(gallery_id)
+
     # Delete DB records
     db.query(Photo).filter(Photo.gallery_id == gallery_id).delete()
     db.delete(gallery)
@@ -79,6 +97,214 @@ def delete_gallery(
     return {"detail": "Gallery deleted"}
 
 
+@router.delete("/galleries/{gallery_id}/photos/{photo_id}")
+def delete_photo(gallery_id: str, photo_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    if gallery.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    photo = crud.get_photo(db, gallery_id, photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    crud.delete_photo(db, photo)
+
+    sprite_service.schedule_build(gallery_id)
+    if gallery.is_public:
+        zip_build_service.schedule_prebuild(gallery_id)
+        gallery_manifest_service.schedule_publish(gallery_id)
+    return {"detail": "Photo deleted"}
+
+
+@router.put("/galleries/{gallery_id}/cover/{photo_id}")
+def set_cover_photo(gallery_id: str, photo_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    if gallery.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    photo = crud.get_photo(db, gallery_id, photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    crud.set_cover_photo(db, photo)
+    if gallery.is_public:
+        gallery_manifest_service.schedule_publish(gallery_id)
+    return {"cover_photo_id": photo.id}
+
+
+@router.get("/galleries/{gallery_id}/photos")
+def list_gallery_photos(
+    gallery_id: str,
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_optional_current_user),
+):
+    """
+    A page of the gallery's photos in gallery order. `fields` is a
+    comma-separated subset of the photo columns plus thumb/preview (signed
+    URLs); by default every column and no URLs. `id` is always returned.
+    Keyset-paginated: pass back `next_cursor` until it is null.
+    """
+    check_gallery_access(db, gallery_id, request, current_user)
+
+    if fields:
+        wanted = list(dict.fromkeys(["id"] + [f.strip() for f in fields.split(",") if f.strip()]))
+    else:
+        wanted = list(crud.PHOTO_FIELDS)
+    unknown = [f for f in wanted if f not in crud.PHOTO_FIELDS and f not in crud.PHOTO_URL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    columns = [f for f in wanted if f in crud.PHOTO_FIELDS]
+    renditions = [f for f in wanted if f in crud.PHOTO_URL_FIELDS]
+
+    rows = crud.list_photos_page(
+        db, gallery_id, limit, after=decode_cursor(cursor),
+        columns=columns + (list(rendition_service.KEY_COLUMNS) if renditions else []),
+    )
+    page, more = rows[:limit], len(rows) > limit
+
+    photos = [{f: getattr(r, f) for f in columns} for r in page]
+    for rendition in renditions:
+        record_usage(rendition)
+        urls = urls_from_paths(rendition_service.keys_for_photos(db, page, rendition))
+        for photo, url in zip(photos, urls):
+            photo[rendition] = url
+    return {
+        "photos": photos,
+        "next_cursor": encode_cursor([page[-1].order_index, page[-1].id]) if more else None,
+    }
+
+
+@router.post("/galleries/{gallery_id}/urls")
+def gallery_photo_urls(
+    gallery_id: str,
+    payload: PhotoUrlsRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_optional_current_user),
+):
+    """
+    Signed (or public) URLs for many photos of one rendition in a single call.
+    Keyset-paginated: pass back `next_cursor` until it is null.
+    """
+    gallery = check_gallery_access(db, gallery_id, request, current_user)
+
+    if not is_valid_rendition(payload.rendition):
+        raise HTTPException(status_code=400, detail="Unsupported rendition")
+    is_owner = current_user is not None and gallery.owner_id == current_user.id
+    if payload.rendition == "original" and not is_owner:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    photo_ids = None if payload.photo_ids == "all" else payload.photo_ids
+    rows = crud.list_photos_page(
+        db, gallery_id, payload.limit, after=decode_cursor(payload.cursor), photo_ids=photo_ids,
+        columns=list(rendition_service.KEY_COLUMNS),
+    )
+    page, more = rows[:payload.limit], len(rows) > payload.limit
+
+    record_usage(payload.rendition)
+    urls = urls_from_paths(rendition_service.keys_for_photos(db, page, payload.rendition))
+    return {
+        "rendition": payload.rendition,
+        "urls": [{"photo_id": p.id, "url": u} for p, u in zip(page, urls)],
+        "next_cursor": encode_cursor([page[-1].order_index, page[-1].id]) if more else None,
+    }
+
+
+@router.get("/galleries/{gallery_id}/sprites")
+def gallery_sprites(
+    gallery_id: str,
+    request: Request,
+    layout: str = "sprite",
+    db: Session = Depends(get_db),
+    current_user=Depends(get_optional_current_user),
+):
+    """
+    The gallery as a few sheet images plus an atlas of where each photo's
+    tile is on them. layout=sprite packs thumbs for the grid; layout=contact
+    gives printable contact sheets with filenames. While a sheet is missing
+    this answers 503 {"status": "building"} with Retry-After and builds it
+    in the background.
+    """
+    check_gallery_access(db, gallery_id, request, current_user)
+    if layout not in sprite_service.LAYOUTS:
+        raise HTTPException(status_code=400, detail="Unsupported layout")
+    atlas = sprite_service.gallery_sheets(db, gallery_id, layout, build=False)
+    if atlas is None:
+        sprite_service.schedule_build(gallery_id, layout, delay=0)
+        return JSONResponse({"status": "building", "layout": layout}, status_code=503,
+                            headers={"Retry-After": "5"})
+    urls = urls_from_paths([s.pop("key") for s in atlas["sheets"]])
+    for sheet, url in zip(atlas["sheets"], urls):
+        sheet["url"] = url
+    return atlas
+
+
+@router.post("/galleries/{gallery_id}/manifest")
+def publish_gallery_manifest(gallery_id: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """
+    Publish the static manifest of a public gallery now (it is otherwise
+    republished shortly after every change). Anonymous viewers read it from
+    `url` without going through the API.
+    """
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    if gallery.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    version = gallery_manifest_service.publish(db, gallery_id)
+    if version is None:
+        raise HTTPException(status_code=409, detail="Only public galleries without a password are published")
+    base = gallery_manifest_service.base_url()
+    key = gallery_manifest_service.manifest_key(gallery_id)
+    return {"version": version, "key": key, "url": f"{base.rstrip('/')}/{key}" if base else None}
+
+
+@router.get("/galleries/{gallery_id}/rendition-policy")
+def get_rendition_policy(gallery_id: str, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    if gallery.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return {
+        "policy": rendition_policy_service.policy_for(gallery),
+        "overrides": gallery.rendition_policy or {},
+    }
+
+
+@router.put("/galleries/{gallery_id}/rendition-policy")
+def set_rendition_policy(
+    gallery_id: str,
+    payload: RenditionPolicyUpdate,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Per download size: eager (rendered at upload), lazy (on first request)
+    or prewarm (rendered in the background once the public gallery settles).
+    """
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    if gallery.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    try:
+        overrides = rendition_policy_service.validate_policy(payload.policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    gallery.rendition_policy = overrides or None
+    db.commit()
+    policy = rendition_policy_service.policy_for(gallery)
+    if gallery.is_public and "prewarm" in policy.values():
+        rendition_policy_service.schedule_prewarm(gallery_id)
+    return {"policy": policy, "overrides": overrides}
+
+
 # ========================
 # Expiry + Auto Cleanup
 # ========================
@@ -100,6 +326,7 @@ def expire_gallery(
     gallery.status = "expired"
     gallery.expired_at = datetime.utcnow()
     db.commit()
+    gallery_manifest_service.unpublish(gallery_id)
 
     return {"detail": "Gallery marked as expired"}
 
@@ -136,12 +363,13 @@ def cleanup_expired_galleries(db: Session = Depends(get_db)):
 
 
 # ========================
-# Upload Logic (Original Only)
+# Upload Logic
 # ========================
 
 @router.post("/galleries/{gallery_id}/photos", status_code=201)
 async def upload_photos(
     gallery_id: str,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
@@ -163,7 +391,17 @@ async def upload_photos(
             ext=ext,
             path_original=key_original,
             file_id=file_id,
+            commit=False,
+        )
+        # photo, original rendition and counters in one transaction per file
+        rendition_service.record_rendition(
+            db, p.id, "original", key_original,
+            format=ext.lstrip("."), bytes=upload.size, commit=False,
         )
+        gallery_stats_service.photo_added(db, p.gallery_id, p.id, upload.size)
+        db.commit()
+        # preview, thumb and the policy's eager download sizes, after the response
+        background_tasks.add_task(process_image_pipeline, p.id)
 
         created.append(
             {
@@ -174,6 +412,15 @@ async def upload_photos(
             }
         )
 
+    # refresh the cached download once the upload burst is over
+    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
+    if created:
+        sprite_service.schedule_build(gallery_id)
+    if created and gallery and gallery.is_public:
+        zip_build_service.schedule_prebuild(gallery_id)
+        rendition_policy_service.schedule_prewarm(gallery_id)
+        gallery_manifest_service.schedule_publish(gallery_id)
+
     return {"photos": created}
 
 
@@ -0,0 +1,85 @@
+# app/gallery/controllers/image_controller.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request #type: ignore
+from fastapi.responses import RedirectResponse, Response #type: ignore
+from sqlalchemy.orm import Session #type: ignore
+from app import config
+from app.database import get_db
+from app.auth.services.dependencies import get_optional_current_user
+from app.brand.service import get_settings, settings_hash
+from app.gallery.models.gallery_model import Photo
+from app.gallery.services.gallery_manifest_service import is_publishable
+from app.gallery.services.rendition_usage_service import record_usage
+from app.gallery.utils.download import check_gallery_access
+from app.gallery.utils.download_helper import ensure_resized_for_photo
+from app.storage import storage
+
+router = APIRouter(prefix="/api/img", tags=["Images"])
+
+
+def snap_width(w: int) -> int:
+    """Smallest ladder width >= w (the largest one for anything bigger)."""
+    for step in config.IMG_WIDTHS:
+        if step >= w:
+            return step
+    return config.IMG_WIDTHS[-1]
+
+
+def _negotiate_format(accept: str) -> str:
+    for fmt in ("avif", "webp"):
+        if fmt in config.IMG_FORMATS and f"image/{fmt}" in accept:
+            return fmt
+    return "jpeg" if "jpeg" in config.IMG_FORMATS else config.IMG_FORMATS[0]
+
+
+@router.get("/{photo_id}")
+def resized_image(
+    photo_id: int,
+    request: Request,
+    w: int = Query(..., ge=1, le=10000),
+    fmt: Optional[str] = None,
+    v: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_optional_current_user),
+):
+    """
+    The photo `w` pixels wide (watermarked like every other rendition).
+
+    Widths snap up to config.IMG_WIDTHS, `fmt` defaults to the best format
+    the Accept header allows, and `v` is the brand settings version. A
+    request that isn't already in that canonical form is redirected to it;
+    the canonical URL never changes content, so it is served with an
+    immutable, long-lived Cache-Control. Variants are rendered on first use
+    and kept in storage and the rendition manifest.
+    """
+    photo = db.get(Photo, photo_id)
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    gallery = check_gallery_access(db, str(photo.gallery_id), request, current_user)
+    if fmt is not None and fmt not in config.IMG_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format")
+
+    width = snap_width(w)
+    wm_hash = settings_hash(get_settings(db))
+    if width != w or fmt is None or v != wm_hash:
+        fmt = fmt or _negotiate_format(request.headers.get("accept", ""))
+        return RedirectResponse(
+            f"{router.prefix}/{photo_id}?w={width}&fmt={fmt}&v={wm_hash}",
+            status_code=302,
+            headers={"Cache-Control": "no-cache", "Vary": "Accept"},
+        )
+
+    record_usage(f"w{width}")
+    etag = f'"{wm_hash}-{width}-{fmt}"'
+    # shared caches only for galleries anyone may see; password-protected
+    # ones are flagged public too but must not end up in a CDN
+    scope = "public" if is_publishable(gallery) else "private"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"{scope}, max-age={config.IMG_CACHE_MAX_AGE}, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    key = ensure_resized_for_photo(db, photo, width, fmt, wm_hash)
+    return Response(storage.read_bytes(key), media_type=f"image/{fmt}", headers=headers)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, UniqueConstraint, func #type: ignore
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Index, UniqueConstraint, func #type: ignore
 from sqlalchemy.orm import relationship #type:ignore
 from app.database import Base
 
@@ -13,4 +13,5 @@ class Favorite(Base):
 
     __table_args__ =(
         UniqueConstraint("gallery_id", "photo_id", "selector", name="uq_favorite_unique"),
+        Index("ix_favorites_gallery_selector", "gallery_id", "selector"),
     )
\ No newline at end of file
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, Text #type: ignore
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, TIMESTAMP, Text, JSON #type: ignore
 from sqlalchemy.sql import func #type: ignore
-from sqlalchemy import ForeignKey #type: ignore
+from sqlalchemy import ForeignKey, Index #type: ignore
 from sqlalchemy.orm import relationship #type: ignore
+from sqlalchemy.dialects import sqlite #type: ignore
 from app.database import Base #type: ignore
 import uuid
 
@@ -10,6 +11,14 @@ def gen_uuid_str():
     return str(uuid.uuid4())
 
 
+# SQLite keeps server-default timestamps as CURRENT_TIMESTAMP text
+# ("YYYY-MM-DD HH:MM:SS"); bind datetimes in that form too, so comparing the
+# column with a value (keyset cursors) matches equal instants.
+_SQLITE_SECONDS = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
+
 class Gallery(Base):
     __tablename__ = "galleries"
     id = Column(Integer, primary_key=True, index=True)
@@ -17,10 +26,20 @@ class Gallery(Base):
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=True)
     is_public = Column(Boolean, default=False)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    created_at = Column(TIMESTAMP(timezone=True).with_variant(_SQLITE_SECONDS, "sqlite"), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), onupdate=func.now())
     password_hash = Column(String(256), nullable=True)
     favorites_limit = Column(Integer, nullable=True)
+    # per download size: "eager" | "lazy" | "prewarm"; sizes not listed follow config.RENDITION_POLICY
+    rendition_policy = Column(JSON, nullable=True)
+
+    # Denormalized for listings and dashboards; kept in step by
+    # gallery_stats_service in the transaction that changes them
+    photo_count = Column(Integer, default=0, server_default="0", nullable=False)
+    total_bytes = Column(BigInteger, default=0, server_default="0", nullable=False)  # of the originals
+    favorites_total = Column(Integer, default=0, server_default="0", nullable=False)
+    cover_photo_id = Column(Integer, nullable=True)  # no FK: photos already reference galleries
+    last_activity_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     # Lifecycle management fields
     status = Column(String(20), default="active", nullable=False)
@@ -29,6 +48,11 @@ class Gallery(Base):
     owner = relationship("User", back_populates="galleries")
     photos = relationship("Photo", back_populates="gallery", cascade="all, delete-orphan", order_by="Photo.order_index")
 
+    __table_args__ = (
+        Index("ix_galleries_owner_created", "owner_id", "created_at", "id"),  # owner's listing, newest first
+        Index("ix_galleries_status_created", "status", "created_at"),         # expiry cleanup
+    )
+
 
 class Photo(Base):
     __tablename__ = "photos"
@@ -46,6 +70,10 @@ class Photo(Base):
 
     gallery = relationship("Gallery", back_populates="photos")
 
+    __table_args__ = (
+        Index("ix_photos_gallery_order", "gallery_id", "order_index", "id"),  # gallery order / keyset pages
+    )
+
 
 class Branding(Base):
     __tablename__ = "branding"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, BigInteger, String, TIMESTAMP, ForeignKey, UniqueConstraint, func #type: ignore
+from app.database import Base
+
+
+class PhotoRendition(Base):
+    """
+    Manifest of every generated artifact for a photo (original upload,
+    preview, thumb, download sizes). Serving paths look keys up here
+    instead of probing storage.
+    """
+    __tablename__ = "photo_renditions"
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(20), nullable=False)            # original | preview | thumb | download
+    size = Column(String(20), nullable=False, default="")  # download size name, "" otherwise
+    format = Column(String(10), nullable=False, default="jpeg")
+    key = Column(String(1024), nullable=False)
+    bytes = Column(BigInteger, nullable=True)
+    crc32 = Column(BigInteger, nullable=True)            # lets ZIP layouts be planned without reading objects
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    settings_hash = Column(String(64), nullable=True)    # brand watermark settings it was rendered with
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("photo_id", "kind", "size", "format", name="uq_photo_rendition"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, UniqueConstraint #type: ignore
+from app.database import Base
+
+
+class RenditionUsage(Base):
+    """
+    Daily counters per rendition name (preview, thumb, or a download size):
+    how often clients asked for it and how many copies had to be rendered.
+    What the rendition policy is tuned against.
+    """
+    __tablename__ = "rendition_usage"
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    rendition = Column(String(20), nullable=False)
+    requests = Column(BigInteger, nullable=False, default=0)
+    generated = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "rendition", name="uq_rendition_usage"),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func #type: ignore
+from app.database import Base
+
+
+class RerenderJob(Base):
+    """
+    Re-rendering of every watermarked rendition made with settings other
+    than `settings_hash`. The work list is derived from the manifest (rows
+    whose hash differs), so an interrupted job resumes where it stopped by
+    running it again; this row only carries progress.
+    """
+    __tablename__ = "rerender_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    settings_hash = Column(String(64), nullable=False, unique=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | pausing | paused | superseded | done | failed
+    photos_total = Column(Integer, nullable=False, default=0)
+    photos_done = Column(Integer, nullable=False, default=0)
+    photos_failed = Column(Integer, nullable=False, default=0)
+    renditions_done = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, TIMESTAMP, ForeignKey, UniqueConstraint, func #type: ignore
+from app.database import Base
+
+
+class ZipBuild(Base):
+    """
+    One background build of a gallery ZIP (or one part of it) for a
+    (size, content digest). Requests for the same gallery/size/part/digest
+    share a row, so concurrent requests coalesce onto one build; a new
+    digest means a new build.
+    """
+    __tablename__ = "zip_builds"
+    id = Column(Integer, primary_key=True, index=True)
+    gallery_id = Column(Integer, ForeignKey("galleries.id", ondelete="CASCADE"), nullable=False)
+    size = Column(String(20), nullable=False)
+    part = Column(Integer, nullable=False, default=0)    # 1-based part number; 0 = whole gallery
+    digest = Column(String(32), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued | building | ready | failed
+    key = Column(String(1024), nullable=True)
+    entries_total = Column(Integer, nullable=True)
+    entries_done = Column(Integer, nullable=False, default=0)
+    bytes_total = Column(BigInteger, nullable=True)
+    bytes_done = Column(BigInteger, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    notify_email = Column(String(255), nullable=True)   # mailed the link once ready
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("gallery_id", "size", "part", "digest", name="uq_zip_build"),
+    )
@@ -1,6 +1,6 @@
 # backend/app/schemas.py
-from pydantic import BaseModel, Field #type: ignore
-from typing import Optional, List, Union
+from pydantic import BaseModel, EmailStr, Field #type: ignore
+from typing import Optional, List, Union, Literal, Dict
 from datetime import datetime
 
 class GalleryCreate(BaseModel):
@@ -10,6 +10,38 @@ class GalleryCreate(BaseModel):
 
 
 
+class RenditionPolicyUpdate(BaseModel):
+    # download size -> mode; replaces the gallery's overrides, unlisted
+    # sizes follow config.RENDITION_POLICY
+    policy: Dict[str, Literal["eager", "lazy", "prewarm"]] = {}
+
+
+class PhotoUrlsRequest(BaseModel):
+    # explicit photo ids, or "all" for the whole gallery
+    photo_ids: Union[List[int], Literal["all"]] = "all"
+    # original | preview | thumb | any key of config.DOWNLOAD_SIZES
+    rendition: str = "thumb"
+    limit: int = Field(200, ge=1, le=1000)
+    cursor: Optional[str] = None
+
+
+class DownloadSelectionRequest(BaseModel):
+    size: str = "original"
+    # favorites: the caller's own favorites
+    # all_favorites: favorites of every visitor (owner only)
+    # photos: the ids in `photo_ids`
+    selection: Literal["favorites", "all_favorites", "photos"] = "favorites"
+    photo_ids: Optional[List[int]] = Field(None, max_length=10000)
+
+
+class PrepareDownloadRequest(BaseModel):
+    size: str = "original"
+    # 1-based part of a multi-part download; None for the whole gallery
+    part: Optional[int] = Field(None, ge=1)
+    # mailed a download link once the ZIP is built
+    notify_email: Optional[EmailStr] = None
+
+
 class PhotoOut(BaseModel):
     # allow either int or str for id
     id: Union[int, str]
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session #type: ignore
 from app.gallery.models.favorite_model import Favorite
 from app.gallery.models.gallery_model import Gallery
 from app.gallery.models.gallery_model import Photo
+from app.gallery.services import gallery_stats_service
 
 DEFAULT_FAVORITES_LIMIT = 50
 
@@ -12,6 +13,16 @@ def get_effective_limit(gallery: Gallery) -> int:
 def list_favorites(db: Session, gallery_id: int, selector: str):
     return db.query(Favorite).filter(Favorite.gallery_id==gallery_id, Favorite.selector==selector).all()
 
+def favorite_photo_ids(db: Session, gallery_id: int, selector: str | None = None) -> list[int]:
+    """
+    Distinct favorited photo ids of a gallery; for one selector, or across
+    all selectors when `selector` is None.
+    """
+    q = db.query(Favorite.photo_id).filter(Favorite.gallery_id==gallery_id)
+    if selector is not None:
+        q = q.filter(Favorite.selector==selector)
+    return [pid for (pid,) in q.distinct().all()]
+
 def count_favorites(db: Session, gallery_id: int, selector: str) -> int:
     return db.query(Favorite).filter(Favorite.gallery_id==gallery_id, Favorite.selector==selector).count()
 
@@ -28,6 +39,7 @@ def add_favorite(db: Session, gallery: Gallery, photo_id: int, selector: str):
 
     fav = Favorite(gallery_id=gallery.id, photo_id=photo_id, selector=selector)
     db.add(fav)
+    gallery_stats_service.favorites_changed(db, gallery.id, 1)
     db.commit()
     db.refresh(fav)
     return fav, None
@@ -39,7 +51,7 @@ def remove_favorite(db: Session, gallery_id: int, photo_id: int, selector: str)
         Favorite.selector==selector
     )
     if q.first():
-        q.delete()
+        gallery_stats_service.favorites_changed(db, gallery_id, -q.delete())
         db.commit()
         return True
     return False
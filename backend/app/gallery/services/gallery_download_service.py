@@ -1,20 +1,253 @@
-import zipstream
-from fastapi.responses import StreamingResponse
-from app.storage import storage
+import hashlib
+import os
+import zlib
+from functools import partial
+from typing import Callable, Collection, List, Optional, Tuple
+from sqlalchemy.orm import Session  # type: ignore
+from app.database import SessionLocal
+from app.gallery.services import gallery_service as crud
+from app.gallery.services import rendition_service
+from app.gallery.services.paths import watermarked_key
+from app.gallery.models.gallery_model import Photo
+from app.gallery.models.rendition_model import PhotoRendition
+from app.brand.service import get_settings, settings_hash
+from app.gallery.utils.download_helper import ensure_cached_download_for_photo
+from app.gallery.utils.zip_stream import ZipEntry
+from app.gallery.utils.prefetch import prefetch_ordered
+from app import config
 
 
-def stream_gallery_zip(prefix: str):
+def _arcname(photo, size: str) -> str:
+    if size == "original":
+        return os.path.basename(photo.filename or f"photo-{photo.id}.jpg")
+    base, _ = os.path.splitext(photo.filename or f"photo-{photo.id}")
+    return f"{base}-{size}.jpg"
+
+
+def _render_download(photo_id: int, size: str, wm_hash: str) -> Tuple[str, Optional[int], Optional[int]]:
+    # runs on stream/prefetch threads, so it has a session of its own
+    db = SessionLocal()
+    try:
+        photo = db.get(Photo, photo_id)
+        if photo is None:
+            raise FileNotFoundError(f"photo {photo_id} is gone")
+        _, key = ensure_cached_download_for_photo(db, photo, size, wm_hash=wm_hash)
+        r = rendition_service.get_rendition(db, photo_id, "download", size)
+        return key, (r.bytes if r else None), (r.crc32 if r else None)
+    finally:
+        db.close()
+
+
+def zip_entries(db: Session, gallery_id: str, size: str, photo_ids: Optional[Collection[int]] = None) -> List[ZipEntry]:
+    """
+    One ZipEntry per photo of the gallery at `size`, in gallery order, with
+    keys, byte sizes and CRCs from the rendition manifest; one query, no
+    rendering. Photos without a current rendition get an entry that renders
+    it when its data is fetched (see ZipEntry.render). Duplicate filenames
+    get a " (n)" suffix. `photo_ids` restricts the archive to those photos
+    (ids outside the gallery are ignored).
+    """
+    if photo_ids is None:
+        photos = crud.list_photos(db, gallery_id) or []
+    else:
+        photos = (
+            db.query(Photo)
+            .filter(Photo.gallery_id == gallery_id, Photo.id.in_(list(photo_ids)))
+            .order_by(Photo.order_index, Photo.id)
+            .all()
+        ) if photo_ids else []
+
+    wm_hash = settings_hash(get_settings(db))
+    renditions = rendition_service.get_renditions_for_photos(db, [p.id for p in photos], "download", size)
+    entries: List[ZipEntry] = []
+    seen = set()
+    for p in photos:
+        arc = _arcname(p, size)
+        base, ext = os.path.splitext(arc)
+        n = 1
+        while arc.lower() in seen:
+            arc = f"{base} ({n}){ext}"
+            n += 1
+        seen.add(arc.lower())
+
+        r = renditions.get(p.id)
+        if r is not None and r.settings_hash == wm_hash:
+            entries.append(ZipEntry(r.key, arc, r.bytes, r.crc32, photo_id=p.id))
+        else:
+            key = watermarked_key(str(p.gallery_id), str(p.filename or p.id), size, wm_hash)
+            entries.append(ZipEntry(key, arc, render=partial(_render_download, p.id, size, wm_hash), photo_id=p.id))
+    return entries
+
+
+def render_missing(entries: List[ZipEntry], on_rendered: Optional[Callable[[int], None]] = None) -> List[ZipEntry]:
+    """
+    Render the entries' missing renditions, ZIP_PREFETCH_CONCURRENCY at a
+    time, and return the entries with their real keys, sizes and CRCs.
+    `on_rendered(n)` is called after each one with the number rendered so far.
+
+    Only entries whose photo or original is gone (FileNotFoundError) are
+    dropped. Any other failure, e.g. GenerationInProgress while another
+    worker renders the same photo, is raised: a caller building an archive
+    must not publish it without that photo.
+    """
+    todo = [e for e in entries if e.render is not None]
+    if not todo:
+        return entries
+    rendered = {}
+    fetched = prefetch_ordered(
+        todo, lambda e: e.render(), config.ZIP_PREFETCH_CONCURRENCY,
+        config.ZIP_PREFETCH_BUFFER_BYTES, size_of=lambda _: 0,  # results are tiny
+    )
+    try:
+        for e, result, err in fetched:
+            if isinstance(err, FileNotFoundError):
+                print(f"zip: leaving out {e.arcname}: {err}")
+            elif err is not None:
+                raise err
+            else:
+                key, n, crc = result
+                rendered[e.arcname] = e._replace(key=key, size=n, crc32=crc, render=None)
+            if on_rendered:
+                on_rendered(len(rendered))
+    finally:
+        fetched.close()
+    return [rendered.get(e.arcname) if e.render is not None else e
+            for e in entries if e.render is None or e.arcname in rendered]
+
+
+def backfill_zip_checksums(db: Session, entries: List[ZipEntry], store=None) -> int:
+    """
+    Read the objects of entries whose manifest row lacks a size or CRC and
+    fill both in, so the next archive of them has a known layout.
+    Returns the number of rows updated.
+    """
+    if store is None:
+        from app.storage import storage as store
+    keys = [e.key for e in entries if e.size is None or e.crc32 is None]
+    if not keys:
+        return 0
+    rows = {r.key: r for r in db.query(PhotoRendition).filter(PhotoRendition.key.in_(keys)).all()}
+
+    def measure(key: str):
+        crc, n = 0, 0
+        with store.open_reader(key) as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                crc = zlib.crc32(chunk, crc)
+                n += len(chunk)
+        return n, crc
+
+    updated = 0
+    for key, (n, crc), err in prefetch_ordered(
+        list(rows), measure, config.ZIP_PREFETCH_CONCURRENCY,
+        config.ZIP_PREFETCH_BUFFER_BYTES, size_of=lambda _: 0,  # results are tiny
+    ):
+        if err is not None:
+            print(f"zip: cannot checksum {key}: {err}")
+            continue
+        rows[key].bytes, rows[key].crc32 = n, crc
+        updated += 1
+    db.commit()
+    return updated
+
+
+def split_entries(entries: List[ZipEntry], max_bytes: int, store=None) -> List[List[ZipEntry]]:
+    """
+    Cut `entries` into consecutive parts of at most `max_bytes` of data each
+    (an entry bigger than that gets a part of its own). Missing renditions
+    are rendered first, and sizes missing from the manifest are read with
+    stat() and filled in. Boundaries depend only on the entries and their
+    sizes, so the same gallery always splits the same way.
+    """
+    if store is None:
+        from app.storage import storage as store
+    entries = render_missing(entries)
+    parts: List[List[ZipEntry]] = []
+    current: List[ZipEntry] = []
+    used = 0
+    for e in entries:
+        n = e.size
+        if n is None:
+            st = store.stat(e.key)
+            n = st.size if st else 0
+            e = e._replace(size=n if st else None)
+        if current and used + n > max_bytes:
+            parts.append(current)
+            current, used = [], 0
+        current.append(e)
+        used += n
+    if current or not parts:
+        parts.append(current)
+    return parts
+
+
+def part_entries(entries: List[ZipEntry], part: Optional[int]) -> Optional[List[ZipEntry]]:
+    """
+    Entries of 1-based `part` under config.ZIP_PART_MAX_BYTES; all of them
+    for part None, and None for a part that does not exist.
+    """
+    if not part:
+        return entries
+    parts = split_entries(entries, config.ZIP_PART_MAX_BYTES)
+    return parts[part - 1] if 1 <= part <= len(parts) else None
+
+
+def _digest_rows(db: Session, gallery_id: str):
+    return (
+        db.query(Photo.id, Photo.filename, Photo.order_index)
+        .filter(Photo.gallery_id == gallery_id)
+        .order_by(Photo.order_index, Photo.id)
+        .all()
+    )
+
+
+def _digest(db: Session, rows, size: str, part: Optional[int]) -> str:
+    h = hashlib.sha256(f"{size}\n{settings_hash(get_settings(db))}\n".encode("utf-8"))
+    if part:
+        h.update(f"parts of {config.ZIP_PART_MAX_BYTES}\n".encode("utf-8"))
+    for pid, filename, order_index in rows:
+        h.update(f"{pid}\0{filename}\0{order_index}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def zip_digest(db: Session, gallery_id: str, size: str, part: Optional[int] = None) -> str:
     """
-    Streams a ZIP archive of all files under the given storage prefix.
-    Works with any configured storage backend (local, spaces, gcs).
+    Digest of what a gallery ZIP at `size` contains: the photo set, their
+    order and filenames, and the brand settings the renditions are
+    watermarked with. Computed from one query, without touching storage;
+    any change that alters the archive changes the digest. Parts also
+    depend on the part size cap.
     """
-    z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED)
+    return _digest(db, _digest_rows(db, gallery_id), size, part)
+
 
-    files = storage.list_files(prefix)
+def check_zip_entries(db: Session, gallery_id: str, size: str, part: Optional[int],
+                      digest: str, entries: List[ZipEntry]) -> None:
+    """
+    Raise RuntimeError unless `entries` (the whole gallery, before
+    part_entries) archive exactly the photos `digest` was computed from:
+    the gallery still has that digest, and each of its photos has one
+    entry, in gallery order. An archive built from entries that fail this,
+    e.g. with a photo render_missing left out, must not be published under
+    `digest`.
+    """
+    rows = _digest_rows(db, gallery_id)
+    if _digest(db, rows, size, part) != digest:
+        raise RuntimeError(f"gallery {gallery_id} changed while its {size} ZIP was built")
+    want = [pid for pid, _, _ in rows]
+    got = [e.photo_id for e in entries]
+    if got != want:
+        missing = sorted(set(want) - set(got))
+        raise RuntimeError(
+            f"{size} ZIP of gallery {gallery_id} has {len(got)} entries for {len(want)} photos"
+            + (f"; missing photos {missing[:10]}" if missing else "")
+        )
 
-    for file_path in files:
-        file_stream = storage.open_stream(file_path)
-        filename = file_path.split("/")[-1]
-        z.write_iter(filename, file_stream)
 
-    return z
+def zip_filename(gallery, size: str, part: Optional[int] = None, selection: Optional[str] = None) -> str:
+    title = (getattr(gallery, "title", None) or f"gallery-{gallery.id}").strip()
+    safe = "".join(c if c.isalnum() or c in " -_" else "_" for c in title).strip() or f"gallery-{gallery.id}"
+    if selection:
+        return f"{safe}-{size}-{selection}.zip"
+    if part:
+        return f"{safe}-{size}-part{part}.zip"
+    return f"{safe}-{size}.zip"
@@ -0,0 +1,202 @@
+# app/gallery/services/gallery_manifest_service.py
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import hashlib, io, json
+from PIL import Image  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app import config
+from app.database import SessionLocal
+from app.gallery.models.gallery_model import Gallery, Photo
+from app.gallery.models.rendition_model import PhotoRendition
+from app.gallery.services import gallery_service as crud
+from app.gallery.services import sprite_service
+from app.gallery.utils.debounce import debounce
+from app.storage import storage
+
+# A public gallery is published as a static JSON file in storage so that
+# anonymous viewers can load it from the bucket/CDN without touching the API:
+#   {gallery_id}/manifest.json            latest version (short-lived cache)
+#   {gallery_id}/manifest/{version}.json  same content, never changes
+# Rendition keys are relative to the manifest's base_url. A superseded
+# version stays readable for GALLERY_MANIFEST_RETAIN_SECONDS, so clients that
+# loaded it (or a CDN copy of manifest.json pointing at it) keep working.
+
+MANIFEST_FORMAT = 1
+
+def manifest_key(gallery_id: str) -> str:
+    return f"{gallery_id}/manifest.json"
+
+
+def versioned_manifest_key(gallery_id: str, version: str) -> str:
+    return f"{gallery_id}/manifest/{version}.json"
+
+
+def is_publishable(gallery: Optional[Gallery]) -> bool:
+    # password-protected galleries are flagged public but must stay behind the API
+    return bool(gallery and gallery.is_public and not gallery.password_hash and gallery.status == "active")
+
+
+def base_url() -> Optional[str]:
+    """Where clients fetch manifest keys from; None if the bucket isn't publicly reachable."""
+    return config.PUBLIC_MEDIA_BASE_URL or storage.url_for("")
+
+
+def _placeholder(key: Optional[str]) -> Optional[str]:
+    """Average colour of the image as #rrggbb, decoded at reduced scale."""
+    if not key:
+        return None
+    try:
+        with Image.open(io.BytesIO(storage.read_bytes(key))) as im:
+            im.draft("RGB", (64, 64))  # JPEG: decode at 1/8 scale at most
+            r, g, b = im.convert("RGB").resize((1, 1), Image.BOX).getpixel((0, 0))
+        return f"#{r:02x}{g:02x}{b:02x}"
+    except Exception as e:
+        print(f"manifest: no placeholder for {key}: {e}")
+        return None
+
+
+def _previous(gallery_id: str) -> Dict[int, dict]:
+    """Photo entries of the published manifest, by id (empty if there is none)."""
+    try:
+        data = json.loads(storage.read_bytes(manifest_key(gallery_id)))
+        return {p["id"]: p for p in data.get("photos", [])}
+    except Exception:
+        return {}
+
+
+def build_manifest(db: Session, gallery: Gallery) -> dict:
+    """
+    Gallery metadata, photos in gallery order with dimensions, a colour
+    placeholder and their thumb/preview keys, and the sprite atlas. Entries
+    of photos whose thumb is unchanged are carried over from the published
+    manifest, so a rebuild only decodes new or re-rendered photos. Sprite
+    sheets are never rendered here: while one is missing "sprites" is null
+    and the background build republishes once they are done.
+    """
+    gid = str(gallery.id)
+    photos = crud.list_photos(db, gid) or []
+    rows = db.query(PhotoRendition).filter(
+        PhotoRendition.photo_id.in_([p.id for p in photos]),
+        PhotoRendition.kind.in_(("thumb", "preview")),
+    ).all() if photos else []
+    keys: Dict[int, Dict[str, str]] = {}
+    for r in rows:
+        keys.setdefault(r.photo_id, {})[r.kind] = r.key
+    previous = _previous(gid)
+
+    entries = []
+    for p in photos:
+        renditions = keys.get(p.id, {})
+        prev = previous.get(p.id)
+        if prev and prev.get("renditions", {}).get("thumb") == renditions.get("thumb") and "placeholder" in prev:
+            placeholder = prev["placeholder"]
+        else:
+            placeholder = _placeholder(renditions.get("thumb") or renditions.get("preview") or p.path_original)
+        entries.append({
+            "id": p.id,
+            "filename": p.filename,
+            "width": p.width,
+            "height": p.height,
+            "order_index": p.order_index,
+            "is_cover": bool(p.is_cover),
+            "placeholder": placeholder,
+            "renditions": renditions,
+        })
+
+    sprites = sprite_service.gallery_sheets(db, gid, "sprite", build=False) if photos else None
+    if photos and sprites is None:
+        sprite_service.schedule_build(gid, delay=0)
+    cover = next((e["id"] for e in entries if e["is_cover"]), entries[0]["id"] if entries else None)
+    return {
+        "format": MANIFEST_FORMAT,
+        "base_url": base_url(),
+        "gallery": {
+            "id": gallery.id,
+            "title": gallery.title,
+            "description": gallery.description,
+            "created_at": gallery.created_at.isoformat() if gallery.created_at else None,
+            "cover_photo_id": cover,
+            "photo_count": len(entries),
+        },
+        "photos": entries,
+        "sprites": sprites,
+    }
+
+
+def publish(db: Session, gallery_id: str) -> Optional[str]:
+    """
+    Write the gallery's manifest if its content changed; remove it if the
+    gallery is no longer public. Returns the published version.
+    """
+    gallery = db.get(Gallery, int(gallery_id))
+    if not is_publishable(gallery):
+        unpublish(gallery_id)
+        return None
+
+    manifest = build_manifest(db, gallery)
+    body = json.dumps(manifest, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    version = hashlib.sha256(body).hexdigest()[:16]
+    try:
+        current = json.loads(storage.read_bytes(manifest_key(gallery_id))).get("version")
+    except Exception:
+        current = None
+    if current == version:
+        return version
+
+    published = dict(manifest, version=version, published_at=datetime.now(timezone.utc).isoformat())
+    data = json.dumps(published, separators=(",", ":"), default=str).encode("utf-8")
+    storage.save_fileobj(io.BytesIO(data), versioned_manifest_key(gallery_id, version), content_type="application/json")
+    storage.save_fileobj(io.BytesIO(data), manifest_key(gallery_id), content_type="application/json")
+    _collect_superseded(gallery_id, version)
+    return version
+
+
+def _collect_superseded(gallery_id: str, current: str) -> None:
+    """
+    Delete versioned manifests whose successor was published more than
+    GALLERY_MANIFEST_RETAIN_SECONDS ago. The times come from each version's
+    own published_at, so no state is kept outside the bucket.
+    """
+    published = []
+    for key in storage.list_files(f"{gallery_id}/manifest/"):
+        try:
+            data = json.loads(storage.read_bytes(key))
+            published.append((datetime.fromisoformat(data["published_at"]), data.get("version"), key))
+        except Exception as e:
+            print(f"manifest: cannot read {key}: {e}")
+    published.sort()
+    now = datetime.now(timezone.utc)
+    for (_, version, key), (successor_at, _, _) in zip(published, published[1:]):
+        if version == current or (now - successor_at).total_seconds() < config.GALLERY_MANIFEST_RETAIN_SECONDS:
+            continue
+        try:
+            storage.delete(key)
+        except Exception as e:
+            print(f"manifest: cannot delete version {version} of gallery {gallery_id}: {e}")
+
+
+def unpublish(gallery_id: str) -> None:
+    for key in [manifest_key(gallery_id)] + storage.list_files(f"{gallery_id}/manifest/"):
+        try:
+            storage.delete(key)
+        except Exception:
+            pass
+
+
+# ---------- background publishing ----------
+
+def schedule_publish(gallery_id: str) -> None:
+    """Publish (or withdraw) the manifest once the gallery has stopped changing for GALLERY_MANIFEST_DELAY_SECONDS."""
+    gid = int(gallery_id)
+    debounce(gid, config.GALLERY_MANIFEST_DELAY_SECONDS, _publish, gid)
+
+
+def _publish(gallery_id: int) -> None:
+    db = SessionLocal()
+    try:
+        publish(db, str(gallery_id))
+    except Exception as e:
+        print(f"manifest for gallery {gallery_id} failed: {e}")
+    finally:
+        db.close()
@@ -1,5 +1,6 @@
 # backend/app/crud.py
 from sqlalchemy.orm import Session  #type: ignore
+from sqlalchemy import and_, or_, select  #type: ignore
 from typing import List, Optional, Dict, Any
 from app.gallery.models import gallery_model as models 
 from datetime import datetime
@@ -7,7 +8,11 @@ import uuid
 from app.auth.utils.password_hasher import get_password_hash, verify_password as verify_plain_password
 from pathlib import Path
 from app import config, images
-from app.gallery.utils.urls import url_from_path
+from app.gallery.models.favorite_model import Favorite
+from app.gallery.models.rendition_model import PhotoRendition
+from app.gallery.services import gallery_stats_service, rendition_service
+from app.gallery.utils.urls import urls_from_paths
+from app.storage import storage
 
 def set_gallery_password(db:Session, gallery_id:str, owner_id:str, password: Optional[str]) -> models.Gallery:
     gallery = db.query(models.Gallery).filter(models.Gallery.id == gallery_id, models.Gallery.owner_id == owner_id).first()
@@ -46,63 +51,161 @@ def list_galleries(db:Session) -> List[models.Gallery]:
     return db.query(models.Gallery).order_by(models.Gallery.created_at.desc()).all()
 
 def get_galleries_for_owner(db: Session, owner_id: str) -> List[models.Gallery]:
-    return db.query(models.Gallery).order_by(models.Gallery.created_at.desc()).all()
+    return (
+        db.query(models.Gallery)
+        .filter(models.Gallery.owner_id == owner_id)
+        .order_by(models.Gallery.created_at.desc(), models.Gallery.id.desc())
+        .all()
+    )
+
+def get_galleries_for_owner_with_cover(db: Session, owner_id: str, limit: int = 100, after: Optional[list] = None):
+    """
+    One keyset page of the owner's galleries, newest first, with their
+    stored counters and cover photo, in a single query and without any
+    aggregation. Cover URLs (thumb, else preview, else original) are
+    signed in one batch.
+
+    `after` is the (created_at as an ISO string, id) of the last gallery
+    of the previous page; the column is compared with it directly, id
+    breaking ties. Returns (galleries, next_after), next_after being None
+    on the last page.
+    """
+    G, P = models.Gallery, models.Photo
+    page = select(
+        G.id, G.title, G.description, G.is_public, G.created_at, G.cover_photo_id,
+        G.photo_count, G.total_bytes, G.favorites_total, G.last_activity_at,
+    ).where(G.owner_id == owner_id)
+    if after:
+        created_at, gallery_id = datetime.fromisoformat(after[0]), after[1]
+        page = page.where(or_(G.created_at < created_at, and_(G.created_at == created_at, G.id < gallery_id)))
+    page = page.order_by(G.created_at.desc(), G.id.desc()).limit(limit + 1).subquery()
+
+    rows = db.execute(
+        select(page, P.file_id, P.filename, P.path_original, P.width, P.height, P.is_cover)
+        .select_from(page.outerjoin(P, P.id == page.c.cover_photo_id))
+        .order_by(page.c.created_at.desc(), page.c.id.desc())
+    ).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    cover_ids = [r.cover_photo_id for r in rows if r.path_original is not None]
+    thumbs = rendition_service.get_renditions_for_photos(db, cover_ids, "thumb")
+    previews = rendition_service.get_renditions_for_photos(db, [i for i in cover_ids if i not in thumbs], "preview")
+
+    def cover_key(r) -> str:
+        found = thumbs.get(r.cover_photo_id) or previews.get(r.cover_photo_id)
+        return found.key if found else r.path_original
+
+    urls = iter(urls_from_paths([cover_key(r) for r in rows if r.path_original is not None]))
 
-def get_galleries_for_owner_with_cover(db: Session, owner_id: str) -> List[models.Gallery]:
-    galleries = get_galleries_for_owner(db, owner_id)
     out = []
-    for g in galleries:
-        cover = db.query(models.Photo).filter(models.Photo.gallery_id == g.id, models.Photo.is_cover == True).first()
-        if not cover:
-            # fallback: pick the earliest uploaded photo in the gallery
-            cover = db.query(models.Photo).filter(models.Photo.gallery_id == g.id).order_by(models.Photo.uploaded_at.asc()).first()
+    for r in rows:
         cover_photo_obj = None
         cover_url = None
-        if cover:
+        if r.path_original is not None:
             cover_photo_obj = {
-                "id": str(cover.id),
-                "file_id": getattr(cover, "file_id", None),
-                "filename": cover.filename,
-                "path_original": (cover.path_original),
-                "width": cover.width,
-                "height": cover.height,
-                "is_cover": bool(cover.is_cover),
+                "id": str(r.cover_photo_id),
+                "file_id": r.file_id,
+                "filename": r.filename,
+                "path_original": r.path_original,
+                "width": r.width,
+                "height": r.height,
+                "is_cover": bool(r.is_cover),
             }
-            # Prefer thumb -> preview -> original (converted to web path)
-            cover_url = (
-                url_from_path(cover.path_original)
-            )
-
-        # Build gallery dict. If crud returned ORM objects, convert essential fields.
-        # Try to be minimal and not rely on Pydantic models here.
-        gallery_obj = {
-            "id": str(g.id),
-            "title": getattr(g, "title", None),
-            "description": getattr(g, "description", None),
-            "is_public": bool(getattr(g, "is_public", False)),
-            "created_at": getattr(g, "created_at", None),
-            # include the cover details
+            cover_url = next(urls)
+        out.append({
+            "id": str(r.id),
+            "title": r.title,
+            "description": r.description,
+            "is_public": bool(r.is_public),
+            "created_at": r.created_at,
+            "photo_count": r.photo_count,
+            "total_bytes": r.total_bytes,
+            "favorites_total": r.favorites_total,
+            "last_activity_at": r.last_activity_at,
             "cover_photo": cover_photo_obj,
             "cover_url": cover_url,
-        }
-        out.append(gallery_obj)
+        })
 
-    return out
+    next_after = [rows[-1].created_at.isoformat(), rows[-1].id] if more and rows else None
+    return out, next_after
 
 
 
-def create_photo(db: Session, gallery_id: str, filename: str, ext: str, path_original: str, file_id: str | None = None):
+def create_photo(db: Session, gallery_id: str, filename: str, ext: str, path_original: str, file_id: str | None = None,
+                 commit: bool = True):
+    """
+    Add a photo row. With commit=False it is only flushed (so p.id is set)
+    and the caller commits it together with the rows that go with it.
+    """
     if file_id is None:
         file_id = str(uuid.uuid4())
     p = models.Photo(gallery_id=gallery_id, filename=filename, ext=ext, path_original=path_original)
     db.add(p)
-    db.commit()
-    db.refresh(p)
+    if commit:
+        db.commit()
+        db.refresh(p)
+    else:
+        db.flush()
     return p
 
 def list_photos(db: Session, gallery_id: str):
-    return db.query(models.Photo).filter(models.Photo.gallery_id == gallery_id).order_by(models.Photo.order_index).all()
+    return db.query(models.Photo).filter(models.Photo.gallery_id == gallery_id).order_by(models.Photo.order_index, models.Photo.id).all()
+
+# Photo columns the listing API can project with `fields=`; "thumb" and
+# "preview" are URLs resolved from the rendition manifest.
+PHOTO_FIELDS = ("id", "file_id", "filename", "width", "height", "order_index", "is_cover", "uploaded_at")
+PHOTO_URL_FIELDS = ("thumb", "preview")
+
+
+def list_photos_page(db: Session, gallery_id: str, limit: int, after: Optional[list] = None,
+                     photo_ids: Optional[List[int]] = None, columns: Optional[List[str]] = None):
+    """
+    Keyset page of a gallery's photos ordered by (order_index, id), as
+    lightweight Core rows of the Photo `columns` named (default
+    PHOTO_FIELDS); id and order_index are always included for the cursor.
+    `after` is the (order_index, id) of the last photo of the previous page.
+    Returns up to limit + 1 rows so the caller can tell whether more remain.
+    """
+    P = models.Photo
+    names = dict.fromkeys(("id", "order_index", *(columns or PHOTO_FIELDS)))
+    q = select(*(getattr(P, n) for n in names)).where(P.gallery_id == gallery_id)
+    if photo_ids is not None:
+        q = q.where(P.id.in_(photo_ids))
+    if after:
+        order_index, photo_id = after
+        q = q.where(or_(
+            P.order_index > order_index,
+            and_(P.order_index == order_index, P.id > photo_id),
+        ))
+    return db.execute(q.order_by(P.order_index, P.id).limit(limit + 1)).all()
+
+
+def set_cover_photo(db: Session, photo: models.Photo) -> None:
+    db.query(models.Photo).filter(
+        models.Photo.gallery_id == photo.gallery_id, models.Photo.id != photo.id, models.Photo.is_cover.is_(True),
+    ).update({models.Photo.is_cover: False}, synchronize_session="fetch")
+    photo.is_cover = True
+    gallery_stats_service.cover_set(db, photo.gallery_id, photo.id)
+    db.commit()
+
+
+def delete_photo(db: Session, photo: models.Photo) -> None:
+    """Delete a photo with its favorites, renditions and stored objects."""
+    keys = {photo.path_original} | {
+        k for (k,) in db.query(PhotoRendition.key).filter(PhotoRendition.photo_id == photo.id).all()
+    }
+    gallery_stats_service.photo_removed(db, photo)
+    db.query(Favorite).filter(Favorite.photo_id == photo.id).delete(synchronize_session=False)
+    db.query(PhotoRendition).filter(PhotoRendition.photo_id == photo.id).delete(synchronize_session=False)
+    db.delete(photo)
+    db.commit()
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            print(f"cannot delete {key}: {e}")
 
 
 def get_photo(db: Session, gallery_id: str, photo_id: str):
-    return db.query(models.Photo).filter(models.Photo.id == photo_id).first()
\ No newline at end of file
+    return db.query(models.Photo).filter(models.Photo.id == photo_id, models.Photo.gallery_id == gallery_id).first()
\ No newline at end of file
@@ -0,0 +1,157 @@
+# app/gallery/services/gallery_stats_service.py
+from __future__ import annotations
+from typing import Dict, List
+from sqlalchemy import and_, case, func, select, update  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app.gallery.models.favorite_model import Favorite
+from app.gallery.models.gallery_model import Gallery, Photo
+from app.gallery.models.rendition_model import PhotoRendition
+
+# Gallery.photo_count, total_bytes, favorites_total, cover_photo_id and
+# last_activity_at are updated by the paths that change them, inside the
+# caller's transaction (nothing here commits), with relative UPDATEs so
+# concurrent writers don't lose each other's increments. reconcile()
+# repairs whatever drifts anyway.
+
+# galleries checked per reconcile transaction
+RECONCILE_BATCH_SIZE = 500
+
+COUNTERS = ("photo_count", "total_bytes", "favorites_total", "cover_photo_id")
+
+
+def _cover_order():
+    # the flagged cover, else the earliest upload
+    return (case((Photo.is_cover.is_(True), 0), else_=1), Photo.uploaded_at, Photo.id)
+
+
+def _bump(db: Session, gallery_id: int, **values) -> None:
+    db.execute(
+        update(Gallery)
+        .where(Gallery.id == int(gallery_id))
+        .values(last_activity_at=func.now(), **values)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def photo_added(db: Session, gallery_id: int, photo_id: int, nbytes: int | None) -> None:
+    _bump(
+        db, gallery_id,
+        photo_count=Gallery.photo_count + 1,
+        total_bytes=Gallery.total_bytes + (nbytes or 0),
+        cover_photo_id=func.coalesce(Gallery.cover_photo_id, photo_id),
+    )
+
+
+def photo_removed(db: Session, photo: Photo) -> None:
+    """Call before the photo, its renditions and favorites are deleted."""
+    nbytes = db.query(func.coalesce(func.sum(PhotoRendition.bytes), 0)).filter(
+        PhotoRendition.photo_id == photo.id, PhotoRendition.kind == "original",
+    ).scalar()
+    favorites = db.query(func.count(Favorite.id)).filter(Favorite.photo_id == photo.id).scalar()
+    next_cover = (
+        select(Photo.id)
+        .where(Photo.gallery_id == photo.gallery_id, Photo.id != photo.id)
+        .order_by(*_cover_order())
+        .limit(1)
+        .scalar_subquery()
+    )
+    _bump(
+        db, photo.gallery_id,
+        photo_count=Gallery.photo_count - 1,
+        total_bytes=Gallery.total_bytes - nbytes,
+        favorites_total=Gallery.favorites_total - favorites,
+        cover_photo_id=case((Gallery.cover_photo_id == photo.id, next_cover), else_=Gallery.cover_photo_id),
+    )
+
+
+def favorites_changed(db: Session, gallery_id: int, delta: int) -> None:
+    if delta:
+        _bump(db, gallery_id, favorites_total=Gallery.favorites_total + delta)
+
+
+def cover_set(db: Session, gallery_id: int, photo_id: int) -> None:
+    _bump(db, gallery_id, cover_photo_id=photo_id)
+
+
+# ---------- reconciliation ----------
+
+def actual_counters(db: Session, gallery_ids: List[int]) -> Dict[int, dict]:
+    """Counters of the galleries recomputed from photos, renditions and favorites."""
+    out = {gid: {"photo_count": 0, "total_bytes": 0, "favorites_total": 0, "cover_photo_id": None}
+           for gid in gallery_ids}
+    if not gallery_ids:
+        return out
+
+    for gid, n in db.execute(
+        select(Photo.gallery_id, func.count(Photo.id))
+        .where(Photo.gallery_id.in_(gallery_ids))
+        .group_by(Photo.gallery_id)
+    ):
+        out[gid]["photo_count"] = n
+    for gid, n in db.execute(
+        select(Photo.gallery_id, func.coalesce(func.sum(PhotoRendition.bytes), 0))
+        .join(PhotoRendition, and_(PhotoRendition.photo_id == Photo.id, PhotoRendition.kind == "original"))
+        .where(Photo.gallery_id.in_(gallery_ids))
+        .group_by(Photo.gallery_id)
+    ):
+        out[gid]["total_bytes"] = int(n)
+    for gid, n in db.execute(
+        select(Favorite.gallery_id, func.count(Favorite.id))
+        .where(Favorite.gallery_id.in_(gallery_ids))
+        .group_by(Favorite.gallery_id)
+    ):
+        out[gid]["favorites_total"] = n
+
+    rank = func.row_number().over(partition_by=Photo.gallery_id, order_by=_cover_order()).label("rank")
+    ranked = select(Photo.gallery_id, Photo.id, rank).where(Photo.gallery_id.in_(gallery_ids)).subquery()
+    for gid, pid in db.execute(select(ranked.c.gallery_id, ranked.c.id).where(ranked.c.rank == 1)):
+        out[gid]["cover_photo_id"] = pid
+    return out
+
+
+def reconcile(db: Session, batch_size: int = RECONCILE_BATCH_SIZE) -> dict:
+    """
+    Compare every gallery's stored counters with the real figures, a batch
+    of galleries per transaction, and repair the ones that drifted. A
+    repair only applies if the stored values are still the ones read, so a
+    concurrent upload or favorite is never overwritten; such a gallery is
+    picked up by the next run.
+    """
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        stored = db.execute(
+            select(Gallery.id, *(getattr(Gallery, c) for c in COUNTERS))
+            .where(Gallery.id > last_id)
+            .order_by(Gallery.id)
+            .limit(batch_size)
+        ).all()
+        if not stored:
+            break
+        last_id = stored[-1].id
+        actual = actual_counters(db, [r.id for r in stored])
+        for r in stored:
+            want = actual[r.id]
+            if all(getattr(r, c) == want[c] for c in COUNTERS):
+                continue
+            unchanged = [getattr(Gallery, c).is_(None) if getattr(r, c) is None else getattr(Gallery, c) == getattr(r, c)
+                         for c in COUNTERS]
+            res = db.execute(
+                update(Gallery).where(Gallery.id == r.id, *unchanged).values(**want)
+                .execution_options(synchronize_session=False)
+            )
+            if res.rowcount:
+                repaired += 1
+                print(f"gallery stats: repaired gallery {r.id}: {dict(zip(COUNTERS, r[1:]))} -> {want}")
+        db.commit()
+        checked += len(stored)
+    return {"checked": checked, "repaired": repaired}
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(reconcile(db))
+    finally:
+        db.close()
@@ -24,3 +24,48 @@ def rel_media_path(abs_path: Path) -> str:
     abs_path = abs_path.resolve()
     root = config.MEDIA_ROOT.resolve()
     return "/media/" + abs_path.relative_to(root).as_posix()
+
+
+# ---------- storage keys ----------
+
+RENDITIONS = ("original", "preview", "thumb")  # plus config.DOWNLOAD_SIZES
+
+
+def is_valid_rendition(rendition: str) -> bool:
+    return rendition in RENDITIONS or rendition in config.DOWNLOAD_SIZES
+
+
+def rendition_key(photo, rendition: str) -> str:
+    """
+    Storage key for a photo rendition, matching what the image pipeline writes.
+    """
+    gallery_id = str(photo.gallery_id)
+    file_id = str(photo.filename or photo.id)
+    if rendition == "original":
+        return photo.path_original
+    if rendition == "preview":
+        return f"{gallery_id}/previews/{file_id}"
+    if rendition == "thumb":
+        return f"{gallery_id}/thumbs/{file_id}"
+    return f"{gallery_id}/downloads/{rendition}/{file_id}"
+
+
+def watermarked_key(gallery_id: str, file_id: str, rendition: str, wm_hash: str) -> str:
+    """
+    Storage key for a watermarked rendition rendered with brand settings
+    `wm_hash` (brand.service.settings_hash). The hash is part of the key, so
+    a settings change writes new objects instead of overwriting ones that
+    signed URLs and caches may still point at.
+    """
+    if rendition == "preview":
+        folder = "previews"
+    elif rendition == "thumb":
+        folder = "thumbs"
+    else:
+        folder = f"downloads/{rendition}"
+    return f"{gallery_id}/{folder}/{wm_hash}/{file_id}"
+
+
+def resized_key(gallery_id: str, file_id: str, width: int, fmt: str, wm_hash: str) -> str:
+    """Storage key for an on-the-fly resize (see watermarked_key)."""
+    return f"{gallery_id}/resized/{wm_hash}/{width}/{file_id}.{fmt}"
@@ -0,0 +1,79 @@
+# app/gallery/services/rendition_policy_service.py
+from __future__ import annotations
+from typing import Dict, List, Optional
+from app import config
+from app.database import SessionLocal
+from app.gallery.models.gallery_model import Gallery, Photo
+from app.brand.service import get_settings, settings_hash
+from app.gallery.utils.debounce import debounce
+
+# eager: rendered by the image pipeline at upload
+# lazy: rendered on first request (download, ZIP)
+# prewarm: rendered in the background once a public gallery stops changing
+MODES = ("eager", "lazy", "prewarm")
+DEFAULT_MODE = "lazy"
+
+
+def validate_policy(policy: Dict[str, str]) -> Dict[str, str]:
+    """Raises ValueError for unknown sizes or modes."""
+    for size, mode in policy.items():
+        if size not in config.DOWNLOAD_SIZES:
+            raise ValueError(f"Unsupported size: {size}")
+        if mode not in MODES:
+            raise ValueError(f"Unsupported mode for {size}: {mode}")
+    return dict(policy)
+
+
+def default_policy() -> Dict[str, str]:
+    policy = {}
+    for size in config.DOWNLOAD_SIZES:
+        mode = config.RENDITION_POLICY.get(size)
+        policy[size] = mode if mode in MODES else DEFAULT_MODE
+    return policy
+
+
+def policy_for(gallery: Optional[Gallery]) -> Dict[str, str]:
+    """Mode of every download size for `gallery`: its overrides on top of the default."""
+    policy = default_policy()
+    for size, mode in ((getattr(gallery, "rendition_policy", None) or {}).items()):
+        if size in policy and mode in MODES:
+            policy[size] = mode
+    return policy
+
+
+def sizes_with_mode(policy: Dict[str, str], mode: str) -> List[str]:
+    return [size for size, m in policy.items() if m == mode]
+
+
+# ---------- prewarming ----------
+
+def schedule_prewarm(gallery_id: str) -> None:
+    """
+    Render the gallery's "prewarm" sizes once it has stopped changing for
+    RENDITION_PREWARM_DELAY_SECONDS, like zip_build_service.schedule_prebuild.
+    """
+    gid = int(gallery_id)
+    debounce(gid, config.RENDITION_PREWARM_DELAY_SECONDS, _prewarm, gid)
+
+
+def _prewarm(gallery_id: int) -> None:
+    from app.gallery.utils.download_helper import ensure_cached_download_for_photo
+    db = SessionLocal()
+    try:
+        gallery = db.get(Gallery, gallery_id)
+        if gallery is None or not gallery.is_public or gallery.status != "active":
+            return
+        sizes = sizes_with_mode(policy_for(gallery), "prewarm")
+        if not sizes:
+            return
+        wm_hash = settings_hash(get_settings(db))
+        photos = db.query(Photo).filter(Photo.gallery_id == gallery_id).order_by(Photo.order_index, Photo.id).all()
+        for p in photos:
+            for size in sizes:
+                try:
+                    ensure_cached_download_for_photo(db, p, size, wm_hash=wm_hash)
+                except Exception as e:
+                    db.rollback()
+                    print(f"prewarm: photo {p.id} {size} failed: {e}")
+    finally:
+        db.close()
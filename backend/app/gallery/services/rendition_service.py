@@ -0,0 +1,137 @@
+# app/gallery/services/rendition_service.py
+from sqlalchemy.orm import Session  #type: ignore
+from sqlalchemy import and_  #type: ignore
+from typing import Dict, List, Optional, Tuple
+import zlib
+from app import config
+from app.gallery.models.gallery_model import Photo
+from app.gallery.models.rendition_model import PhotoRendition
+from app.gallery.services.paths import rendition_key
+
+
+def file_crc32(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def rendition_spec(rendition: str) -> Tuple[str, str]:
+    """
+    Map a public rendition name to its manifest (kind, size).
+      "original" / "preview" / "thumb" -> (name, "")
+      "large" / "medium" / ...         -> ("download", name)
+    """
+    if rendition in ("original", "preview", "thumb"):
+        return rendition, ""
+    if rendition in config.DOWNLOAD_SIZES:
+        return "download", rendition
+    raise ValueError("Unsupported rendition")
+
+
+def record_rendition(
+    db: Session,
+    photo_id: int,
+    kind: str,
+    key: str,
+    size: str = "",
+    format: str = "jpeg",
+    bytes: Optional[int] = None,
+    crc32: Optional[int] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    settings_hash: Optional[str] = None,
+    commit: bool = True,
+) -> PhotoRendition:
+    """
+    Insert or update the manifest row for (photo, kind, size, format).
+    """
+    r = db.query(PhotoRendition).filter(
+        PhotoRendition.photo_id == photo_id,
+        PhotoRendition.kind == kind,
+        PhotoRendition.size == size,
+        PhotoRendition.format == format,
+    ).first()
+    if not r:
+        r = PhotoRendition(photo_id=photo_id, kind=kind, size=size, format=format)
+    r.key = key
+    r.bytes = bytes
+    r.crc32 = crc32
+    r.width = width
+    r.height = height
+    r.settings_hash = settings_hash
+    db.add(r)
+    if commit:
+        db.commit()
+        db.refresh(r)
+    return r
+
+
+def _default_format(kind: str) -> Optional[str]:
+    # originals keep the uploaded format; everything we render is JPEG
+    return None if kind == "original" else "jpeg"
+
+
+def get_rendition(db: Session, photo_id: int, kind: str, size: str = "", format: Optional[str] = "") -> Optional[PhotoRendition]:
+    """
+    format "" picks the kind's default; None matches any format.
+    """
+    if format == "":
+        format = _default_format(kind)
+    q = db.query(PhotoRendition).filter(
+        PhotoRendition.photo_id == photo_id,
+        PhotoRendition.kind == kind,
+        PhotoRendition.size == size,
+    )
+    if format is not None:
+        q = q.filter(PhotoRendition.format == format)
+    return q.first()
+
+
+def get_renditions_for_photos(db: Session, photo_ids: List[int], kind: str, size: str = "", format: Optional[str] = "") -> Dict[int, PhotoRendition]:
+    if not photo_ids:
+        return {}
+    if format == "":
+        format = _default_format(kind)
+    q = db.query(PhotoRendition).filter(
+        PhotoRendition.photo_id.in_(photo_ids),
+        PhotoRendition.kind == kind,
+        PhotoRendition.size == size,
+    )
+    if format is not None:
+        q = q.filter(PhotoRendition.format == format)
+    return {r.photo_id: r for r in q.all()}
+
+
+# Photo columns keys_for_photos reads, for callers passing Core rows
+KEY_COLUMNS = ("id", "gallery_id", "filename", "path_original")
+
+
+def keys_for_photos(db: Session, photos: List[Photo], rendition: str) -> List[str]:
+    """
+    Storage keys for `rendition` of each photo, from the manifest in one
+    query; photos predating the manifest fall back to the conventional key.
+    `photos` may be ORM objects or rows with KEY_COLUMNS.
+    """
+    kind, size = rendition_spec(rendition)
+    found = get_renditions_for_photos(db, [p.id for p in photos], kind, size)
+    return [found[p.id].key if p.id in found else rendition_key(p, rendition) for p in photos]
+
+
+def missing_renditions(db: Session, gallery_id: int, kind: str, size: str = "", format: Optional[str] = "") -> List[Photo]:
+    """
+    Photos of a gallery that have no manifest row for (kind, size, format).
+    """
+    if format == "":
+        format = _default_format(kind)
+    cond = [PhotoRendition.photo_id == Photo.id, PhotoRendition.kind == kind, PhotoRendition.size == size]
+    if format is not None:
+        cond.append(PhotoRendition.format == format)
+    return (
+        db.query(Photo)
+        .outerjoin(PhotoRendition, and_(*cond))
+        .filter(Photo.gallery_id == gallery_id, PhotoRendition.id.is_(None))
+        .order_by(Photo.order_index, Photo.id)
+        .all()
+    )
@@ -0,0 +1,95 @@
+# app/gallery/services/rendition_usage_service.py
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import atexit, threading
+from sqlalchemy import func  #type: ignore
+from sqlalchemy.exc import IntegrityError  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app import config
+from app.database import SessionLocal
+from app.gallery.models.rendition_usage_model import RenditionUsage
+
+# Counted in memory and written out by a daemon timer at most every
+# RENDITION_USAGE_FLUSH_SECONDS, so serving a request never waits on a
+# counter update.
+_lock = threading.Lock()
+_pending: Dict[str, List[int]] = {}  # rendition -> [requests, generated]
+_timer: Optional[threading.Timer] = None
+
+
+def record_usage(rendition: str, requests: int = 1, generated: int = 0) -> None:
+    global _timer
+    with _lock:
+        c = _pending.setdefault(rendition, [0, 0])
+        c[0] += requests
+        c[1] += generated
+        if _timer is None:
+            # the first count since the last flush arms the next one
+            _timer = threading.Timer(config.RENDITION_USAGE_FLUSH_SECONDS, _timed_flush)
+            _timer.daemon = True
+            _timer.start()
+
+
+def _timed_flush() -> None:
+    global _timer
+    with _lock:
+        _timer = None
+    flush_usage()
+
+
+def _add(db: Session, day: date, rendition: str, requests: int, generated: int) -> None:
+    q = db.query(RenditionUsage).filter(RenditionUsage.day == day, RenditionUsage.rendition == rendition)
+    values = {RenditionUsage.requests: RenditionUsage.requests + requests,
+              RenditionUsage.generated: RenditionUsage.generated + generated}
+    if q.update(values, synchronize_session=False):
+        db.commit()
+        return
+    db.add(RenditionUsage(day=day, rendition=rendition, requests=requests, generated=generated))
+    try:
+        db.commit()
+    except IntegrityError:
+        # another worker created today's row first
+        db.rollback()
+        q.update(values, synchronize_session=False)
+        db.commit()
+
+
+def flush_usage() -> None:
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return
+    db = SessionLocal()
+    try:
+        today = date.today()
+        for rendition, (requests, generated) in pending.items():
+            _add(db, today, rendition, requests, generated)
+    except Exception as e:
+        db.rollback()
+        print(f"rendition usage: cannot write counters: {e}")
+    finally:
+        db.close()
+
+
+atexit.register(flush_usage)
+
+
+def usage_stats(db: Session, days: int = 30) -> Dict[str, dict]:
+    """
+    Requests and renders per rendition over the last `days` days, including
+    counts not written out yet.
+    """
+    flush_usage()
+    since = date.today() - timedelta(days=max(0, days - 1))
+    rows = (
+        db.query(RenditionUsage.rendition, func.sum(RenditionUsage.requests), func.sum(RenditionUsage.generated))
+        .filter(RenditionUsage.day >= since)
+        .group_by(RenditionUsage.rendition)
+        .all()
+    )
+    return {
+        rendition: {"requests": int(requests or 0), "generated": int(generated or 0)}
+        for rendition, requests, generated in rows
+    }
@@ -0,0 +1,240 @@
+# app/gallery/services/sprite_service.py
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import hashlib, io, json, os, re, tempfile
+from PIL import Image, ImageDraw, ImageFont  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app import config
+from app.brand.service import get_settings, settings_hash
+from app.database import SessionLocal
+from app.gallery.models.gallery_model import Photo
+from app.gallery.services import gallery_service as crud
+from app.gallery.services import rendition_service
+from app.gallery.utils.debounce import debounce
+from app.gallery.utils.prefetch import prefetch_ordered
+from app.gallery.utils.single_flight import single_flight
+from app.images import RESAMPLE, make_thumb
+from app.storage import storage
+
+# A gallery is cut into consecutive sheets of columns x rows photos in
+# gallery order. Each sheet is stored under a digest of its layout, the
+# watermark settings and its photos, next to a JSON list of tile rects, so
+# adding photos at the end only rebuilds the last sheet and a reorder only
+# the sheets whose photos moved.
+
+
+class SheetLayout(NamedTuple):
+    name: str
+    columns: int
+    rows: int
+    tile: int      # tiles are square; photos are fitted inside
+    gap: int       # margin around and between tiles
+    caption: int   # height of the filename strip under a tile; 0 for none
+    fmt: str
+    quality: int
+
+
+LAYOUTS: Dict[str, SheetLayout] = {
+    # grid sprites: thumbs packed edge to edge
+    "sprite": SheetLayout("sprite", config.SPRITE_COLUMNS, config.SPRITE_ROWS, config.SPRITE_TILE,
+                          0, 0, config.SPRITE_FORMAT, 80),
+    # contact sheets: bigger tiles on white with the filename under each
+    "contact": SheetLayout("contact", config.CONTACT_SHEET_COLUMNS, config.CONTACT_SHEET_ROWS,
+                           config.CONTACT_SHEET_TILE, 16, 24, "jpeg", 85),
+}
+
+class SheetPlan(NamedTuple):
+    digest: str
+    photos: List[Tuple[Photo, str, bool]]  # (photo, source key, source is a watermarked thumb)
+
+
+def _prefix(gallery_id: str, layout: SheetLayout) -> str:
+    return f"{gallery_id}/sprites/{layout.name}/"
+
+
+def sheet_key(gallery_id: str, layout: SheetLayout, digest: str) -> str:
+    return f"{_prefix(gallery_id, layout)}{digest}.{layout.fmt}"
+
+
+def _tiles_key(gallery_id: str, layout: SheetLayout, digest: str) -> str:
+    return f"{_prefix(gallery_id, layout)}{digest}.json"
+
+
+def plan_sheets(db: Session, gallery_id: str, layout: SheetLayout) -> List[SheetPlan]:
+    """
+    The gallery's sheets for `layout`. Tiles come from each photo's thumb
+    rendition, or from its original for photos without one.
+    """
+    photos = crud.list_photos(db, gallery_id) or []
+    thumbs = rendition_service.get_renditions_for_photos(db, [p.id for p in photos], "thumb")
+    wm_hash = settings_hash(get_settings(db))
+    per_sheet = max(1, layout.columns * layout.rows)
+
+    plans: List[SheetPlan] = []
+    for i in range(0, len(photos), per_sheet):
+        h = hashlib.sha256(f"{tuple(layout)}\n{wm_hash}\n".encode("utf-8"))
+        items = []
+        for p in photos[i:i + per_sheet]:
+            t = thumbs.get(p.id)
+            src, is_thumb = (t.key, True) if t else (p.path_original, False)
+            items.append((p, src, is_thumb))
+            caption = p.filename if layout.caption else ""
+            h.update(f"{p.id}\0{src}\0{caption}\n".encode("utf-8"))
+        plans.append(SheetPlan(h.hexdigest()[:16], items))
+    return plans
+
+
+def _tile_image(data: bytes, is_thumb: bool, tile: int, db: Session) -> Image.Image:
+    if is_thumb:
+        im = Image.open(io.BytesIO(data)).convert("RGB")
+        im.thumbnail((tile, tile), RESAMPLE)
+        return im
+    # an original: orient, shrink and watermark it like a thumb
+    with tempfile.TemporaryDirectory() as td:
+        src, out = os.path.join(td, "original"), os.path.join(td, "tile.jpg")
+        with open(src, "wb") as f:
+            f.write(data)
+        make_thumb(src, out, tile, db)
+        return Image.open(out).convert("RGB")
+
+
+def _render_sheet(db: Session, gallery_id: str, layout: SheetLayout, plan: SheetPlan) -> dict:
+    n = len(plan.photos)
+    cols = min(layout.columns, n)
+    rows = -(-n // layout.columns)
+    cell_w = layout.tile + layout.gap
+    cell_h = layout.tile + layout.caption + layout.gap
+    width, height = layout.gap + cols * cell_w, layout.gap + rows * cell_h
+    sheet = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet) if layout.caption else None
+    font = ImageFont.load_default() if layout.caption else None
+
+    tiles = []
+    fetched = prefetch_ordered(
+        plan.photos, lambda item: storage.read_bytes(item[1]),
+        config.ZIP_PREFETCH_CONCURRENCY, config.ZIP_PREFETCH_BUFFER_BYTES,
+    )
+    for i, ((p, src, is_thumb), data, err) in enumerate(fetched):
+        if err is not None:
+            # left out of the atlas; the client falls back to the photo's own thumb
+            print(f"sprites: cannot read {src} for photo {p.id}: {err}")
+            continue
+        try:
+            im = _tile_image(data, is_thumb, layout.tile, db)
+        except Exception as e:
+            print(f"sprites: cannot decode {src} for photo {p.id}: {e}")
+            continue
+        x0 = layout.gap + (i % layout.columns) * cell_w
+        y0 = layout.gap + (i // layout.columns) * cell_h
+        x, y = x0 + (layout.tile - im.width) // 2, y0 + (layout.tile - im.height) // 2
+        sheet.paste(im, (x, y))
+        tiles.append({"photo_id": p.id, "x": x, "y": y, "w": im.width, "h": im.height})
+        if draw:
+            name = p.filename or str(p.id)
+            while len(name) > 4 and draw.textlength(name, font=font) > layout.tile:
+                name = name[:-4] + "..."
+            draw.text((x, y + im.height + 4), name, fill=(80, 80, 80), font=font)
+
+    buf = io.BytesIO()
+    if layout.fmt == "jpeg":
+        sheet.save(buf, "JPEG", quality=layout.quality, optimize=True, progressive=True)
+    else:
+        sheet.save(buf, layout.fmt.upper(), quality=layout.quality)
+    buf.seek(0)
+    storage.save_fileobj(buf, sheet_key(gallery_id, layout, plan.digest), content_type=f"image/{layout.fmt}")
+
+    meta = {"width": width, "height": height, "tiles": tiles}
+    # written last: its presence means the sheet is complete
+    storage.save_fileobj(io.BytesIO(json.dumps(meta).encode("utf-8")),
+                         _tiles_key(gallery_id, layout, plan.digest), content_type="application/json")
+    return meta
+
+
+def _ensure_sheet(db: Session, gallery_id: str, layout: SheetLayout, plan: SheetPlan) -> dict:
+    tiles_key = _tiles_key(gallery_id, layout, plan.digest)
+
+    def load_or_render() -> dict:
+        if storage.exists(tiles_key):
+            return json.loads(storage.read_bytes(tiles_key))
+        return _render_sheet(db, gallery_id, layout, plan)
+
+    if storage.exists(tiles_key):
+        return json.loads(storage.read_bytes(tiles_key))
+    return single_flight.do(f"sprite:{gallery_id}:{layout.name}:{plan.digest}", load_or_render)
+
+
+def gallery_sheets(db: Session, gallery_id: str, layout_name: str = "sprite", build: bool = True) -> Optional[dict]:
+    """
+    Atlas of the gallery's sheets for a layout, rendering any that are
+    missing:
+      {layout, tile, columns, rows,
+       sheets: [{key, width, height, tiles: [{photo_id, x, y, w, h}]}]}
+    With build=False nothing is rendered, and None is returned if a sheet
+    is missing (see schedule_build).
+    """
+    layout = LAYOUTS[layout_name]
+    sheets = []
+    for plan in plan_sheets(db, gallery_id, layout):
+        if build:
+            meta = _ensure_sheet(db, gallery_id, layout, plan)
+        else:
+            tiles_key = _tiles_key(gallery_id, layout, plan.digest)
+            if not storage.exists(tiles_key):
+                return None
+            meta = json.loads(storage.read_bytes(tiles_key))
+        sheets.append({"key": sheet_key(gallery_id, layout, plan.digest), **meta})
+    return {
+        "layout": layout.name,
+        "tile": layout.tile,
+        "columns": layout.columns,
+        "rows": layout.rows,
+        "sheets": sheets,
+    }
+
+
+def _collect_stale(db: Session, gallery_id: str, layout: SheetLayout) -> int:
+    """Delete sheets of the layout that the gallery's current plan no longer uses."""
+    keep = {p.digest for p in plan_sheets(db, gallery_id, layout)}
+    pattern = re.compile(r"([0-9a-f]{16})\.(json|\w+)$")
+    deleted = 0
+    for key in storage.list_files(_prefix(gallery_id, layout)):
+        m = pattern.search(key)
+        if m and m.group(1) not in keep:
+            try:
+                storage.delete(key)
+                deleted += 1
+            except Exception as e:
+                print(f"sprites: cannot delete {key}: {e}")
+    return deleted
+
+
+# ---------- background rebuilds ----------
+
+def schedule_build(gallery_id: str, layout_name: str = "sprite", delay: Optional[float] = None) -> None:
+    """
+    Rebuild the gallery's sheets for a layout once it has stopped changing
+    for SPRITE_BUILD_DELAY_SECONDS (or `delay`) and drop sheets it no longer
+    uses. A call with an explicit `delay` (a viewer asking for a missing
+    sheet) leaves an already pending build alone, so polling can't keep
+    postponing it.
+    """
+    gid = int(gallery_id)
+    debounce((gid, layout_name), config.SPRITE_BUILD_DELAY_SECONDS if delay is None else delay,
+             _build, gid, layout_name, keep_pending=delay is not None)
+
+
+def _build(gallery_id: int, layout_name: str = "sprite") -> None:
+    db = SessionLocal()
+    try:
+        gallery_sheets(db, str(gallery_id), layout_name)
+        for layout in LAYOUTS.values():
+            _collect_stale(db, str(gallery_id), layout)
+    except Exception as e:
+        print(f"sprites for gallery {gallery_id} failed: {e}")
+        return
+    finally:
+        db.close()
+    if layout_name == "sprite":
+        # the published manifest lists the sprite sheets
+        from app.gallery.services import gallery_manifest_service
+        gallery_manifest_service.schedule_publish(str(gallery_id))
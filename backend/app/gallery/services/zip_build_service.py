@@ -0,0 +1,227 @@
+# app/gallery/services/zip_build_service.py
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import threading, time
+from sqlalchemy import func  #type: ignore
+from sqlalchemy.exc import IntegrityError  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app import config
+from app.database import SessionLocal
+from app.gallery.models.gallery_model import Gallery
+from app.gallery.models.zip_build_model import ZipBuild
+from app.gallery.services.gallery_download_service import zip_digest, zip_filename
+from app.gallery.utils.debounce import debounce
+from app.gallery.utils.single_flight import GenerationInProgress, process_lock
+from app.gallery.utils.zip_gcs import ensure_zip_in_gcs, signed_zip_url
+from app.storage import storage
+
+# Builds run on a small in-process pool; a row per (gallery, size, part, digest)
+# is the coalescing point and what the status endpoint reports.
+_executor = ThreadPoolExecutor(max_workers=max(1, config.ZIP_BUILD_WORKERS), thread_name_prefix="zip-build")
+_lock = threading.Lock()
+_inflight: Dict[int, Future] = {}            # build id -> running/queued job
+
+# don't write progress to the DB more often than this
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def _find(db: Session, gallery_id: int, size: str, part: int, digest: str) -> Optional[ZipBuild]:
+    return db.query(ZipBuild).filter(
+        ZipBuild.gallery_id == gallery_id,
+        ZipBuild.size == size,
+        ZipBuild.part == part,
+        ZipBuild.digest == digest,
+    ).first()
+
+
+def _is_stale(b: ZipBuild) -> bool:
+    """A queued/building row nobody in this process runs and nobody has touched lately."""
+    if b.status not in ("queued", "building") or b.id in _inflight:
+        return False
+    updated = b.updated_at or b.created_at
+    if updated is None:
+        return True
+    if updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - updated).total_seconds() > config.ZIP_BUILD_STALE_SECONDS
+
+
+def current_build(db: Session, gallery_id: str, size: str, part: Optional[int] = None) -> Optional[ZipBuild]:
+    return _find(db, int(gallery_id), size, part or 0, zip_digest(db, gallery_id, size, part))
+
+
+def request_build(db: Session, gallery_id: str, size: str, part: Optional[int] = None,
+                  notify_email: Optional[str] = None) -> ZipBuild:
+    """
+    Return the build of the gallery's current content at `size` (or of one
+    part of it), queueing it unless it is already queued, running or ready.
+    Concurrent callers get the same row; a failed or abandoned build is
+    queued again.
+    """
+    gid = int(gallery_id)
+    digest = zip_digest(db, gallery_id, size, part)
+    b = _find(db, gid, size, part or 0, digest)
+    if b is None:
+        b = ZipBuild(gallery_id=gid, size=size, part=part or 0, digest=digest, status="queued",
+                     entries_done=0, bytes_done=0, notify_email=notify_email)
+        db.add(b)
+        try:
+            db.commit()
+        except IntegrityError:
+            # someone else inserted it first
+            db.rollback()
+            b = _find(db, gid, size, part or 0, digest)
+        db.refresh(b)
+
+    if b.status == "ready" and not (b.key and storage.exists(b.key)):
+        b.status = "queued"  # archive was collected since; build it again
+    if b.status == "failed" or _is_stale(b):
+        b.status = "queued"
+        b.error = None
+    if notify_email and b.notify_email != notify_email:
+        b.notify_email = notify_email
+    db.commit()
+
+    if b.status == "ready":
+        if notify_email:
+            _executor.submit(_notify, b.id)
+        return b
+    _submit(b.id)
+    return b
+
+
+def _submit(build_id: int) -> None:
+    with _lock:
+        if build_id in _inflight:
+            return
+        fut = _executor.submit(_run, build_id)
+        _inflight[build_id] = fut
+
+    def _done(_):
+        with _lock:
+            _inflight.pop(build_id, None)
+    fut.add_done_callback(_done)
+
+
+def _run(build_id: int) -> None:
+    # only one worker (across processes) builds a given archive; the others
+    # leave the shared row to it
+    try:
+        with process_lock(f"zip-build:{build_id}", wait=False):
+            _build(build_id)
+    except GenerationInProgress:
+        return
+
+
+def _build(build_id: int) -> None:
+    db = SessionLocal()
+    try:
+        b = db.get(ZipBuild, build_id)
+        if b is None or b.status == "ready":
+            return
+        b.status = "building"
+        b.entries_done, b.bytes_done = 0, 0
+        db.commit()
+
+        last = [0.0]
+
+        def progress(entries_done, entries_total, bytes_done, bytes_total):
+            now = time.monotonic()
+            if now - last[0] < PROGRESS_INTERVAL_SECONDS:
+                return
+            last[0] = now
+            b.entries_done, b.entries_total = entries_done, entries_total
+            b.bytes_done, b.bytes_total = bytes_done, bytes_total
+            b.updated_at = func.now()  # heartbeat for _is_stale, even when the counts haven't moved
+            db.commit()
+
+        key = ensure_zip_in_gcs(db, str(b.gallery_id), b.size, part=b.part or None, progress=progress)
+        st = storage.stat(key)
+        b.key = key
+        b.status = "ready"
+        b.bytes_total = b.bytes_done = st.size if st else b.bytes_done
+        b.entries_done = b.entries_total or b.entries_done
+        b.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        print(f"zip build {build_id}: gallery {b.gallery_id} {b.size} ready ({b.bytes_done} bytes)")
+    except Exception as e:
+        db.rollback()
+        print(f"zip build {build_id} failed: {e}")
+        b = db.get(ZipBuild, build_id)
+        if b is not None:
+            b.status = "failed"
+            b.error = str(e)[:2000]
+            db.commit()
+        return
+    finally:
+        db.close()
+    _notify(build_id)
+
+
+def _notify(build_id: int) -> None:
+    from app.auth.services.email_service import send_zip_ready_email
+    db = SessionLocal()
+    try:
+        b = db.get(ZipBuild, build_id)
+        if b is None or b.status != "ready" or not b.notify_email:
+            return
+        gallery = db.get(Gallery, b.gallery_id)
+        filename = zip_filename(gallery, b.size, b.part or None)
+        url = signed_zip_url(b.key, filename=filename, expires_seconds=config.ZIP_READY_LINK_EXPIRES_SECONDS)
+        send_zip_ready_email(b.notify_email, gallery.title, url)
+        b.notify_email = None  # mail once
+        db.commit()
+    finally:
+        db.close()
+
+
+def build_status(b: Optional[ZipBuild], gallery: Gallery, size: str, part: Optional[int] = None) -> dict:
+    filename = zip_filename(gallery, size, part)
+    if b is None:
+        return {"status": "none", "size": size, "part": part, "filename": filename}
+    out = {
+        "status": b.status,
+        "size": size,
+        "part": part,
+        "filename": filename,
+        "entries_done": b.entries_done,
+        "entries_total": b.entries_total,
+        "bytes_done": b.bytes_done,
+        "bytes_total": b.bytes_total,
+    }
+    if b.status == "ready":
+        out["url"] = signed_zip_url(b.key, filename=filename)
+    if b.status == "failed":
+        out["error"] = b.error
+    return out
+
+
+# ---------- pre-building ----------
+
+def schedule_prebuild(gallery_id: str) -> None:
+    """
+    Queue builds of config.ZIP_PREBUILD_SIZES for a public gallery once it
+    has stopped changing for ZIP_PREBUILD_DELAY_SECONDS, so an upload burst
+    starts one build rather than one per photo.
+    """
+    if not config.ZIP_PREBUILD_SIZES:
+        return
+    gid = int(gallery_id)
+    debounce(gid, config.ZIP_PREBUILD_DELAY_SECONDS, _prebuild, gid)
+
+
+def _prebuild(gallery_id: int) -> None:
+    db = SessionLocal()
+    try:
+        gallery = db.get(Gallery, gallery_id)
+        if gallery is None or not gallery.is_public or gallery.status != "active":
+            return
+        for size in config.ZIP_PREBUILD_SIZES:
+            if size in config.DOWNLOAD_SIZES:
+                request_build(db, str(gallery_id), size)
+    except Exception as e:
+        print(f"zip prebuild for gallery {gallery_id} failed: {e}")
+    finally:
+        db.close()
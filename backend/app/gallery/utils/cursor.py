@@ -0,0 +1,25 @@
+# app/gallery/utils/cursor.py
+import base64, json
+from typing import Any, Optional
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """
+    Opaque keyset cursor: urlsafe base64 of the last row's sort key.
+    """
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list[Any]]:
+    """
+    Returns the decoded sort key, or None for no/invalid cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + pad))
+    except Exception:
+        return None
+    return values if isinstance(values, list) else None
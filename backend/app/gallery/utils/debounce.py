@@ -0,0 +1,42 @@
+# app/gallery/utils/debounce.py
+from __future__ import annotations
+from typing import Callable, Dict, Hashable, Tuple
+import threading
+
+# Background work that should run once a gallery has stopped changing
+# (sheet rebuilds, manifest publishing, prewarming, ZIP prebuilds) is
+# debounced here. The timers are process-local threads: each process
+# debounces only its own calls, and a pending call is lost when the process
+# restarts or is scaled down before it fires. Whatever is scheduled here
+# must therefore be safe to miss, i.e. redone by the next change or served
+# on demand.
+
+_lock = threading.Lock()
+_timers: Dict[Tuple[Callable, Hashable], threading.Timer] = {}  # (fn, key) -> pending call
+
+
+def debounce(key: Hashable, delay: float, fn: Callable, *args, keep_pending: bool = False) -> None:
+    """
+    Call fn(*args) on a daemon thread `delay` seconds from now, cancelling
+    the call of `fn` still pending for the same `key`, so a burst of calls
+    runs it once. With `keep_pending`, a pending call is left alone and
+    this one dropped instead, so repeated calls can't keep postponing it.
+    """
+    slot = (fn, key)
+
+    def fire():
+        with _lock:
+            if _timers.get(slot) is t:
+                del _timers[slot]
+        fn(*args)
+
+    t = threading.Timer(delay, fire)
+    t.daemon = True
+    with _lock:
+        old = _timers.get(slot)
+        if old is not None:
+            if keep_pending:
+                return
+            old.cancel()
+        _timers[slot] = t
+    t.start()
@@ -5,10 +5,14 @@ import os, tempfile
 from typing import Tuple, Literal, Optional
 from sqlalchemy.orm import Session  # type: ignore
 from app import config
-from app.gallery.services.paths import downloads_dir
+from app.gallery.services.paths import downloads_dir, resized_key, watermarked_key
 from app.gallery.models.gallery_model import Photo
-from app.images import make_size, make_original_with_watermark
+from app.images import make_size, make_width, make_original_with_watermark, image_size
 from app.storage import storage
+from app.gallery.services import rendition_service
+from app.brand.service import get_settings, settings_hash
+from app.gallery.services.rendition_usage_service import record_usage
+from app.gallery.utils.single_flight import single_flight
 
 
 
@@ -20,72 +24,151 @@ def _storage_mode() -> StorageMode:
 def _photo_original_key(owner_id: str, gallery_id: str, file_id: str, ext: str) -> str:
     return f"{gallery_id}/original/{file_id}"
 
-def _photo_preset_key(owner_id: str, gallery_id: str, size: str, file_id: str) -> str:
-    # store presets as jpgs
-    return f"{gallery_id}/downloads/{size}/{file_id}"
+def _resolve_original_key(db: Session, photo, owner_id: str, gallery_id: str, file_id: str, ext: str) -> str:
+    """
+    Storage key of the uploaded original. The manifest answers without any
+    storage request; photos from before the manifest are probed once (upload
+    key, then the legacy layout) and backfilled.
+    """
+    r = rendition_service.get_rendition(db, photo.id, "original", format=None)
+    if r:
+        return r.key
+    for key in (photo.path_original, _photo_original_key(owner_id, gallery_id, file_id, ext)):
+        st = storage.stat(key) if key else None
+        if st:
+            rendition_service.record_rendition(
+                db, photo.id, "original", key,
+                format=(ext or ".jpg").lstrip(".").lower(), bytes=st.size,
+                width=photo.width, height=photo.height,
+            )
+            return key
+    raise FileNotFoundError("Original not in bucket")
+
+
+def _render_and_record(db: Session, photo, size: str, orig_key: str, preset_key: str, ext: str, file_id: str,
+                       wm_hash: str) -> None:
+    with tempfile.TemporaryDirectory() as td:
+        src_path = os.path.join(td, f"orig{ext or '.jpg'}")
+        storage.download_to_path(orig_key, src_path)
+
+        out_path = os.path.join(td, f"{file_id}.jpg")
+        if size == "original":
+            make_original_with_watermark(src_path, out_path, db)
+        else:
+            make_size(src_path, out_path, int(config.DOWNLOAD_SIZES[size] or 0), db)
+
+        with open(out_path, "rb") as f:
+            storage.save_fileobj(f, preset_key)
 
-def ensure_cached_download_for_photo(db: Session, photo, size: str) -> Tuple[StorageMode, str]:
+        w, h = image_size(out_path)
+        rendition_service.record_rendition(
+            db, photo.id, "download", preset_key, size=size,
+            bytes=os.path.getsize(out_path), crc32=rendition_service.file_crc32(out_path),
+            width=w, height=h,
+            settings_hash=wm_hash,
+        )
+
+
+def ensure_cached_download_for_photo(db: Session, photo, size: str, wm_hash: Optional[str] = None) -> Tuple[StorageMode, str]:
     """
     Ensure a downloadable artifact for (photo, size) exists.
     Returns:
       ("local", /abs/path/to/file)  -> caller should FileResponse this
       ("gcs",   gcs_object_key)     -> caller should redirect to signed URL
 
-    Raises FileNotFoundError if the original cannot be found, or size invalid.
+    Renditions are watermarked, so they are stored under a key that includes
+    the brand settings hash and reused for as long as the manifest row
+    carries the current hash; after a settings change the next request
+    renders a new copy and drops the old one. `wm_hash` saves the settings
+    lookup when the caller already has it.
+
+    Raises FileNotFoundError if the original cannot be found, or size invalid,
+    and GenerationInProgress if another worker is still rendering it after
+    SINGLE_FLIGHT_WAIT_SECONDS.
     """
-    mode = _storage_mode()
-    # print(mode)
-    gallery = photo.gallery  # if relationship available; otherwise fetch owner_id/gid directly
-    owner_id = str(getattr(gallery, "owner_id", None) or getattr(photo, "owner_id"))
     gallery_id = str(getattr(photo, "gallery_id"))
     file_id = str(getattr(photo, "filename") or getattr(photo, "id"))
     ext = photo.ext or os.path.splitext(photo.filename or "")[1] or ".jpg"
-    # print(gallery_id, owner_id, file_id, ext)
 
     if size not in config.DOWNLOAD_SIZES:  # e.g. {"original": None, "large": 2048, ...}
         raise ValueError("Unsupported size")
 
-    # --- GCS path ---
-    orig_key = _photo_original_key(owner_id, gallery_id, file_id, ext)
-    # print(orig_key)
-    if size == "original":
-        # just ensure it exists in bucket
-        # print(storage.exists(orig_key))
-        if not storage.exists(orig_key):
-            raise FileNotFoundError("Original not in bucket")
-        with tempfile.TemporaryDirectory() as td:
-            src_path = os.path.join(td, f"orig{ext or '.jpg'}")
-            with open(src_path, "wb") as f:
-                f.write(storage.read_bytes(orig_key))
+    if wm_hash is None:
+        wm_hash = settings_hash(get_settings(db))
 
-            out_path = os.path.join(td, f"{file_id}.jpg")
-            longest = config.DOWNLOAD_SIZES[size]
-            make_original_with_watermark(src_path, out_path, db)
-            preset_key = f"{gallery_id}/downloads/original/{file_id}{ext}"
-            # upload preset
-            with open(out_path, "rb") as f:
-                storage.save_fileobj(f, preset_key)
-        return ("gcs", preset_key)
-
-    # preset in bucket
-    preset_key = _photo_preset_key(owner_id, gallery_id, size, file_id)
-    # print(preset_key, "92")
-    if not storage.exists(preset_key):
-        # generate in temp, then upload
-        # 1) download original to temp
-        if not storage.exists(orig_key):
-            raise FileNotFoundError("Original not in bucket")
-        with tempfile.TemporaryDirectory() as td:
-            src_path = os.path.join(td, f"orig{ext or '.jpg'}")
-            with open(src_path, "wb") as f:
-                f.write(storage.read_bytes(orig_key))
+    r = rendition_service.get_rendition(db, photo.id, "download", size)
+    if r and r.settings_hash == wm_hash:
+        return ("gcs", r.key)
+
+    gallery = photo.gallery  # if relationship available; otherwise fetch owner_id/gid directly
+    owner_id = str(getattr(gallery, "owner_id", None) or getattr(photo, "owner_id"))
+    orig_key = _resolve_original_key(db, photo, owner_id, gallery_id, file_id, ext)
+    preset_key = watermarked_key(gallery_id, file_id, size, wm_hash)
+
+    def generate() -> str:
+        # another worker may have made it while we waited for the lock
+        r = rendition_service.get_rendition(db, photo.id, "download", size)
+        if r and r.settings_hash == wm_hash:
+            return r.key
+        old_key = r.key if r else None
+        _render_and_record(db, photo, size, orig_key, preset_key, ext, file_id, wm_hash)
+        record_usage(size, requests=0, generated=1)
+        if old_key and old_key != preset_key:
+            # rendered with other settings (or before they were tracked)
+            try:
+                storage.delete(old_key)
+            except Exception as e:
+                print(f"download: cannot delete superseded {old_key}: {e}")
+        return preset_key
+
+    # one worker renders; concurrent requests for the same rendition wait for it
+    return ("gcs", single_flight.do(f"rendition:{photo.id}:{size}", generate))
 
-            out_path = os.path.join(td, f"{file_id}.jpg")
-            longest = config.DOWNLOAD_SIZES[size]
-            make_size(src_path, out_path, int(longest or 0), db)
 
-            # upload preset
+def ensure_resized_for_photo(db: Session, photo, width: int, fmt: str, wm_hash: Optional[str] = None) -> str:
+    """
+    Storage key of the photo resized to `width` (a config.IMG_WIDTHS step)
+    as `fmt`, rendering and recording it (manifest kind "resize") on first
+    use and again after the brand settings change, like
+    ensure_cached_download_for_photo.
+    """
+    if wm_hash is None:
+        wm_hash = settings_hash(get_settings(db))
+    size = str(width)
+    r = rendition_service.get_rendition(db, photo.id, "resize", size, format=fmt)
+    if r and r.settings_hash == wm_hash:
+        return r.key
+
+    gallery_id = str(photo.gallery_id)
+    file_id = str(photo.filename or photo.id)
+    ext = photo.ext or os.path.splitext(photo.filename or "")[1] or ".jpg"
+    owner_id = str(getattr(photo.gallery, "owner_id", ""))
+    orig_key = _resolve_original_key(db, photo, owner_id, gallery_id, file_id, ext)
+    key = resized_key(gallery_id, file_id, width, fmt, wm_hash)
+
+    def generate() -> str:
+        r = rendition_service.get_rendition(db, photo.id, "resize", size, format=fmt)
+        if r and r.settings_hash == wm_hash:
+            return r.key
+        old_key = r.key if r else None
+        with tempfile.TemporaryDirectory() as td:
+            src_path = os.path.join(td, f"orig{ext}")
+            storage.download_to_path(orig_key, src_path)
+            out_path = os.path.join(td, f"out.{fmt}")
+            make_width(src_path, out_path, width, db, fmt)
             with open(out_path, "rb") as f:
-                storage.save_fileobj(f, preset_key)
+                storage.save_fileobj(f, key, content_type=f"image/{fmt}")
+            w, h = image_size(out_path)
+            rendition_service.record_rendition(
+                db, photo.id, "resize", key, size=size, format=fmt,
+                bytes=os.path.getsize(out_path), width=w, height=h, settings_hash=wm_hash,
+            )
+        record_usage(f"w{width}", requests=0, generated=1)
+        if old_key and old_key != key:
+            try:
+                storage.delete(old_key)
+            except Exception as e:
+                print(f"resize: cannot delete superseded {old_key}: {e}")
+        return key
 
-    return ("gcs", preset_key)
+    return single_flight.do(f"rendition:{photo.id}:w{width}.{fmt}", generate)
@@ -1,41 +1,49 @@
 from app.storage import storage
 from app import config
-from app.images import make_preview, make_thumb, make_size
+from app.images import make_preview, make_thumb, make_size, make_original_with_watermark, image_size
 import tempfile, os
-from app.gallery.models.gallery_model import Photo
+from app.gallery.models.gallery_model import Gallery, Photo
 from app.storage import storage
-from app.gallery.services.paths import downloads_dir
+from app.gallery.services.paths import downloads_dir, watermarked_key
+from app.gallery.services import rendition_service
+from app.gallery.services.rendition_policy_service import policy_for, sizes_with_mode
+from app.brand.service import get_settings, settings_hash
 
-def process_image_pipeline(photo_id: str | int, original_path: str, owner_id: str, gallery_id: str):
+def process_image_pipeline(photo_id: int):
+    """
+    Render a freshly uploaded photo's preview, thumb and the download sizes
+    its gallery's policy marks eager, and record them in the manifest.
+    Run after the upload has committed (a BackgroundTask of upload_photos).
+    """
     from app.database import SessionLocal
     db = SessionLocal()
     try:
-        # Prepare keys for previews/thumbs
-        preview_key = f"{gallery_id}/previews/{photo_id}"
-        thumb_key   = f"{gallery_id}/thumbs/{photo_id}"
+        p = db.get(Photo, int(photo_id))
+        if p is None:
+            return
+        gallery_id = str(p.gallery_id)
+        file_id = str(p.filename or p.id)
+        orig = rendition_service.get_rendition(db, p.id, "original", format=None)
+        original_key = orig.key if orig else p.path_original
 
-        # Keys for download sizes (eagerly generated)
+        # Everything rendered here is watermarked, so keys carry the settings hash
+        wm_hash = settings_hash(get_settings(db))
+        preview_key = watermarked_key(gallery_id, file_id, "preview", wm_hash)
+        thumb_key   = watermarked_key(gallery_id, file_id, "thumb", wm_hash)
+
+        # Keys for the download sizes the gallery's policy renders eagerly;
+        # the others are rendered on request or prewarmed later
+        gallery = db.get(Gallery, p.gallery_id)
         download_keys = {}
 
-        for size, longest in config.DOWNLOAD_SIZES.items():
-            if size != "original":
-                key = f"{gallery_id}/downloads/{size}/{photo_id}"
-                download_keys[size] = (key, longest)
+        for size in sizes_with_mode(policy_for(gallery), "eager"):
+            key = watermarked_key(gallery_id, file_id, size, wm_hash)
+            download_keys[size] = (key, config.DOWNLOAD_SIZES[size])
         # 1) Get a local temp copy of the original (works for both local+gcs)
         with tempfile.TemporaryDirectory() as td:
             tmp_original = os.path.join(td, "original")
 
-            # original_path can be '/media/key...' or 'gs://bucket/key'
-            if original_path.startswith("gs://"):
-                # extract key after 'gs://bucket/'
-                key = original_path.split("/", 3)[-1]
-            elif original_path.startswith("/media/"):
-                key = original_path.lstrip("/").split("/", 1)[-1]  # remove 'media/'
-            else:
-                # fall back: assume it's a storage key already
-                key = original_path
-
-            storage.download_to_path(key, tmp_original)
+            storage.download_to_path(original_key, tmp_original)
             # 2) Create preview & thumb locally
             tmp_preview = os.path.join(td, "preview.jpg")
             tmp_thumb   = os.path.join(td, "thumb.jpg")
@@ -47,7 +55,10 @@ def process_image_pipeline(photo_id: str | int, original_path: str, owner_id: st
             tmp_download_paths = {}
             for size, (key, longest) in download_keys.items():
                 tmp_download_path = os.path.join(td, f"{size}.jpg")
-                make_size(tmp_original, tmp_download_path, longest, db)
+                if longest:
+                    make_size(tmp_original, tmp_download_path, longest, db)
+                else:
+                    make_original_with_watermark(tmp_original, tmp_download_path, db)
                 tmp_download_paths[size] = tmp_download_path
 
              # --- 4. Upload all generated files to Storage ---
@@ -70,26 +81,26 @@ def process_image_pipeline(photo_id: str | int, original_path: str, owner_id: st
                     # they are uploaded and ready to be served.
 
 
-            # --- 5. Persist canonical paths/keys back to DB ---
-            
-            # Determine canonical prefix
-            if storage.backend_name() == "local":
-                prefix = "/media/"
-                preview_path = f"{prefix}{uploaded_paths['preview']}"
-                thumb_path   = f"{prefix}{uploaded_paths['thumb']}"
-            else: # Assume GCS/S3 etc. for non-local backends
-                prefix = f"gs://{config.GCS_BUCKET_NAME}/"
-                preview_path = f"{prefix}{uploaded_paths['preview']}"
-                thumb_path   = f"{prefix}{uploaded_paths['thumb']}"
-
-            # Update DB
-            p = db.query(Photo).filter(Photo.filename == photo_id).first()
-            if p:
-                p.path_preview = preview_path
-                p.path_thumb = thumb_path
-                # Note: Width/Height updates should happen inside make_* functions
+            # --- 5. Record every rendition in the manifest ---
+            generated = [
+                ("preview", "", preview_key, tmp_preview),
+                ("thumb", "", thumb_key, tmp_thumb),
+            ] + [
+                ("download", size, download_keys[size][0], tmp_path)
+                for size, tmp_path in tmp_download_paths.items()
+            ]
+            for kind, size, key, tmp_path in generated:
+                w, h = image_size(tmp_path)
+                rendition_service.record_rendition(
+                    db, p.id, kind, key, size=size,
+                    bytes=os.path.getsize(tmp_path), crc32=rendition_service.file_crc32(tmp_path),
+                    width=w, height=h,
+                    settings_hash=wm_hash, commit=False,
+                )
+            if not p.width or not p.height:
+                p.width, p.height = image_size(tmp_original)
                 db.add(p)
-                db.commit()
+            db.commit()
 
     except Exception as e:
         print(f"Error processing image {photo_id}: {e}")
@@ -0,0 +1,76 @@
+# app/gallery/utils/prefetch.py
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def prefetch_ordered(
+    items: Iterable[T],
+    fetch: Callable[[T], R],
+    concurrency: int,
+    buffer_bytes: int,
+    size_of: Optional[Callable[[T], Optional[int]]] = None,
+) -> Iterator[Tuple[T, Optional[R], Optional[Exception]]]:
+    """
+    Run `fetch` over `items` with up to `concurrency` calls in flight and
+    yield (item, result, error) strictly in input order.
+
+    A fetch is only started if its estimated bytes fit in `buffer_bytes`
+    next to those of the fetched-but-not-yet-consumed items (at least one is
+    always in flight, however big). `size_of` gives a per-item estimate; without it, or when it
+    returns None, the running average of finished results is used.
+    """
+    it = iter(items)
+    pending: Deque[Tuple[T, object, int]] = deque()
+    used = 0
+    seen_bytes = 0
+    seen_count = 0
+    exhausted = False
+    held: Optional[Tuple[T, int]] = None  # next item, waiting for buffer space
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    def estimate(item: T) -> int:
+        size = size_of(item) if size_of else None
+        if size is None:
+            size = seen_bytes // seen_count if seen_count else 0
+        return int(size)
+
+    try:
+        while True:
+            while len(pending) < max(1, concurrency):
+                if held is None:
+                    if exhausted:
+                        break
+                    try:
+                        item = next(it)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    held = (item, estimate(item))
+                item, est = held
+                if pending and used + est > buffer_bytes:
+                    break  # doesn't fit yet; retried once earlier items are consumed
+                held = None
+                pending.append((item, pool.submit(fetch, item), est))
+                used += est
+
+            if not pending:
+                return
+
+            item, fut, est = pending.popleft()
+            used -= est
+            try:
+                result, err = fut.result(), None
+            except Exception as e:
+                result, err = None, e
+            if result is not None and hasattr(result, "__len__"):
+                seen_bytes += len(result)
+                seen_count += 1
+            yield item, result, err
+    finally:
+        # consumer went away (e.g. client disconnected): drop queued fetches
+        pool.shutdown(wait=False, cancel_futures=True)
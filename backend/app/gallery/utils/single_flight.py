@@ -0,0 +1,136 @@
+# app/gallery/utils/single_flight.py
+from __future__ import annotations
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+import hashlib, struct, threading, time
+from sqlalchemy import text  #type: ignore
+from app import config
+from app.database import engine, lock_engine
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: lock files degrade to in-process only
+    fcntl = None
+
+T = TypeVar("T")
+
+# how often a waiter re-tries a lock held by another process
+POLL_SECONDS = 0.25
+
+
+class GenerationInProgress(Exception):
+    """Another worker is generating the artifact and we did not (or could not) wait for it."""
+
+
+def _pg_key(key: str) -> int:
+    # advisory locks take a signed 64-bit key
+    return struct.unpack(">q", hashlib.sha256(key.encode("utf-8")).digest()[:8])[0]
+
+
+@contextmanager
+def _pg_lock(key: str, wait: bool, timeout: Optional[float]) -> Iterator[None]:
+    k = _pg_key(key)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    # the lock belongs to the session, so hold a connection of the lock pool
+    # (see app.database.lock_engine) rather than one requests need. An
+    # exhausted pool raises sqlalchemy's TimeoutError: nobody else holds this
+    # key, so it must not look like GenerationInProgress.
+    with lock_engine.connect() as conn:
+        while not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": k}).scalar():
+            if not wait or (deadline is not None and time.monotonic() >= deadline):
+                raise GenerationInProgress(key)
+            time.sleep(POLL_SECONDS)
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": k})
+
+
+@contextmanager
+def _file_lock(key: str, wait: bool, timeout: Optional[float]) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    lock_dir = Path(config.LOCK_DIR)
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    path = lock_dir / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with open(path, "a+b") as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not wait or (deadline is not None and time.monotonic() >= deadline):
+                    raise GenerationInProgress(key)
+                time.sleep(POLL_SECONDS)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def process_lock(key: str, wait: bool = True, timeout: Optional[float] = None):
+    """
+    Cross-process mutex for `key`: a Postgres advisory lock when the
+    database is Postgres (works across instances), otherwise a flock'd file
+    under config.LOCK_DIR (processes on one host). Raises
+    GenerationInProgress if the lock is held and `wait` is False or
+    `timeout` runs out.
+    """
+    if engine.dialect.name == "postgresql":
+        return _pg_lock(key, wait, timeout)
+    return _file_lock(key, wait, timeout)
+
+
+class SingleFlight:
+    """
+    Run at most one generation per key at a time, across threads and
+    processes. In-process callers for a key that is already running wait
+    on the leader's future; the leader additionally takes process_lock(key)
+    so other workers serialise behind it.
+
+    `fn` runs once the lock is held and must first check whether the
+    artifact now exists (another worker may have made it while we waited)
+    before generating it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], T], wait: bool = True, timeout: Optional[float] = None) -> T:
+        if timeout is None:
+            timeout = config.SINGLE_FLIGHT_WAIT_SECONDS
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+
+        if not leader:
+            if not wait:
+                raise GenerationInProgress(key)
+            try:
+                return fut.result(timeout)
+            except FutureTimeout:
+                raise GenerationInProgress(key)
+
+        try:
+            with process_lock(key, wait=wait, timeout=timeout):
+                result = fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+single_flight = SingleFlight()
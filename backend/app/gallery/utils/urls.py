@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Optional, List, Dict
 from app.storage import storage
 from app import config
 
@@ -29,3 +29,30 @@ def url_from_path(stored_path: Optional[str], expires: int = 0, response_disposi
     else:
         exp = expires or config.GCS_SIGNED_URL_EXP_SECONDS
         return storage.signed_url(stored_path, exp, response_disposition)
+
+
+def urls_from_paths(stored_paths: List[Optional[str]], expires: int = 0) -> List[Optional[str]]:
+    """
+    Batch version of url_from_path: local paths are mapped directly and all
+    remote keys are signed in one storage.signed_urls() call.
+    """
+    exp = expires or config.GCS_SIGNED_URL_EXP_SECONDS
+    out: List[Optional[str]] = [None] * len(stored_paths)
+    to_sign: Dict[int, str] = {}
+    local = storage.backend_name() == "local"
+    for i, p in enumerate(stored_paths):
+        if not p:
+            continue
+        if p.startswith("/media/"):
+            out[i] = f"/media/{p.lstrip('/').split('/', 1)[-1]}"
+        elif p.startswith("gs://"):
+            to_sign[i] = p.split("/", 3)[-1]
+        elif local:
+            out[i] = f"/media/{p.lstrip('/')}"
+        else:
+            to_sign[i] = p
+    if to_sign:
+        signed = storage.signed_urls(list(to_sign.values()), exp)
+        for i, key in to_sign.items():
+            out[i] = signed.get(key)
+    return out
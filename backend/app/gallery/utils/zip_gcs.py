@@ -1,69 +1,120 @@
 # backend/app/gallery/utils/zip_gcs.py
 from __future__ import annotations
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
+import bisect, re
 from sqlalchemy.orm import Session #type: ignore
 from app.gallery.services import gallery_service as crud
+from app import config
 from app.storage import storage
-import io, os, time
-from app.gallery.utils.download_helper import ensure_cached_download_for_photo
+from app.gallery.services.gallery_download_service import (
+    backfill_zip_checksums, check_zip_entries, part_entries, render_missing, zip_digest, zip_entries,
+)
+from app.gallery.utils.zip_layout import iter_plan, plan_zip
+from app.gallery.utils.zip_stream import stream_zip
 
 # Build a deterministic key for the ZIP
-def zip_key(gallery_id: str, size: str) -> str:
-    # e.g. zips/1/gallery-1-large.zip
-    return f"zips/{gallery_id}/gallery-{gallery_id}-{size}.zip"
+def zip_key(gallery_id: str, size: str, digest: str, part: Optional[int] = None) -> str:
+    # e.g. zips/1/gallery-1-large-3f9c0a1b2c3d4e5f.zip, ...-3f9c0a1b2c3d4e5f-part2.zip
+    suffix = f"-part{part}" if part else ""
+    return f"zips/{gallery_id}/gallery-{gallery_id}-{size}-{digest}{suffix}.zip"
 
-def ensure_zip_in_gcs(db: Session, gallery_id: str, size: str, *, force_rebuild: bool = False) -> str:
+
+def _collect_stale_zips(gallery_id: str, size: str, digest: str, part: Optional[int] = None) -> None:
+    """
+    Delete archives of this gallery/size built for an older digest
+    (including the pre-digest `gallery-{id}-{size}.zip`). Whole-gallery
+    archives and parts are collected separately, so building one never
+    removes the other.
+    """
+    pattern = re.compile(rf"^gallery-{re.escape(str(gallery_id))}-{re.escape(size)}(?:-([0-9a-f]{{16}})(-part\d+)?)?\.zip$")
+    for key in storage.list_files(f"zips/{gallery_id}/"):
+        m = pattern.match(key.replace("\\", "/").rsplit("/", 1)[-1])
+        if not m:
+            continue
+        old_digest, is_part = m.group(1), bool(m.group(2))
+        if old_digest is None or (is_part == bool(part) and old_digest != digest):
+            storage.delete(key)
+
+
+# progress(entries_done, entries_total, bytes_done, bytes_total); totals may be None
+Progress = Callable[[int, Optional[int], int, Optional[int]], None]
+
+
+def ensure_zip_in_gcs(db: Session, gallery_id: str, size: str, *, part: Optional[int] = None,
+                      force_rebuild: bool = False, progress: Optional[Progress] = None) -> str:
     """
     Ensures a ZIP of the gallery for the given size exists in GCS.
-    Returns the GCS object key.
+    Returns the GCS object key. With `part`, only that part of the gallery
+    (see part_entries) is archived; raises LookupError if it does not exist.
+
+    The key carries zip_digest() of the gallery's current photos, order and
+    brand settings, so an archive is reused exactly as long as it is still
+    correct, and older archives are deleted once a new one is built.
     Strategy:
       - If object exists and not forcing: reuse it.
-      - Else: build zip in-memory and upload.
+      - Else: pipe the zip stream into a multipart/resumable upload, one
+        part in memory at a time.
+
+    When the layout is deterministic (every entry has a size and CRC) the
+    plan's digest is the resume token: a build interrupted part-way
+    continues from the bytes already stored instead of starting over.
+
+    `progress` is called as photos are rendered, with the number rendered so
+    far, then as chunks are uploaded. Upload entry counts are exact for
+    deterministic layouts; otherwise only bytes are reported.
     """
-    key = zip_key(gallery_id, size)
-    print(key)
-    print()
+    digest = zip_digest(db, gallery_id, size, part)
+    key = zip_key(gallery_id, size, digest, part)
     if not force_rebuild and storage.exists(key):
         return key
 
-    # Build the list of (gcs_key, arcname)
-    photos = crud.list_photos(db, gallery_id) or []
-    entries: List[Tuple[str, str]] = []
-    for p in photos:
-        # Your sized image keys (since you removed local FS & owner_id):
-        # originals:   "{gallery}/original/{filename}"
-        # downloads:   "{gallery}/downloads/{size}/{base}.jpg"
-        backend, ref = ensure_cached_download_for_photo(db, p, size)
-        print(ref)
-        if size == "original":
-            arc = os.path.basename(p.filename)
+    # One listing instead of a HEAD per photo below (no-op without a metadata cache)
+    warm = getattr(storage, "warm", None)
+    if warm:
+        warm(f"{gallery_id}/")
+
+    # Render missing photos before streaming: the layout is then deterministic
+    # (resumable, exact progress), and each rendered photo reports progress,
+    # which keeps the build from looking abandoned while it renders. A render
+    # that fails raises here, before anything is uploaded or collected, and
+    # so does a photo left out or a gallery changed since `digest`.
+    entries = zip_entries(db, gallery_id, size)
+    total = len(entries)
+    entries = render_missing(entries, on_rendered=(lambda n: progress(n, total, 0, None)) if progress else None)
+    check_zip_entries(db, gallery_id, size, part, digest, entries)
+    entries = part_entries(entries, part)
+    if entries is None:
+        raise LookupError(f"gallery {gallery_id} has no part {part}")
+    plan = plan_zip(entries)
+    if plan is None and backfill_zip_checksums(db, entries):
+        entries = zip_entries(db, gallery_id, size)
+        check_zip_entries(db, gallery_id, size, part, digest, entries)
+        entries = part_entries(entries, part)
+        plan = plan_zip(entries)
+
+    # end offset of each entry's data, to turn bytes written into entries done
+    ends = [off + n for off, n, p in plan.segments if not isinstance(p, bytes)] if plan else []
+    total = plan.size if plan else None
+
+    part_size = config.ZIP_UPLOAD_PART_BYTES
+    with storage.open_writer(key, content_type="application/zip", part_size=part_size,
+                             resume_token=plan.etag if plan else None) as w:
+        if plan is not None:
+            chunks = iter_plan(plan, start=w.offset, buffer_bytes=part_size)
         else:
-            base, _ = os.path.splitext(p.filename or f"photo-{p.id}")
-            arc = f"{base}-{size}.jpg"
-        entries.append((ref, arc))
-
-    # Build zip in-memory and upload to GCS
-    buf = io.BytesIO()
-    import zipfile
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for gcs_key, arcname in entries:
-            if not storage.exists(gcs_key):
-                # if eager gen missed something, skip or you can generate lazily here
-                continue
-            try:
-                data = storage.read_bytes(gcs_key)
-                zf.writestr(arcname, data)
-            except Exception:
-                # skip corrupt entries gracefully
-                continue
-
-    buf.seek(0)
-    storage.write_bytes(key, buf.read())
+            chunks = stream_zip(entries, buffer_bytes=part_size)
+        done = w.offset
+        for chunk in chunks:
+            w.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(bisect.bisect_right(ends, done), len(entries), done, total)
+
+    _collect_stale_zips(gallery_id, size, digest, part)
     return key
 
 
-def signed_zip_url(db: Session, gallery_id: str, size: str, *, filename: str, expires_seconds: int = 600) -> str:
-    key = ensure_zip_in_gcs(db, gallery_id, size)
+def signed_zip_url(key: str, *, filename: str, expires_seconds: int = 600) -> str:
     # We want a friendly filename in the browser download
     url = storage.signed_url(key, expires_seconds, response_disposition=None)
     # Some clients respect the Content-Disposition in the signed URL; append if supported by driver:
@@ -0,0 +1,206 @@
+# app/gallery/utils/zip_layout.py
+from __future__ import annotations
+import hashlib
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+from app import config
+from app.gallery.utils.prefetch import prefetch_ordered
+
+# Every archive is written with the same layout: STORED entries, sizes and
+# CRCs in the local headers (no data descriptors), a fixed timestamp and
+# fixed attributes. Given the entries, every byte offset is known before the
+# first byte is sent, which is what makes Content-Length and Range possible.
+
+CHUNK_SIZE = 1024 * 1024
+ZIP32_MAX = 0xFFFFFFFF
+ZIP16_MAX = 0xFFFF
+
+# 2020-01-01 00:00:00 in MS-DOS format
+DOS_DATE = ((2020 - 1980) << 9) | (1 << 5) | 1
+DOS_TIME = 0
+
+FLAG_UTF8 = 0x0800
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+VERSION_MADE_BY = (3 << 8) | VERSION_ZIP64  # unix
+EXTERNAL_ATTR = 0o100644 << 16
+
+
+class PlannedEntry(NamedTuple):
+    key: str
+    arcname: str
+    size: int
+    crc32: int
+
+
+# (offset, length, payload): payload is either literal header bytes or the
+# entry whose object data fills that span
+Segment = Tuple[int, int, Union[bytes, PlannedEntry]]
+
+
+class ZipPlan(NamedTuple):
+    segments: List[Segment]
+    size: int
+    etag: str
+
+
+def _local_header(e: PlannedEntry, name: bytes) -> bytes:
+    zip64 = e.size >= ZIP32_MAX
+    extra = struct.pack("<HHQQ", 0x0001, 16, e.size, e.size) if zip64 else b""
+    size32 = ZIP32_MAX if zip64 else e.size
+    return struct.pack(
+        "<IHHHHHIIIHH",
+        0x04034B50,
+        VERSION_ZIP64 if zip64 else VERSION_DEFAULT,
+        FLAG_UTF8,
+        0,  # stored
+        DOS_TIME, DOS_DATE,
+        e.crc32, size32, size32,
+        len(name), len(extra),
+    ) + name + extra
+
+
+def _central_header(e: PlannedEntry, name: bytes, offset: int) -> bytes:
+    fields = []
+    if e.size >= ZIP32_MAX:
+        fields += [e.size, e.size]
+    if offset >= ZIP32_MAX:
+        fields.append(offset)
+    extra = struct.pack("<HH", 0x0001, 8 * len(fields)) + struct.pack(f"<{len(fields)}Q", *fields) if fields else b""
+    size32 = ZIP32_MAX if e.size >= ZIP32_MAX else e.size
+    return struct.pack(
+        "<IHHHHHHIIIHHHHHII",
+        0x02014B50,
+        VERSION_MADE_BY,
+        VERSION_ZIP64 if fields else VERSION_DEFAULT,
+        FLAG_UTF8,
+        0,
+        DOS_TIME, DOS_DATE,
+        e.crc32, size32, size32,
+        len(name), len(extra), 0,
+        0, 0, EXTERNAL_ATTR,
+        min(offset, ZIP32_MAX),
+    ) + name + extra
+
+
+def _end_records(count: int, cd_size: int, cd_offset: int) -> bytes:
+    out = b""
+    if count >= ZIP16_MAX or cd_size >= ZIP32_MAX or cd_offset >= ZIP32_MAX:
+        zip64_eocd_offset = cd_offset + cd_size
+        out += struct.pack(
+            "<IQHHIIQQQQ",
+            0x06064B50, 44, VERSION_MADE_BY, VERSION_ZIP64, 0, 0,
+            count, count, cd_size, cd_offset,
+        )
+        out += struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd_offset, 1)
+    out += struct.pack(
+        "<IHHHHIIH",
+        0x06054B50, 0, 0,
+        min(count, ZIP16_MAX), min(count, ZIP16_MAX),
+        min(cd_size, ZIP32_MAX), min(cd_offset, ZIP32_MAX),
+        0,
+    )
+    return out
+
+
+def plan_zip(entries) -> Optional[ZipPlan]:
+    """
+    Lay out a stored ZIP of `entries` (anything with key/arcname/size/crc32).
+    Returns None if any entry is missing its size or CRC; such archives can
+    only be streamed without a known length.
+    """
+    if any(e.size is None or e.crc32 is None for e in entries):
+        return None
+
+    segments: List[Segment] = []
+    central = []
+    digest = hashlib.sha256()
+    offset = 0
+    for src in entries:
+        e = PlannedEntry(src.key, src.arcname, int(src.size), int(src.crc32))
+        name = e.arcname.encode("utf-8")
+        header = _local_header(e, name)
+        central.append(_central_header(e, name, offset))
+        segments.append((offset, len(header), header))
+        offset += len(header)
+        segments.append((offset, e.size, e))
+        offset += e.size
+        digest.update(f"{e.key}\0{e.arcname}\0{e.size}\0{e.crc32}\n".encode("utf-8"))
+
+    cd = b"".join(central)
+    tail = cd + _end_records(len(central), len(cd), offset)
+    segments.append((offset, len(tail), tail))
+    offset += len(tail)
+    return ZipPlan(segments, offset, digest.hexdigest()[:32])
+
+
+def iter_plan(
+    plan: ZipPlan,
+    start: int = 0,
+    end: Optional[int] = None,
+    store=None,
+    concurrency: Optional[int] = None,
+    buffer_bytes: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield bytes [start, end] (inclusive) of the planned archive. Object spans
+    are fetched in parallel, ahead of the output, like stream_zip; a span
+    only partly inside the range is read with a ranged GET.
+
+    An unreadable or changed object aborts the stream: the length has
+    already been promised, so a short or altered entry would produce a
+    corrupt file rather than a skipped photo.
+    """
+    if store is None:
+        from app.storage import storage as store
+    concurrency = concurrency or config.ZIP_PREFETCH_CONCURRENCY
+    buffer_bytes = buffer_bytes or config.ZIP_PREFETCH_BUFFER_BYTES
+    end = plan.size - 1 if end is None else min(end, plan.size - 1)
+
+    pieces: List[Union[bytes, Tuple[PlannedEntry, int, int]]] = []
+    for off, length, payload in plan.segments:
+        if length == 0 or off + length - 1 < start or off > end:
+            continue
+        s = max(start, off) - off
+        n = min(end, off + length - 1) - off - s + 1
+        if isinstance(payload, bytes):
+            pieces.append(payload[s:s + n])
+        else:
+            pieces.append((payload, s, n))
+
+    def read(e: PlannedEntry, s: int, n: int) -> bytes:
+        if s == 0 and n == e.size:
+            data = store.read_bytes(e.key)
+            if len(data) != e.size:
+                raise ValueError(f"{e.key} is {len(data)} bytes, manifest says {e.size}")
+            return data
+        data = store.read_range(e.key, s, n)
+        if len(data) != n:
+            raise ValueError(f"short read of {e.key}: {len(data)} of {n} bytes")
+        return data
+
+    def fetch(p):
+        e, s, n = p
+        return None if n > buffer_bytes else read(e, s, n)
+
+    fetched = prefetch_ordered(
+        [p for p in pieces if not isinstance(p, bytes)], fetch, concurrency, buffer_bytes,
+        size_of=lambda p: min(p[2], buffer_bytes),
+    )
+    try:
+        for p in pieces:
+            if isinstance(p, bytes):
+                yield p
+                continue
+            (e, s, n), data, err = next(fetched)
+            if err is not None:
+                raise err
+            if data is None:
+                # too big to buffer: read it in ranged chunks as it is sent
+                for pos in range(s, s + n, CHUNK_SIZE):
+                    yield read(e, pos, min(CHUNK_SIZE, s + n - pos))
+                continue
+            for i in range(0, len(data), CHUNK_SIZE):
+                yield data[i:i + CHUNK_SIZE]
+    finally:
+        fetched.close()
@@ -0,0 +1,111 @@
+# app/gallery/utils/zip_stream.py
+from __future__ import annotations
+import os
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+import zipstream
+from app import config
+from app.gallery.utils.prefetch import prefetch_ordered
+from app.gallery.utils.zip_layout import iter_plan, plan_zip
+
+# Already-compressed formats gain nothing from deflate; store them as-is.
+STORED_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif", ".gif", ".zip", ".mp4", ".mov"}
+CHUNK_SIZE = 1024 * 1024
+
+
+class ZipEntry(NamedTuple):
+    key: str                    # storage key
+    arcname: str                # name inside the archive
+    size: Optional[int] = None  # bytes, when known from the rendition manifest
+    crc32: Optional[int] = None  # likewise; with both known the layout is deterministic
+    # set while the rendition doesn't exist yet: renders it and returns
+    # its (key, size, crc32); called from the prefetch threads
+    render: Optional[Callable[[], Tuple[str, Optional[int], Optional[int]]]] = None
+    photo_id: Optional[int] = None  # the photo this entry archives, when built from one
+
+
+def _iter_object(store, key: str) -> Iterator[bytes]:
+    with store.open_reader(key) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _compress_type(arcname: str) -> int:
+    ext = os.path.splitext(arcname)[1].lower()
+    return zipstream.ZIP_STORED if ext in STORED_EXTS else zipstream.ZIP_DEFLATED
+
+
+def stream_zip(
+    entries: List[ZipEntry],
+    store=None,
+    concurrency: Optional[int] = None,
+    buffer_bytes: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `entries` chunk by chunk; ZIP64 records are
+    emitted once offsets pass 4 GiB.
+
+    When every entry has a known size and CRC the deterministic layout from
+    zip_layout is used, so the same entries always give the same bytes.
+    Otherwise the archive is built by zipstream as the data arrives.
+
+    Entries whose rendition is missing are rendered by the same workers
+    when their turn comes, so the first bytes go out before the gallery is
+    fully rendered.
+
+    The next `concurrency` entries are fetched from storage in parallel into
+    a buffer of at most `buffer_bytes` while earlier ones are being sent, so
+    throughput is not capped at one object's latency. Entries bigger than
+    the buffer are streamed straight from storage instead. Output order is
+    always the order of `entries`.
+
+    An entry that can't be read or rendered aborts the stream, as in
+    iter_plan: its local header is already out, and an empty file under the
+    photo's name would pass for a complete download.
+    """
+    if store is None:
+        from app.storage import storage as store
+    concurrency = concurrency or config.ZIP_PREFETCH_CONCURRENCY
+    buffer_bytes = buffer_bytes or config.ZIP_PREFETCH_BUFFER_BYTES
+
+    plan = plan_zip(entries)
+    if plan is not None:
+        yield from iter_plan(plan, store=store, concurrency=concurrency, buffer_bytes=buffer_bytes)
+        return
+
+    def fetch(e: ZipEntry):
+        if e.render is not None:
+            # rendered here, overlapping with the entries being sent
+            return store.read_bytes(e.render()[0])
+        if e.size is not None and e.size > buffer_bytes:
+            return None  # too big to buffer, streamed below
+        return store.read_bytes(e.key)
+
+    fetched = prefetch_ordered(
+        entries, fetch, concurrency, buffer_bytes,
+        size_of=lambda e: min(e.size, buffer_bytes) if e.size is not None else None,
+    )
+
+    def entry_data() -> Iterator[bytes]:
+        # zipstream consumes entries in the order they were added, so the
+        # n-th call here always pairs with the n-th prefetched result
+        e, data, err = next(fetched)
+        if err is not None:
+            raise err
+        if data is None:
+            yield from _iter_object(store, e.key)
+            return
+        for i in range(0, len(data), CHUNK_SIZE):
+            yield data[i:i + CHUNK_SIZE]
+
+    z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_STORED, allowZip64=True)
+    for e in entries:
+        z.write_iter(e.arcname, entry_data(), compress_type=_compress_type(e.arcname))
+    try:
+        for chunk in z:
+            if chunk:
+                yield chunk
+    finally:
+        fetched.close()
@@ -192,6 +192,12 @@ def _resize_longest_edge(src_path: str, dst_path: str, longest: int, db: Session
 
 # ---------- public API used by controllers ----------
 
+def image_size(path: str) -> tuple[int, int]:
+    """(width, height) from the file header, without decoding pixels."""
+    with Image.open(path) as im:
+        return im.size
+
+
 def make_preview(original_path: str, out_path: str, max_side: int, db: Session | None = None):
     Path(out_path).parent.mkdir(parents=True, exist_ok=True)
     im = _open_image_lenient(original_path)
@@ -216,6 +222,23 @@ def make_size(src_path: str, dst_path: str, longest: int, db: Session | None = N
     _resize_longest_edge(src_path, dst_path, longest, db)
 
 
+def make_width(src_path: str, dst_path: str, width: int, db: Session | None = None, fmt: str = "jpeg", quality: int = 85):
+    """
+    Resize to `width` pixels wide (never upscaled), watermark, and save as
+    `fmt` ("jpeg", "webp", or anything else Pillow can write).
+    """
+    Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+    im = _open_image_lenient(src_path).convert("RGB")
+    w, h = im.size
+    if w > width:
+        im = im.resize((width, max(1, round(h * width / w))), RESAMPLE)
+    im = _apply_watermark(im, db)
+    if fmt == "jpeg":
+        im.save(dst_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        im.save(dst_path, fmt.upper(), quality=quality)
+
+
 def make_original_with_watermark(src_path: str, dst_path: str, db: Session | None = None, quality: int = 92):
     """
     NON-DESTRUCTIVE: produce a same-size JPEG “original” with the watermark applied.
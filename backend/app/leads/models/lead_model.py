@@ -24,7 +24,7 @@ class Lead(Base):
     phone_number = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=True)
     source = Column(String, default="whatsapp", nullable=False)
-    stage = Column(Enum(LeadStage), default=LeadStage.NEW, nullable=False)
+    stage = Column(Enum(LeadStage), default=LeadStage.NEW, nullable=False, index=True)
     assigned_to = Column(String, nullable=True)
     score = Column(Integer, default=0, nullable=False)
 
@@ -13,10 +13,15 @@ from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 from app.rate_limiter import limiter
-from app.gallery.controllers import gallery_controller, favorites_controller
+from app.gallery.utils.single_flight import GenerationInProgress
+from app.gallery.controllers import gallery_controller, favorites_controller, download_controller, image_controller
 from app import config
 from starlette.staticfiles import StaticFiles
 from app.api.admin_cleanup import router as cleanup_router
+from app.api.admin_storage import router as storage_admin_router
+from app.api.admin_renditions import router as renditions_admin_router
+from app.api.admin_galleries import router as galleries_admin_router
+from app.api.admin_db import router as db_admin_router
 from app.api.whatsapp_webhook import router as whatsapp_router
 from app.api.whatsapp_admin import router as whatsapp_admin_router
 
@@ -48,11 +53,22 @@ async def health_check():
 async def rate_limit_handler(request, exc):
     return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
 
+@app.exception_handler(GenerationInProgress)
+async def generation_in_progress_handler(request, exc):
+    # another worker is still rendering what this request needs
+    return JSONResponse(status_code=503, content={"detail": "building"}, headers={"Retry-After": "5"})
+
 app.include_router(user_controller.router, prefix="/api")
 app.include_router(auth_controller.router, prefix="/api") 
 app.include_router(admin_controller.router, prefix="/api")
 app.include_router(gallery_controller.router, prefix="/api")
 app.include_router(favorites_controller.router)
+app.include_router(download_controller.router)
+app.include_router(image_controller.router)
 app.include_router(cleanup_router)
+app.include_router(storage_admin_router)
+app.include_router(renditions_admin_router)
+app.include_router(galleries_admin_router)
+app.include_router(db_admin_router)
 app.include_router(whatsapp_router)
 app.include_router(whatsapp_admin_router)
@@ -3,6 +3,7 @@ from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 from app.database import engine
 from app.gallery.models.gallery_model import Gallery
+from app.gallery.services.gallery_manifest_service import unpublish
 from app.storage import storage
 
 REMINDER_BEFORE_DAYS = 3
@@ -52,6 +53,7 @@ def cleanup_expired_galleries():
         for gallery in to_soft_expire:
             gallery.status = "expired"
             gallery.expired_at = now
+            unpublish(str(gallery.id))
             result["soft_expired"].append(gallery.id)
 
         # 🔴 Day 37 hard delete
@@ -0,0 +1,129 @@
+"""
+EXPLAIN the hot queries and report any that would read a whole table.
+
+    python -m app.services.query_plans
+
+exits non-zero if one does, so it can gate a deploy or CI run against a
+migrated database. On Postgres sequential scans are disabled for the check
+(SET LOCAL enable_seqscan = off), so the plan reflects which indexes
+*can* serve the query rather than what the planner prefers on a small or
+empty table; any "Seq Scan" left means no usable index exists. SQLite
+plans don't depend on table size, a "SCAN <table>" without an index is
+the regression.
+"""
+from __future__ import annotations
+from typing import Callable, List, NamedTuple, Tuple
+import json, re, sys
+from sqlalchemy import func, inspect, select, text  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app.database import SessionLocal
+# every mapped class, so relationships resolve when the statements compile
+import app.auth.models.user_model, app.auth.models.login_audit_model, app.auth.models.role_model  # noqa: F401
+import app.auth.models.refresh_token_model, app.brand.watermark  # noqa: F401
+from app.gallery.models.favorite_model import Favorite
+from app.gallery.models.gallery_model import Gallery, Photo
+from app.gallery.models.rendition_model import PhotoRendition
+from app.leads.models.lead_model import Lead, LeadStage
+from app.whatsapp.models import WhatsAppMessage
+
+
+class HotQuery(NamedTuple):
+    name: str
+    table: str  # must not be read with a sequential scan
+    build: Callable[[], object]
+
+
+# Representative shapes of the queries the request paths run; literal
+# values stand in for the real parameters.
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("gallery photos page", "photos", lambda: (
+        select(Photo.id).where(Photo.gallery_id == 1, Photo.order_index > 0)
+        .order_by(Photo.order_index, Photo.id).limit(100)
+    )),
+    HotQuery("visitor favorites", "favorites", lambda: (
+        select(Favorite.photo_id).where(Favorite.gallery_id == 1, Favorite.selector == "selector")
+    )),
+    HotQuery("owner gallery listing", "galleries", lambda: (
+        select(Gallery.id).where(Gallery.owner_id == 1)
+        .order_by(Gallery.created_at.desc(), Gallery.id.desc()).limit(100)
+    )),
+    HotQuery("expiry cleanup", "galleries", lambda: (
+        select(Gallery.id).where(Gallery.status == "active", Gallery.created_at < func.now())
+    )),
+    HotQuery("renditions of a page", "photo_renditions", lambda: (
+        select(PhotoRendition.key).where(PhotoRendition.photo_id.in_([1, 2, 3]), PhotoRendition.kind == "thumb")
+    )),
+    HotQuery("whatsapp conversation", "whatsapp_messages", lambda: (
+        select(WhatsAppMessage.id).where(WhatsAppMessage.from_number == "+10000000000")
+        .order_by(WhatsAppMessage.created_at)
+    )),
+    HotQuery("whatsapp conversation list", "whatsapp_messages", lambda: (
+        select(WhatsAppMessage.from_number, func.max(WhatsAppMessage.created_at))
+        .where(WhatsAppMessage.direction == "incoming")
+        .group_by(WhatsAppMessage.from_number)
+    )),
+    HotQuery("leads by stage", "leads", lambda: (
+        select(Lead.id).where(Lead.stage == LeadStage.NEW)
+    )),
+]
+
+
+def _sql(db: Session, stmt) -> str:
+    return str(stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _pg_seq_scans(plan: dict, table: str) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") == table:
+        found.append(f"Seq Scan on {table}")
+    for child in plan.get("Plans", []):
+        found += _pg_seq_scans(child, table)
+    return found
+
+
+def explain(db: Session, q: HotQuery) -> List[str]:
+    """Plan lines showing `q.table` read in full; empty if the query uses an index."""
+    sql = _sql(db, q.build())
+    if db.get_bind().dialect.name == "postgresql":
+        try:
+            db.execute(text("SET LOCAL enable_seqscan = off"))
+            raw = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        finally:
+            db.rollback()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        return _pg_seq_scans(plan, q.table)
+
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    scan = re.compile(rf"^SCAN {re.escape(q.table)}\b")
+    return [r[-1] for r in rows if scan.match(r[-1]) and "INDEX" not in r[-1]]
+
+
+def check_plans(db: Session) -> Tuple[List[str], List[str]]:
+    """
+    (problems, skipped): one line per hot query that regressed to a
+    sequential scan, and the names of queries whose table doesn't exist
+    (whatsapp_messages is created by init_db, not by a migration).
+    """
+    tables = set(inspect(db.get_bind()).get_table_names())
+    problems, skipped = [], []
+    for q in HOT_QUERIES:
+        if q.table not in tables:
+            skipped.append(q.name)
+            continue
+        for line in explain(db, q):
+            problems.append(f"{q.name}: {line}")
+    return problems, skipped
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        problems, skipped = check_plans(db)
+    finally:
+        db.close()
+    for p in problems:
+        print(p)
+    if skipped:
+        print(f"skipped, table missing: {', '.join(skipped)}")
+    print(f"{len(HOT_QUERIES) - len(skipped)} hot queries checked, {len(problems)} sequential scans")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,375 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+import os, tempfile, threading, time
+from sqlalchemy import case, distinct, func, or_  #type: ignore
+from sqlalchemy.exc import IntegrityError  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app import config
+from app.brand.service import get_settings, settings_hash
+from app.database import SessionLocal
+from app.gallery.models.gallery_model import Gallery, Photo
+from app.gallery.models.rendition_model import PhotoRendition
+from app.gallery.models.rerender_job_model import RerenderJob
+from app.gallery.services import gallery_manifest_service, rendition_service
+from app.gallery.services.paths import resized_key, watermarked_key
+from app.gallery.utils.single_flight import GenerationInProgress, process_lock, single_flight
+from app.images import image_size, make_original_with_watermark, make_preview, make_size, make_thumb, make_width
+from app.storage import storage
+
+# Renditions that carry the watermark; uploaded originals never do.
+WATERMARKED_KINDS = ("preview", "thumb", "download", "resize")
+
+# photos fetched per work-list query
+BATCH_SIZE = 200
+# don't write progress to the DB more often than this
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _stale(wm_hash: str):
+    return (
+        PhotoRendition.kind.in_(WATERMARKED_KINDS),
+        or_(PhotoRendition.settings_hash.is_(None), PhotoRendition.settings_hash != wm_hash),
+    )
+
+
+def count_stale_photos(db: Session, wm_hash: str) -> int:
+    return db.query(func.count(distinct(PhotoRendition.photo_id))).filter(*_stale(wm_hash)).scalar() or 0
+
+
+def _stale_photo_ids(db: Session, wm_hash: str, skip: Set[int], limit: int) -> List[int]:
+    """
+    Next photos with at least one stale rendition, the ones most likely to
+    be looked at first: active galleries, public before private, most
+    recently changed gallery first; within a gallery the cover, then
+    gallery order.
+    """
+    q = (
+        db.query(Photo.id)
+        .join(Gallery, Gallery.id == Photo.gallery_id)
+        .filter(Photo.id.in_(db.query(PhotoRendition.photo_id).filter(*_stale(wm_hash))))
+    )
+    if skip:
+        q = q.filter(~Photo.id.in_(skip))
+    q = q.order_by(
+        case((Gallery.status == "active", 0), else_=1),
+        case((Gallery.is_public.is_(True), 0), else_=1),
+        func.coalesce(Gallery.updated_at, Gallery.created_at).desc(),
+        Gallery.id.desc(),
+        case((Photo.is_cover.is_(True), 0), else_=1),
+        Photo.order_index,
+        Photo.id,
+    )
+    return [pid for (pid,) in q.limit(limit).all()]
+
+
+def _render(src: str, out: str, kind: str, size: str, fmt: Optional[str], db: Session) -> None:
+    if kind == "resize":
+        # size is the width step, see download_helper.ensure_resized_for_photo
+        make_width(src, out, int(size), db, fmt or "jpeg")
+    elif kind == "preview":
+        make_preview(src, out, config.IMAGE_SIZES["preview"], db)
+    elif kind == "thumb":
+        make_thumb(src, out, config.IMAGE_SIZES["thumb"], db)
+    elif size == "original":
+        make_original_with_watermark(src, out, db)
+    else:
+        make_size(src, out, int(config.DOWNLOAD_SIZES[size] or 0), db)
+
+
+def rerender_photo(db: Session, photo: Photo, wm_hash: str) -> int:
+    """
+    Render every stale watermarked rendition of `photo` again from one copy
+    of its original, under keys for `wm_hash`, and drop the objects they
+    replace. Each rendition is made under the same single-flight key the
+    download path uses, so a concurrent request never renders it twice.
+    Returns the number of renditions written.
+    """
+    rows = db.query(PhotoRendition).filter(PhotoRendition.photo_id == photo.id, *_stale(wm_hash)).all()
+    if not rows:
+        return 0
+    orig = rendition_service.get_rendition(db, photo.id, "original", format=None)
+    orig_key = orig.key if orig else photo.path_original
+    gallery_id = str(photo.gallery_id)
+    file_id = str(photo.filename or photo.id)
+
+    written = 0
+    with tempfile.TemporaryDirectory() as td:
+        src = os.path.join(td, "original")
+        storage.download_to_path(orig_key, src)
+
+        for kind, size, fmt in [(r.kind, r.size, r.format) for r in rows]:
+            if kind == "resize":
+                name = f"w{size}.{fmt}"
+                key = resized_key(gallery_id, file_id, int(size), fmt, wm_hash)
+            else:
+                name = size if kind == "download" else kind
+                key = watermarked_key(gallery_id, file_id, name, wm_hash)
+
+            def generate(kind=kind, size=size, fmt=fmt, name=name, key=key) -> bool:
+                r = rendition_service.get_rendition(db, photo.id, kind, size, format=fmt)
+                if r is None or r.settings_hash == wm_hash:
+                    return False  # gone, or re-rendered by a request meanwhile
+                old_key = r.key
+                out = os.path.join(td, f"{name}.{fmt}" if kind == "resize" else f"{name}.jpg")
+                _render(src, out, kind, size, fmt, db)
+                with open(out, "rb") as f:
+                    storage.save_fileobj(f, key, content_type=f"image/{fmt}" if kind == "resize" else None)
+                w, h = image_size(out)
+                rendition_service.record_rendition(
+                    db, photo.id, kind, key, size=size, format=fmt,
+                    bytes=os.path.getsize(out), crc32=rendition_service.file_crc32(out),
+                    width=w, height=h, settings_hash=wm_hash,
+                )
+                if old_key != key:
+                    try:
+                        storage.delete(old_key)
+                    except Exception as e:
+                        print(f"rerender: cannot delete superseded {old_key}: {e}")
+                return True
+
+            if single_flight.do(f"rendition:{photo.id}:{name}", generate):
+                written += 1
+    return written
+
+
+def _rerender_photo_id(photo_id: int, wm_hash: str, pause: threading.Event) -> Tuple[int, Optional[int], Optional[Exception]]:
+    if pause.is_set():
+        return photo_id, None, None
+    db = SessionLocal()
+    try:
+        photo = db.get(Photo, photo_id)
+        n = rerender_photo(db, photo, wm_hash) if photo else 0
+        return photo_id, n, None
+    except Exception as e:
+        db.rollback()
+        return photo_id, None, e
+    finally:
+        db.close()
+
+
+def _get_or_create_job(db: Session, wm_hash: str) -> RerenderJob:
+    job = db.query(RerenderJob).filter(RerenderJob.settings_hash == wm_hash).first()
+    if job is None:
+        job = RerenderJob(settings_hash=wm_hash, status="queued",
+                          photos_total=0, photos_done=0, photos_failed=0, renditions_done=0)
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            job = db.query(RerenderJob).filter(RerenderJob.settings_hash == wm_hash).first()
+        db.refresh(job)
+    return job
+
+
+def run_rerender(job_id: int) -> bool:
+    """
+    Work through job `job_id` in the calling thread until nothing is stale,
+    it is paused, or the brand settings change again (status "superseded").
+    Photos that fail are skipped for the rest of the run and retried by the
+    next one. Returns False without doing anything if another worker
+    already runs a re-render.
+    """
+    try:
+        with process_lock("rerender-renditions", wait=False):
+            _run(job_id)
+    except GenerationInProgress:
+        return False
+    return True
+
+
+def _run(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(RerenderJob, job_id)
+        if job is None:
+            return
+        wm_hash = job.settings_hash
+        if job.status in ("pausing", "paused"):
+            # paused while it was waiting to start
+            job.status = "paused"
+            db.commit()
+            return
+        # resuming: whatever was done before no longer shows up as stale
+        job.status = "running"
+        job.error = None
+        job.finished_at = None
+        job.photos_failed = 0
+        job.photos_total = job.photos_done + count_stale_photos(db, wm_hash)
+        db.commit()
+
+        interval = 1.0 / config.RERENDER_MAX_PHOTOS_PER_SECOND if config.RERENDER_MAX_PHOTOS_PER_SECOND > 0 else 0.0
+        next_start = time.monotonic()
+        last_progress = 0.0
+        failed: Set[int] = set()
+        status = "done"
+        # The pause is requested on the job row (pause_rerender), so it
+        # reaches whichever process runs the job; the row is read at most
+        # once per PROGRESS_INTERVAL_SECONDS and the answer shared with the
+        # workers, which skip photos not started yet.
+        pause = threading.Event()
+        last_check = [0.0]
+
+        def pause_requested() -> bool:
+            now = time.monotonic()
+            if not pause.is_set() and now - last_check[0] >= PROGRESS_INTERVAL_SECONDS:
+                last_check[0] = now
+                status = db.query(RerenderJob.status).filter(RerenderJob.id == job_id).scalar()
+                if status == "pausing":
+                    pause.set()
+            return pause.is_set()
+
+        with ThreadPoolExecutor(max_workers=max(1, config.RERENDER_WORKERS), thread_name_prefix="rerender") as pool:
+            while True:
+                if pause_requested():
+                    status = "paused"
+                    break
+                if settings_hash(get_settings(db)) != wm_hash:
+                    status = "superseded"
+                    break
+                ids = _stale_photo_ids(db, wm_hash, failed, BATCH_SIZE)
+                if not ids:
+                    break
+
+                futures = []
+                for pid in ids:
+                    if pause_requested():
+                        break
+                    if interval:
+                        delay = next_start - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        next_start = max(next_start, time.monotonic()) + interval
+                    futures.append(pool.submit(_rerender_photo_id, pid, wm_hash, pause))
+
+                for fut in as_completed(futures):
+                    pid, n, err = fut.result()
+                    if err is not None:
+                        failed.add(pid)
+                        job.photos_failed += 1
+                        print(f"rerender: photo {pid} failed: {err}")
+                    elif n is not None:
+                        job.photos_done += 1
+                        job.renditions_done += n
+                    now = time.monotonic()
+                    if now - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                        last_progress = now
+                        db.commit()
+                        pause_requested()
+                db.commit()
+
+        if status == "done" and failed:
+            status = "failed"
+            job.error = f"{len(failed)} photos could not be re-rendered; run again to retry them"
+        job.status = status
+        if status in ("done", "failed"):
+            job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+
+        # published manifests point at the thumbs and previews just replaced
+        if job.photos_done:
+            for (gid,) in db.query(Gallery.id).filter(Gallery.is_public.is_(True), Gallery.status == "active").all():
+                try:
+                    gallery_manifest_service.publish(db, str(gid))
+                except Exception as e:
+                    print(f"rerender: cannot republish manifest of gallery {gid}: {e}")
+        print(f"rerender {job_id}: {status}, {job.photos_done}/{job.photos_total} photos, {job.renditions_done} renditions")
+    except Exception as e:
+        db.rollback()
+        print(f"rerender {job_id} failed: {e}")
+        job = db.get(RerenderJob, job_id)
+        if job is not None:
+            job.status = "failed"
+            job.error = str(e)[:2000]
+            db.commit()
+    finally:
+        db.close()
+
+
+def _worker() -> None:
+    # keep going while there is a queued job for the current settings, so a
+    # job superseded mid-run hands over to the one queued after it
+    while True:
+        db = SessionLocal()
+        try:
+            job = db.query(RerenderJob).filter(
+                RerenderJob.settings_hash == settings_hash(get_settings(db)),
+                RerenderJob.status.in_(("queued", "running")),
+            ).first()
+            job_id = job.id if job else None
+        finally:
+            db.close()
+        if job_id is None or not run_rerender(job_id):
+            return
+
+
+def start_rerender(db: Session) -> RerenderJob:
+    """
+    Queue re-rendering for the current brand settings (or resume it) and
+    make sure this process is working on it in the background.
+    """
+    global _thread
+    job = _get_or_create_job(db, settings_hash(get_settings(db)))
+    if job.status == "pausing":
+        job.status = "running"  # still running: take the pause back
+    elif job.status != "running":
+        job.status = "queued"
+    db.commit()
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_worker, name="rerender", daemon=True)
+            _thread.start()
+    return job
+
+
+def pause_rerender(db: Session) -> Optional[RerenderJob]:
+    """
+    Pause the job for the current settings: a running one finishes the
+    photos already started and then stops ("pausing", then "paused"), a
+    queued one is paused straight away. Works from any process, since the
+    worker reads the request off the job row. start_rerender resumes.
+    """
+    job = current_job(db)
+    if job is None:
+        return None
+    for current, paused in (("running", "pausing"), ("queued", "paused")):
+        db.query(RerenderJob).filter(RerenderJob.id == job.id, RerenderJob.status == current).update(
+            {RerenderJob.status: paused}, synchronize_session=False)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def job_status(db: Session, job: Optional[RerenderJob]) -> dict:
+    wm_hash = settings_hash(get_settings(db))
+    out = {"settings_hash": wm_hash, "stale_photos": count_stale_photos(db, wm_hash)}
+    if job is None:
+        out["status"] = "none"
+        return out
+    out.update({
+        "status": job.status,
+        "photos_total": job.photos_total,
+        "photos_done": job.photos_done,
+        "photos_failed": job.photos_failed,
+        "renditions_done": job.renditions_done,
+        "error": job.error,
+    })
+    return out
+
+
+def current_job(db: Session) -> Optional[RerenderJob]:
+    return db.query(RerenderJob).filter(RerenderJob.settings_hash == settings_hash(get_settings(db))).first()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        job_id = _get_or_create_job(db, settings_hash(get_settings(db))).id
+    finally:
+        db.close()
+    run_rerender(job_id)
@@ -4,7 +4,7 @@ from app import config
 from .base import Storage
 
 
-def _get_storage() -> Storage:
+def _get_backend() -> Storage:
     backend = getattr(config, "STORAGE_BACKEND", "gcs").lower()
 
     if backend == "local":
@@ -23,4 +23,31 @@ def _get_storage() -> Storage:
         raise RuntimeError(f"Unsupported STORAGE_BACKEND: {backend}")
 
 
+def _get_storage() -> Storage:
+    s = backend = _get_backend()
+
+    # local backend already reads from disk; caching it would just copy files around
+    if s.backend_name() == "local":
+        return s
+
+    # The metadata cache sits innermost so every exists()/stat() goes through
+    # it, but the disk cache revalidates its copies against the backend
+    # itself: a stat cached for up to STORAGE_META_TTL_SECONDS could miss an
+    # overwrite by another worker and keep serving the old bytes.
+    if config.STORAGE_META_TTL_SECONDS > 0:
+        from .metadata_cache import MetadataCachingStorage
+        s = MetadataCachingStorage(
+            s,
+            ttl=config.STORAGE_META_TTL_SECONDS,
+            negative_ttl=config.STORAGE_META_NEGATIVE_TTL_SECONDS,
+            max_entries=config.STORAGE_META_MAX_ENTRIES,
+        )
+
+    if config.STORAGE_CACHE_DIR:
+        from .caching import CachingStorage
+        s = CachingStorage(s, config.STORAGE_CACHE_DIR, config.STORAGE_CACHE_MAX_BYTES, origin=backend)
+
+    return s
+
+
 storage: Storage = _get_storage()
\ No newline at end of file
@@ -1,8 +1,111 @@
 from __future__ import annotations
-from typing import BinaryIO, Optional, List
+from typing import BinaryIO, Callable, Optional, List, Iterator, Dict
 from pathlib import Path
+from dataclasses import dataclass
 from abc import ABC
 
+
+@dataclass(frozen=True)
+class ObjectStat:
+    """
+    Metadata for a stored object.
+    `etag` changes whenever the object content changes (GCS generation,
+    S3 ETag, local mtime+size) and is what caches validate against.
+    """
+    key: str
+    size: int
+    etag: Optional[str] = None
+    content_type: Optional[str] = None
+
+
+class MultipartWriter:
+    """
+    Write handle returned by Storage.open_writer().
+
+    Writes are buffered into parts of `part_size` bytes and each full part is
+    handed to _upload_part() and dropped, so memory stays at about one part
+    whatever the object size. commit() uploads the rest and finishes the
+    object; leaving a `with` block normally commits.
+
+    `offset` is how many bytes were already stored when an interrupted upload
+    was resumed; the caller must continue writing from exactly that byte.
+    On an exception a resumable upload is kept for a later open_writer()
+    with the same resume token; a non-resumable one is aborted.
+    """
+
+    def __init__(self, part_size: int, offset: int = 0, resumable: bool = False):
+        self.part_size = max(1, int(part_size))
+        self.offset = offset
+        self.resumable = resumable
+        self.on_commit: List[Callable[[], None]] = []
+        self._buf = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        while len(self._buf) >= self.part_size:
+            part = bytes(self._buf[:self.part_size])
+            del self._buf[:self.part_size]
+            self._upload_part(part, final=False)
+        return len(data)
+
+    def commit(self) -> None:
+        part = bytes(self._buf)
+        self._buf = bytearray()
+        self._upload_part(part, final=True)
+        self._complete()
+        for cb in self.on_commit:
+            cb()
+
+    def abort(self) -> None:
+        pass
+
+    def __enter__(self) -> "MultipartWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.commit()
+        elif not self.resumable:
+            self.abort()
+        return False
+
+    # ---------- backend hooks ----------
+
+    def _upload_part(self, data: bytes, final: bool) -> None:
+        raise NotImplementedError
+
+    def _complete(self) -> None:
+        pass
+
+
+class _SpooledWriter(MultipartWriter):
+    """
+    Fallback for backends without a native multipart API: spool to a temp
+    file (in memory up to one part) and save_fileobj() it on commit.
+    """
+
+    def __init__(self, storage: "Storage", key: str, content_type: Optional[str], part_size: int):
+        import tempfile
+        super().__init__(part_size)
+        self._storage = storage
+        self._key = key
+        self._content_type = content_type
+        self._tmp = tempfile.SpooledTemporaryFile(max_size=self.part_size)
+
+    def _upload_part(self, data: bytes, final: bool) -> None:
+        self._tmp.write(data)
+
+    def _complete(self) -> None:
+        self._tmp.seek(0)
+        try:
+            self._storage.save_fileobj(self._tmp, self._key, self._content_type)
+        finally:
+            self._tmp.close()
+
+    def abort(self) -> None:
+        self._tmp.close()
+
+
 class Storage:
     """
     Common interface for interchangeable storage backends.
@@ -21,12 +124,58 @@ class Storage:
     def exists(self, key: str) -> bool:
         raise NotImplementedError
 
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        """
+        Return object metadata, or None if the object does not exist.
+        """
+        raise NotImplementedError
+
     def list_files(self, prefix: str) -> List[str]:
         raise NotImplementedError
 
+    def iter_objects(self, prefix: str) -> Iterator[ObjectStat]:
+        """
+        Yield metadata for every object under `prefix` (one listing, no per-object HEADs).
+        """
+        raise NotImplementedError
+
     def open_reader(self, key: str) -> BinaryIO:
         raise NotImplementedError
 
+    def open_writer(
+        self,
+        key: str,
+        content_type: Optional[str] = None,
+        part_size: int = 16 * 1024 * 1024,
+        resume_token: Optional[str] = None,
+    ) -> MultipartWriter:
+        """
+        Open `key` for streaming upload in parts (S3 multipart, GCS resumable).
+        With a `resume_token`, an unfinished upload to the same key opened
+        with the same token is continued from its `offset`; the token must
+        identify the exact bytes being written. Backends without native
+        support spool to a temp file and upload on commit.
+        """
+        return _SpooledWriter(self, key, content_type, part_size)
+
+    # resumable uploads keep their state next to the object
+    def _upload_state_key(self, key: str) -> str:
+        return f"{key}.upload.json"
+
+    def _read_upload_state(self, key: str) -> Optional[dict]:
+        import json
+        try:
+            return json.loads(self.read_bytes(self._upload_state_key(key)))
+        except Exception:
+            return None
+
+    def _write_upload_state(self, key: str, state: dict) -> None:
+        import json
+        self.write_bytes(self._upload_state_key(key), json.dumps(state).encode("utf-8"))
+
+    def _clear_upload_state(self, key: str) -> None:
+        self.delete(self._upload_state_key(key))
+
     # ---------- URL helpers ----------
 
     def url_for(self, key: str) -> Optional[str]:
@@ -38,6 +187,13 @@ class Storage:
     def signed_url(self, key: str, expires_seconds: int = 3600) -> str:
         raise NotImplementedError
 
+    def signed_urls(self, keys: List[str], expires_seconds: int = 3600) -> Dict[str, str]:
+        """
+        Sign many keys at once. Backends with a remote signer override this
+        to batch/parallelise; the default signs one by one.
+        """
+        return {k: self.signed_url(k, expires_seconds) for k in keys}
+
     # ---------- Helpers ----------
 
     def write_bytes(self, key: str, data: bytes) -> str:
@@ -45,3 +201,34 @@ class Storage:
         buf = io.BytesIO(data)
         buf.seek(0)
         return self.save_fileobj(buf, key)
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        with self.open_reader(src_key) as f:
+            return self.save_fileobj(f, dst_key)
+
+    def read_bytes(self, key: str) -> bytes:
+        with self.open_reader(key) as f:
+            return f.read()
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        """
+        Read `length` bytes starting at `start`. Remote backends override this
+        with a ranged GET.
+        """
+        with self.open_reader(key) as f:
+            if hasattr(f, "seekable") and f.seekable():
+                f.seek(start)
+            else:
+                remaining = start
+                while remaining > 0:
+                    skipped = f.read(min(remaining, 1024 * 1024))
+                    if not skipped:
+                        break
+                    remaining -= len(skipped)
+            return f.read(length)
+
+    def download_to_path(self, key: str, dst_path: str) -> None:
+        import shutil
+        Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+        with self.open_reader(key) as src, open(dst_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+from .base import Storage, ObjectStat
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Optional, List, Iterator, Dict
+import hashlib, json, os, shutil, tempfile, threading
+
+
+class CachingStorage(Storage):
+    """
+    Read-through disk cache in front of any Storage backend.
+
+    Objects read via read_bytes / download_to_path / open_reader are kept on
+    local disk (LRU, bounded by total bytes) and revalidated against the
+    backend's etag (GCS generation, S3 ETag) before each use, so a changed
+    object is never served stale. Writes and deletes made through this
+    wrapper drop the local copy.
+
+    Layout under `cache_dir`:
+        {sha[:2]}/{sha}        object bytes
+        {sha[:2]}/{sha}.json   {"key", "etag", "size"}
+
+    Several workers may share one cache dir; each keeps its own LRU index and
+    files are only ever replaced atomically (os.replace), so a reader sees
+    either the old or the new copy.
+
+    Etags are read from `origin` (default: `inner`). When `inner` caches
+    metadata, pass the raw backend here: a cached stat could still carry the
+    etag of an object another worker has since replaced, and would then
+    vouch for the stale local copy.
+    """
+
+    def __init__(self, inner: Storage, cache_dir: Path | str, max_bytes: int, origin: Optional[Storage] = None):
+        self.inner = inner
+        self.origin = origin or inner
+        self.root = Path(cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # sha -> size, oldest first
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    def __getattr__(self, name):
+        # backend-specific extras (generate_signed_url, backend_name, ...)
+        if name in ("inner", "origin"):
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # ---------- index ----------
+
+    def _digest(self, key: str) -> str:
+        return hashlib.sha256(key.lstrip("/").encode("utf-8")).hexdigest()
+
+    def _paths(self, sha: str) -> tuple[Path, Path]:
+        d = self.root / sha[:2]
+        return d / sha, d / f"{sha}.json"
+
+    def _load_index(self) -> None:
+        found = []
+        for meta_path in self.root.glob("*/*.json"):
+            data_path = meta_path.with_suffix("")
+            try:
+                st = data_path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, data_path.name, st.st_size))
+        for _, sha, size in sorted(found):
+            self._index[sha] = size
+            self._bytes += size
+
+    def _drop(self, sha: str) -> None:
+        size = self._index.pop(sha, None)
+        if size is not None:
+            self._bytes -= size
+        for p in self._paths(sha):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict_locked(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            sha = next(iter(self._index))
+            self._drop(sha)
+            self.evictions += 1
+
+    def _atomic_write_meta(self, meta_path: Path, meta: dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=meta_path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def _invalidate(self, key: str) -> None:
+        with self._lock:
+            self._drop(self._digest(key))
+
+    # ---------- fetch ----------
+
+    def _fetch(self, key: str) -> Optional[Path]:
+        """
+        Return a local path holding the current bytes of `key`, downloading
+        on miss. Returns None when the object is too large to cache (caller
+        should go to the backend directly). Raises FileNotFoundError if the
+        object does not exist.
+        """
+        remote = self.origin.stat(key)
+        sha = self._digest(key)
+        data_path, meta_path = self._paths(sha)
+
+        if remote is None:
+            self._invalidate(key)
+            raise FileNotFoundError(key)
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("etag") == remote.etag and remote.etag is not None and data_path.exists():
+                os.utime(data_path)
+                with self._lock:
+                    self.hits += 1
+                    if sha not in self._index:
+                        self._index[sha] = remote.size
+                        self._bytes += remote.size
+                    self._index.move_to_end(sha)
+                return data_path
+        except (FileNotFoundError, ValueError):
+            pass
+
+        with self._lock:
+            self.misses += 1
+
+        if remote.size > self.max_bytes:
+            return None
+
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=data_path.parent, prefix=".tmp-")
+        os.close(fd)
+        try:
+            self.inner.download_to_path(key, tmp)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, data_path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self._atomic_write_meta(meta_path, {"key": key, "etag": remote.etag, "size": size})
+
+        with self._lock:
+            old = self._index.pop(sha, None)
+            if old is not None:
+                self._bytes -= old
+            self._index[sha] = size
+            self._bytes += size
+            self._evict_locked()
+        return data_path
+
+    # ---------- reads (cached) ----------
+
+    def read_bytes(self, key: str) -> bytes:
+        path = self._fetch(key)
+        if path is None:
+            return self.inner.read_bytes(key)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # evicted by another worker between fetch and read
+            return self.inner.read_bytes(key)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        path = self._fetch(key)
+        if path is None:
+            return self.inner.read_range(key, start, length)
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                return f.read(length)
+        except FileNotFoundError:
+            return self.inner.read_range(key, start, length)
+
+    def download_to_path(self, key: str, dst_path: str) -> None:
+        path = self._fetch(key)
+        if path is None:
+            return self.inner.download_to_path(key, dst_path)
+        Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            shutil.copyfile(path, dst_path)
+        except FileNotFoundError:
+            self.inner.download_to_path(key, dst_path)
+
+    def open_reader(self, key: str) -> BinaryIO:
+        path = self._fetch(key)
+        if path is None:
+            return self.inner.open_reader(key)
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            return self.inner.open_reader(key)
+
+    # ---------- writes (invalidate) ----------
+
+    def save_fileobj(self, fileobj: BinaryIO, key: str, content_type: Optional[str] = None) -> str:
+        try:
+            return self.inner.save_fileobj(fileobj, key, content_type)
+        finally:
+            self._invalidate(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.inner.delete(key)
+        finally:
+            self._invalidate(key)
+
+    def open_writer(self, key: str, *args, **kwargs):
+        self._invalidate(key)
+        w = self.inner.open_writer(key, *args, **kwargs)
+        w.on_commit.append(lambda: self._invalidate(key))
+        return w
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        try:
+            return self.inner.copy(src_key, dst_key)
+        finally:
+            self._invalidate(dst_key)
+
+    # ---------- pass-through ----------
+
+    def exists(self, key: str) -> bool:
+        return self.inner.exists(key)
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        return self.inner.stat(key)
+
+    def list_files(self, prefix: str) -> List[str]:
+        return self.inner.list_files(prefix)
+
+    def iter_objects(self, prefix: str) -> Iterator[ObjectStat]:
+        return self.inner.iter_objects(prefix)
+
+    def url_for(self, key: str) -> Optional[str]:
+        return self.inner.url_for(key)
+
+    def signed_url(self, key: str, *args, **kwargs) -> str:
+        return self.inner.signed_url(key, *args, **kwargs)
+
+    def signed_urls(self, keys: List[str], expires_seconds: int = 3600) -> Dict[str, str]:
+        return self.inner.signed_urls(keys, expires_seconds)
+
+    # ---------- stats ----------
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,20 +1,96 @@
 from __future__ import annotations
-from .base import Storage
-from typing import BinaryIO, Optional
+from .base import Storage, ObjectStat, MultipartWriter
+from typing import BinaryIO, Optional, List, Iterator, Dict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from app import config
-import io, os
+import io, os, threading
 from datetime import datetime, timedelta
 from google.auth.transport import requests
+from google.auth.transport.requests import AuthorizedSession
 from google.auth import default, compute_engine
 
 # pip install google-cloud-storage
 from google.cloud import storage as gcs #type: ignore
 from google.oauth2 import service_account #type: ignore
+from .signing import SignedUrlCache
 
 project_id = config.GCP_PROJECT_ID
 SERVICE_ACCOUNT_EMAIL = "alrs-cloudrun-sa@alrprod.iam.gserviceaccount.com" 
 
+# refresh the metadata-server token this long before it expires
+SIGNING_REFRESH_MARGIN = timedelta(minutes=5)
+# parallel IAM signBlob calls for batch signing
+SIGNING_CONCURRENCY = 16
+
+
+# resumable upload chunks must be multiples of this (except the last)
+RESUMABLE_CHUNK_ALIGN = 256 * 1024
+
+
+class _GCSResumableWriter(MultipartWriter):
+    """
+    GCS resumable upload driven chunk by chunk. The session URL is kept in
+    the upload state; on resume the server is asked how many bytes it has
+    persisted and writing continues from there.
+    """
+
+    def __init__(self, storage: "GCSStorage", key: str, content_type, part_size: int, resume_token):
+        self._storage = storage
+        self._key = key
+        self._http = AuthorizedSession(storage.client._credentials)
+        self._url = None
+        offset = 0
+
+        state = storage._read_upload_state(key) if resume_token else None
+        if state and state.get("token") == resume_token:
+            persisted = self._query(state["session_url"])
+            if persisted is not None:
+                self._url, offset = state["session_url"], persisted
+
+        if self._url is None:
+            self._url = storage._blob(key).create_resumable_upload_session(content_type=content_type)
+            if resume_token:
+                storage._write_upload_state(key, {"token": resume_token, "session_url": self._url})
+        self._sent = offset
+        aligned = -(-max(1, part_size) // RESUMABLE_CHUNK_ALIGN) * RESUMABLE_CHUNK_ALIGN
+        super().__init__(aligned, offset, resumable=bool(resume_token))
+
+    def _query(self, url: str):
+        """Bytes persisted by an open session, or None if it is gone or finished."""
+        resp = self._http.put(url, data=b"", headers={"Content-Range": "bytes */*"})
+        if resp.status_code != 308:
+            return None
+        rng = resp.headers.get("Range")  # "bytes=0-N"
+        return int(rng.split("-")[1]) + 1 if rng else 0
+
+    def _upload_part(self, data: bytes, final: bool) -> None:
+        start, end = self._sent, self._sent + len(data) - 1
+        if final:
+            total = self._sent + len(data)
+            crange = f"bytes {start}-{end}/{total}" if data else f"bytes */{total}"
+        else:
+            crange = f"bytes {start}-{end}/*"
+        resp = self._http.put(self._url, data=data, headers={"Content-Range": crange})
+        if final:
+            if resp.status_code not in (200, 201):
+                raise RuntimeError(f"GCS upload of {self._key} failed to finalize: {resp.status_code}")
+        else:
+            persisted = resp.headers.get("Range")
+            if resp.status_code != 308 or not persisted or int(persisted.split("-")[1]) != end:
+                raise RuntimeError(f"GCS upload of {self._key} stored a short chunk: {resp.status_code} {persisted}")
+        self._sent += len(data)
+
+    def _complete(self) -> None:
+        self._storage._clear_upload_state(self._key)
+
+    def abort(self) -> None:
+        try:
+            self._http.delete(self._url)
+        except Exception:
+            pass
+        self._storage._clear_upload_state(self._key)
+
 
 class GCSStorage(Storage):
     def __init__(self):
@@ -23,13 +99,27 @@ class GCSStorage(Storage):
         if not self.bucket_name:
             raise RuntimeError("GCS_BUCKET_NAME not set")
 
+        self._sa_credentials = None
         if config.GCS_CREDENTIALS_JSON:
             creds = service_account.Credentials.from_service_account_file(config.GCS_CREDENTIALS_JSON)
+            self._sa_credentials = creds  # has a private key, signs locally
             self.client = gcs.Client(credentials=creds, project=project_id)
         else:
             self.client = gcs.Client()  # default creds
         self.bucket = self.client.bucket(self.bucket_name)
 
+        # signing credentials are built once and refreshed only near expiry
+        self._signing_lock = threading.Lock()
+        self._auth_request = None
+        self._default_credentials = None
+        self._signing_credentials = None
+
+        self.url_cache = SignedUrlCache(
+            self._sign,
+            bucket_seconds=config.GCS_SIGNED_URL_BUCKET_SECONDS,
+            max_entries=config.GCS_SIGNED_URL_CACHE_SIZE,
+        )
+
     def _blob(self, key: str):
         # normalize key: remove leading slashes
         k = key.lstrip("/")
@@ -50,6 +140,25 @@ class GCSStorage(Storage):
     def exists(self, key: str) -> bool:
         return self._blob(key).exists()
 
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        blob = self.bucket.get_blob(key.lstrip("/"))
+        if blob is None:
+            return None
+        # generation changes on every overwrite, so it is a stronger validator than md5
+        return ObjectStat(key=key, size=int(blob.size or 0), etag=str(blob.generation), content_type=blob.content_type)
+
+    def iter_objects(self, prefix: str) -> Iterator[ObjectStat]:
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefix.lstrip("/")):
+            yield ObjectStat(key=blob.name, size=int(blob.size or 0), etag=str(blob.generation), content_type=blob.content_type)
+
+    def list_files(self, prefix: str) -> List[str]:
+        return [o.key for o in self.iter_objects(prefix)]
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        # server-side copy, no bytes through this process
+        self.bucket.copy_blob(self._blob(src_key), self.bucket, dst_key.lstrip("/"))
+        return dst_key
+
     def delete(self, key: str) -> None:
         try:
             self._blob(key).delete()
@@ -61,6 +170,49 @@ class GCSStorage(Storage):
         # Most will be private; return None and use signed_url().
         return None
     
+    def _get_signing_credentials(self):
+        if self._sa_credentials is not None:
+            return self._sa_credentials
+
+        with self._signing_lock:
+            creds = self._default_credentials
+            expiry = getattr(creds, "expiry", None)  # naive UTC
+            stale = (
+                creds is None
+                or not creds.valid
+                or (expiry is not None and expiry - datetime.utcnow() < SIGNING_REFRESH_MARGIN)
+            )
+            if stale or self._signing_credentials is None:
+                if creds is None:
+                    creds, _ = default()
+                    self._auth_request = requests.Request()
+                creds.refresh(self._auth_request)
+                self._default_credentials = creds
+                # signs through the IAM signBlob API as the runtime service account
+                self._signing_credentials = compute_engine.IDTokenCredentials(
+                    self._auth_request,
+                    "",
+                    service_account_email=creds.service_account_email
+                )
+            return self._signing_credentials
+
+    def _sign(
+        self,
+        key: str,
+        expiration: datetime,
+        method: str,
+        content_disposition: Optional[str],
+        content_type: Optional[str],
+    ) -> str:
+        return self._blob(key).generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            method=method,
+            response_disposition=content_disposition,
+            response_type=content_type,
+            credentials=self._get_signing_credentials(),
+        )
+
     def generate_signed_url(
         self,
         key: str,
@@ -72,44 +224,46 @@ class GCSStorage(Storage):
     ) -> str:
         """
         Generate a V4 signed URL for the given object with optional headers.
+        URLs are served from `url_cache`, so the same object yields the same
+        URL until it gets close to its (bucketed) expiry.
         """
-        credentials, _ = default()
-    
-        # then within your abstraction
-        auth_request = requests.Request()
-        credentials.refresh(auth_request)
-        
-        signing_credentials = compute_engine.IDTokenCredentials(
-            auth_request,
-            "",
-            service_account_email=credentials.service_account_email
-        )
-        blob = self._blob(key)
-        params = {}
-        if content_disposition:
-            params["response-content-disposition"] = content_disposition
-        if content_type:
-            params["response-content-type"] = content_type
-
-        # Use UTC for expiration
-        expiration = datetime.utcnow() + timedelta(seconds=expires)
-        return blob.generate_signed_url(
-            version="v4",
-            expiration=expiration,
+        return self.url_cache.get(
+            key.lstrip("/"),
+            expires,
             method=method,
-            response_disposition=content_disposition,
-            response_type=content_type,
-            credentials=signing_credentials,
-            # For older google-cloud-storage versions, use query_parameters=params
-            # Newer versions accept response_* kwargs directly as above.
+            content_disposition=content_disposition,
+            content_type=content_type,
         )
 
     # Back-compat shim (if anything still calls this)
     
 
-    def signed_url(self, key: str, expires_seconds: int, response_disposition) -> str:
+    def signed_url(self, key: str, expires_seconds: int, response_disposition=None) -> str:
         return self.generate_signed_url(key, expires=expires_seconds, content_disposition=response_disposition)
 
+    def signed_urls(self, keys: List[str], expires_seconds: int = 3600) -> Dict[str, str]:
+        """
+        Sign a batch of keys. Cached URLs come straight from `url_cache`;
+        only the misses are signed, concurrently so IAM round-trips overlap.
+        """
+        out: Dict[str, str] = {}
+        misses = []
+        for k in dict.fromkeys(keys):
+            url = self.url_cache.peek(k.lstrip("/"), expires_seconds)
+            if url is not None:
+                out[k] = url
+            else:
+                misses.append(k)
+        if len(misses) <= 1:
+            out.update((k, self.generate_signed_url(k, expires=expires_seconds)) for k in misses)
+            return out
+        # warm the credentials once, not once per thread
+        self._get_signing_credentials()
+        with ThreadPoolExecutor(max_workers=min(SIGNING_CONCURRENCY, len(misses))) as pool:
+            urls = pool.map(lambda k: self.generate_signed_url(k, expires=expires_seconds), misses)
+            out.update(zip(misses, urls))
+        return out
+
     def backend_name(self) -> str:
         return "gcs"
 
@@ -120,6 +274,16 @@ class GCSStorage(Storage):
         blob = self._blob(key)
         return blob.download_as_bytes()
     
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        # `end` is inclusive
+        return self._blob(key).download_as_bytes(start=start, end=start + length - 1)
+
+    def open_writer(self, key: str, content_type: Optional[str] = None,
+                    part_size: int = 16 * 1024 * 1024, resume_token: Optional[str] = None) -> MultipartWriter:
+        return _GCSResumableWriter(self, key, content_type, part_size, resume_token)
+
     def open_reader(self, key: str):
         # Requires google-cloud-storage >= 2.10
         blob = self._blob(key)
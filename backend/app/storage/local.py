@@ -1,10 +1,49 @@
 from __future__ import annotations
-from .base import Storage
+from .base import Storage, ObjectStat, MultipartWriter
 from pathlib import Path
-from typing import BinaryIO, Optional, List
-import os
+from typing import BinaryIO, Optional, List, Iterator
+import os, shutil
 from app import config
 
+class _LocalWriter(MultipartWriter):
+    """
+    Appends to `{path}.part` and renames it into place on commit; a resumed
+    upload continues from the size of the part file.
+    """
+
+    def __init__(self, storage: "LocalStorage", key: str, part_size: int, resume_token: Optional[str]):
+        self._storage = storage
+        self._key = key
+        self._path = storage._abs(key)
+        self._part = self._path.with_name(self._path.name + ".part")
+        self._part.parent.mkdir(parents=True, exist_ok=True)
+
+        state = storage._read_upload_state(key) if resume_token else None
+        if state and state.get("token") == resume_token and self._part.exists():
+            offset = self._part.stat().st_size
+            self._f = open(self._part, "ab")
+        else:
+            self._f = open(self._part, "wb")
+            offset = 0
+            if resume_token:
+                storage._write_upload_state(key, {"token": resume_token})
+        super().__init__(part_size, offset, resumable=bool(resume_token))
+
+    def _upload_part(self, data: bytes, final: bool) -> None:
+        self._f.write(data)
+        self._f.flush()
+
+    def _complete(self) -> None:
+        self._f.close()
+        os.replace(self._part, self._path)
+        self._storage._clear_upload_state(self._key)
+
+    def abort(self) -> None:
+        self._f.close()
+        self._part.unlink(missing_ok=True)
+        self._storage._clear_upload_state(self._key)
+
+
 class LocalStorage(Storage):
     def __init__(self):
         self.root: Path = config.MEDIA_ROOT
@@ -34,6 +73,13 @@ class LocalStorage(Storage):
     def exists(self, key: str) -> bool:
         return self._abs(key).exists()
 
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        try:
+            st = self._abs(key).stat()
+        except FileNotFoundError:
+            return None
+        return ObjectStat(key=key, size=st.st_size, etag=f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
     def list_files(self, prefix: str) -> List[str]:
         base = self._abs(prefix)
         if not base.exists():
@@ -46,15 +92,31 @@ class LocalStorage(Storage):
                 results.append(str(rel))
         return results
 
+    def iter_objects(self, prefix: str) -> Iterator[ObjectStat]:
+        for rel in self.list_files(prefix):
+            st = self.stat(rel)
+            if st:
+                yield st
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        dst = self._abs(dst_key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self._abs(src_key), dst)
+        return dst_key
+
     def open_reader(self, key: str):
         return open(self._abs(key), "rb")
 
+    def open_writer(self, key: str, content_type: Optional[str] = None,
+                    part_size: int = 16 * 1024 * 1024, resume_token: Optional[str] = None) -> MultipartWriter:
+        return _LocalWriter(self, key, part_size, resume_token)
+
     # ---------- URL helpers ----------
 
     def url_for(self, key: str) -> Optional[str]:
         return f"/media/{key}"
 
-    def signed_url(self, key: str, expires_seconds: int = 3600) -> str:
+    def signed_url(self, key: str, expires_seconds: int = 3600, response_disposition=None) -> str:
         return self.url_for(key)
 
     def backend_name(self) -> str:
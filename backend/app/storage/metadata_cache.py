@@ -0,0 +1,171 @@
+from __future__ import annotations
+from .base import Storage, ObjectStat
+from collections import OrderedDict
+from typing import BinaryIO, Optional, List, Iterator, Dict, Tuple
+import threading, time
+
+
+class MetadataCachingStorage(Storage):
+    """
+    TTL cache for exists()/stat() in front of a remote backend.
+
+    Positive results live for `ttl` seconds, misses for `negative_ttl`.
+    save_fileobj / delete / copy issued through this wrapper invalidate the
+    affected key, so this process always sees its own writes.
+
+    warm(prefix) fills the cache from a single listing; until it expires,
+    any key under that prefix that was not listed is answered as missing
+    without a HEAD request.
+    """
+
+    def __init__(self, inner: Storage, ttl: float, negative_ttl: float, max_entries: int = 100_000):
+        self.inner = inner
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.max_entries = int(max_entries)
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, stat or None). An expired entry means "ask the
+        # backend", and also overrides a warmed prefix for that key.
+        self._entries: "OrderedDict[str, Tuple[float, Optional[ObjectStat]]]" = OrderedDict()
+        self._warm: dict[str, float] = {}  # prefix -> expires_at
+
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    # ---------- cache ----------
+
+    def _norm(self, key: str) -> str:
+        return key.lstrip("/")
+
+    def _put_locked(self, key: str, st: Optional[ObjectStat], now: float) -> None:
+        ttl = self.ttl if st is not None else self.negative_ttl
+        self._entries[key] = (now + ttl, st)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # an evicted invalidation marker could let a warmed prefix answer
+            # "missing" for a key we just wrote; drop warm prefixes to be safe
+            self._warm.clear()
+
+    def _lookup_locked(self, key: str, now: float) -> Tuple[bool, Optional[ObjectStat]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, st = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return True, st
+            return False, None
+        for prefix, expires_at in self._warm.items():
+            if expires_at > now and key.startswith(prefix):
+                return True, None
+        return False, None
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries[self._norm(key)] = (0.0, None)
+
+    def warm(self, prefix: str) -> int:
+        """
+        List `prefix` once and cache every object's metadata.
+        Returns the number of objects found.
+        """
+        p = self._norm(prefix)
+        listed = list(self.inner.iter_objects(p))
+        now = time.monotonic()
+        with self._lock:
+            for st in listed:
+                self._put_locked(self._norm(st.key), st, now)
+            self._warm = {k: v for k, v in self._warm.items() if v > now}
+            self._warm[p] = now + self.negative_ttl
+        return len(listed)
+
+    def metadata_stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "entries": len(self._entries),
+                "warm_prefixes": len(self._warm),
+            }
+
+    # ---------- metadata (cached) ----------
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        k = self._norm(key)
+        with self._lock:
+            found, st = self._lookup_locked(k, time.monotonic())
+            if found:
+                self.hits += 1
+                return st
+            self.misses += 1
+        st = self.inner.stat(key)
+        with self._lock:
+            self._put_locked(k, st, time.monotonic())
+        return st
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    # ---------- writes (invalidate) ----------
+
+    def save_fileobj(self, fileobj: BinaryIO, key: str, content_type: Optional[str] = None) -> str:
+        try:
+            return self.inner.save_fileobj(fileobj, key, content_type)
+        finally:
+            self.invalidate(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.inner.delete(key)
+        finally:
+            self.invalidate(key)
+
+    def open_writer(self, key: str, *args, **kwargs):
+        self.invalidate(key)
+        w = self.inner.open_writer(key, *args, **kwargs)
+        w.on_commit.append(lambda: self.invalidate(key))
+        return w
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        try:
+            return self.inner.copy(src_key, dst_key)
+        finally:
+            self.invalidate(dst_key)
+
+    # ---------- pass-through ----------
+
+    def list_files(self, prefix: str) -> List[str]:
+        return self.inner.list_files(prefix)
+
+    def iter_objects(self, prefix: str) -> Iterator[ObjectStat]:
+        return self.inner.iter_objects(prefix)
+
+    def open_reader(self, key: str) -> BinaryIO:
+        return self.inner.open_reader(key)
+
+    def read_bytes(self, key: str) -> bytes:
+        return self.inner.read_bytes(key)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        return self.inner.read_range(key, start, length)
+
+    def download_to_path(self, key: str, dst_path: str) -> None:
+        return self.inner.download_to_path(key, dst_path)
+
+    def url_for(self, key: str) -> Optional[str]:
+        return self.inner.url_for(key)
+
+    def signed_url(self, key: str, *args, **kwargs) -> str:
+        return self.inner.signed_url(key, *args, **kwargs)
+
+    def signed_urls(self, keys: List[str], expires_seconds: int = 3600) -> Dict[str, str]:
+        return self.inner.signed_urls(keys, expires_seconds)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+import math, threading, time
+
+# sign(key, expiration_utc, method, content_disposition, content_type) -> url
+Signer = Callable[[str, datetime, str, Optional[str], Optional[str]], str]
+
+
+class SignedUrlCache:
+    """
+    LRU of signed URLs with expiry snapped to fixed time buckets.
+
+    A URL is signed to expire at the end of a bucket at least `bucket_seconds`
+    past the requested lifetime, and reused while it still has the requested
+    lifetime left. Repeated requests for the same object therefore get the
+    byte-identical URL (and the same browser/CDN cache entry) for at least
+    one bucket, and each object is signed at most once per bucket.
+    """
+
+    def __init__(self, sign: Signer, bucket_seconds: int = 900, max_entries: int = 10_000,
+                 clock: Callable[[], float] = time.time):
+        self._sign = sign
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.max_entries = int(max_entries)
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # (key, method, disposition, content_type) -> (expires_at_epoch, url)
+        self._urls: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _expiry_for(self, now: float, expires: int) -> float:
+        b = self.bucket_seconds
+        return math.ceil((now + expires + b) / b) * b
+
+    def peek(self, key: str, expires: int, method: str = "GET",
+             content_disposition: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+        """The cached URL if it still has `expires` seconds left, else None; never signs."""
+        now = self._clock()
+        ck = (key, method, content_disposition, content_type)
+        with self._lock:
+            hit = self._urls.get(ck)
+            if hit and hit[0] - now >= expires:
+                self._urls.move_to_end(ck)
+                self.hits += 1
+                return hit[1]
+        return None
+
+    def get(self, key: str, expires: int, method: str = "GET",
+            content_disposition: Optional[str] = None, content_type: Optional[str] = None) -> str:
+        url = self.peek(key, expires, method, content_disposition, content_type)
+        if url is not None:
+            return url
+        now = self._clock()
+        ck = (key, method, content_disposition, content_type)
+        with self._lock:
+            self.misses += 1
+
+        exp_at = self._expiry_for(now, expires)
+        url = self._sign(key, datetime.fromtimestamp(exp_at, tz=timezone.utc), method, content_disposition, content_type)
+
+        with self._lock:
+            self._urls[ck] = (exp_at, url)
+            self._urls.move_to_end(ck)
+            while len(self._urls) > self.max_entries:
+                self._urls.popitem(last=False)
+        return url
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._urls)}
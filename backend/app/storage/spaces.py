@@ -1,8 +1,85 @@
 import boto3
 from botocore.exceptions import ClientError
-from .base import Storage
+from .base import Storage, ObjectStat, MultipartWriter
 from app import config
 
+# S3 rejects non-final multipart parts smaller than this
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class _S3MultipartWriter(MultipartWriter):
+    """
+    S3 multipart upload. The upload id is kept in the upload state so an
+    interrupted build can list the parts already stored and continue.
+    """
+
+    def __init__(self, storage: "SpacesStorage", key: str, content_type, part_size: int, resume_token):
+        self._storage = storage
+        self._client = storage.client
+        self._bucket = storage.bucket_name
+        self._key = key
+        self._parts = []
+        self._upload_id = None
+        offset = 0
+
+        state = storage._read_upload_state(key) if resume_token else None
+        if state and state.get("token") == resume_token:
+            try:
+                stored = self._list_parts(state["upload_id"])
+                # only a gap-free run of parts from 1 can be continued
+                for i, part in enumerate(stored, start=1):
+                    if part["PartNumber"] != i:
+                        break
+                    self._parts.append({"PartNumber": i, "ETag": part["ETag"]})
+                    offset += part["Size"]
+                self._upload_id = state["upload_id"]
+            except ClientError:
+                self._parts, offset = [], 0
+        elif state:
+            self._abort_upload(state.get("upload_id"))
+
+        if self._upload_id is None:
+            extra = {"ContentType": content_type} if content_type else {}
+            self._upload_id = self._client.create_multipart_upload(Bucket=self._bucket, Key=key, **extra)["UploadId"]
+            if resume_token:
+                storage._write_upload_state(key, {"token": resume_token, "upload_id": self._upload_id})
+        super().__init__(max(part_size, MIN_PART_SIZE), offset, resumable=bool(resume_token))
+
+    def _list_parts(self, upload_id: str) -> list:
+        parts = []
+        paginator = self._client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=self._bucket, Key=self._key, UploadId=upload_id):
+            parts.extend(page.get("Parts", []))
+        return sorted(parts, key=lambda p: p["PartNumber"])
+
+    def _abort_upload(self, upload_id) -> None:
+        if not upload_id:
+            return
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=upload_id)
+        except ClientError:
+            pass
+
+    def _upload_part(self, data: bytes, final: bool) -> None:
+        if final and not data and self._parts:
+            return
+        n = len(self._parts) + 1
+        resp = self._client.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=n, Body=data,
+        )
+        self._parts.append({"PartNumber": n, "ETag": resp["ETag"]})
+
+    def _complete(self) -> None:
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+        self._storage._clear_upload_state(self._key)
+
+    def abort(self) -> None:
+        self._abort_upload(self._upload_id)
+        self._storage._clear_upload_state(self._key)
+
 
 class SpacesStorage(Storage):
     def __init__(self):
@@ -37,6 +114,51 @@ class SpacesStorage(Storage):
         except ClientError:
             return False
 
+    def stat(self, key: str):
+        try:
+            head = self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError:
+            return None
+        return ObjectStat(
+            key=key,
+            size=int(head.get("ContentLength") or 0),
+            etag=(head.get("ETag") or "").strip('"') or None,
+            content_type=head.get("ContentType"),
+        )
+
+    def iter_objects(self, prefix: str):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield ObjectStat(
+                    key=obj["Key"],
+                    size=int(obj.get("Size") or 0),
+                    etag=(obj.get("ETag") or "").strip('"') or None,
+                )
+
+    def list_files(self, prefix: str):
+        return [o.key for o in self.iter_objects(prefix)]
+
+    def copy(self, src_key: str, dst_key: str) -> str:
+        self.client.copy_object(
+            Bucket=self.bucket_name,
+            Key=dst_key,
+            CopySource={"Bucket": self.bucket_name, "Key": src_key},
+        )
+        return dst_key
+
+    def open_writer(self, key: str, content_type=None, part_size: int = 16 * 1024 * 1024, resume_token=None):
+        return _S3MultipartWriter(self, key, content_type, part_size, resume_token)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        obj = self.client.get_object(Bucket=self.bucket_name, Key=key, Range=f"bytes={start}-{start + length - 1}")
+        return obj["Body"].read()
+
+    def open_reader(self, key: str):
+        return self.client.get_object(Bucket=self.bucket_name, Key=key)["Body"]
+
     def download_to_path(self, key: str, dst_path: str) -> None:
         self.client.download_file(self.bucket_name, key, dst_path)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, TIMESTAMP, Text, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -19,3 +19,9 @@ class WhatsAppMessage(Base):
     lead_id = Column(String, ForeignKey("leads.id"), nullable=True)
 
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_whatsapp_messages_from_created", "from_number", "created_at"),  # one conversation
+        # conversation list: latest incoming message per number
+        Index("ix_whatsapp_messages_direction_from", "direction", "from_number", "created_at"),
+    )
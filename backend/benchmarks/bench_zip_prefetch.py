@@ -0,0 +1,78 @@
+"""
+ZIP streaming benchmark: sequential reads vs bounded parallel prefetch.
+
+Runs stream_zip over an in-memory fake storage that injects a per-request
+latency and a bandwidth cap, so it needs no bucket or database.
+
+    cd backend
+    python -m benchmarks.bench_zip_prefetch --entries 200 --size-kb 800 --latency-ms 40
+"""
+from __future__ import annotations
+import argparse, io, os, threading, time, zipfile
+
+from app.gallery.utils.zip_stream import ZipEntry, stream_zip
+
+
+class LatencyStorage:
+    """Dict-backed storage; every read costs latency + size / bandwidth."""
+
+    def __init__(self, latency_ms: float, mbps: float):
+        self.latency = latency_ms / 1000.0
+        self.bytes_per_s = mbps * 1024 * 1024
+        self.objects: dict[str, bytes] = {}
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _wait(self, n: int) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency + n / self.bytes_per_s)
+        with self.lock:
+            self.in_flight -= 1
+
+    def read_bytes(self, key: str) -> bytes:
+        data = self.objects[key]
+        self._wait(len(data))
+        return data
+
+    def open_reader(self, key: str):
+        data = self.objects[key]
+        self._wait(len(data))
+        return io.BytesIO(data)
+
+
+def run(entries: int, size_kb: int, latency_ms: float, mbps: float, concurrency: int, buffer_mb: int) -> None:
+    store = LatencyStorage(latency_ms, mbps)
+    items = []
+    for i in range(entries):
+        key = f"1/downloads/web/photo-{i}.jpg"
+        store.objects[key] = os.urandom(size_kb * 1024)
+        items.append(ZipEntry(key, f"photo-{i}.jpg", size_kb * 1024))
+
+    results = {}
+    for label, k in (("sequential", 1), (f"prefetch k={concurrency}", concurrency)):
+        store.max_in_flight = 0
+        t0 = time.perf_counter()
+        out = b"".join(stream_zip(items, store=store, concurrency=k, buffer_bytes=buffer_mb * 1024 * 1024))
+        elapsed = time.perf_counter() - t0
+        names = [(i.filename, i.CRC) for i in zipfile.ZipFile(io.BytesIO(out)).infolist()]
+        results[label] = names
+        print(f"  {label:16s} {elapsed:7.2f}s  {len(out) / elapsed / 1024 / 1024:8.1f} MiB/s  max in flight {store.max_in_flight}")
+
+    a, b = results.values()
+    print(f"  same entries, same order: {a == b}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=200)
+    ap.add_argument("--size-kb", type=int, default=800)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--mbps", type=float, default=50.0, help="per-request bandwidth, MiB/s")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--buffer-mb", type=int, default=64)
+    a = ap.parse_args()
+    print(f"{a.entries} entries x {a.size_kb} KiB, {a.latency_ms:.0f} ms latency, {a.mbps:.0f} MiB/s per request")
+    run(a.entries, a.size_kb, a.latency_ms, a.mbps, a.concurrency, a.buffer_mb)
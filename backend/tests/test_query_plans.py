@@ -0,0 +1,106 @@
+"""
+Hot queries must be served by an index (app.services.query_plans).
+
+Needs a Postgres database to seed: QUERY_PLAN_TEST_DATABASE_URL, or
+SQLALCHEMY_DATABASE_URL when that points at Postgres. Everything is created
+in a scratch schema that is dropped afterwards. Skipped on SQLite, whose
+plans don't depend on table statistics and aren't comparable.
+
+    cd backend
+    QUERY_PLAN_TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_query_plans.py
+"""
+import os
+import pytest
+
+DATABASE_URL = os.getenv("QUERY_PLAN_TEST_DATABASE_URL") or os.getenv("SQLALCHEMY_DATABASE_URL") or ""
+if not DATABASE_URL.startswith("postgresql"):
+    pytest.skip("query plan checks need a Postgres database", allow_module_level=True)
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", DATABASE_URL)
+
+from sqlalchemy import create_engine, insert, text  #type: ignore
+from sqlalchemy.orm import Session  #type: ignore
+from app.database import Base
+from app.services import query_plans
+from app.leads.models.lead_model import Lead, LeadStage
+
+SCHEMA = "query_plan_test"
+
+# big enough that an index beats reading the table
+OWNERS = 200
+GALLERIES_PER_OWNER = 10
+PHOTOS_PER_GALLERY = 20
+MESSAGES = 20_000
+LEADS = 3_000
+
+
+@pytest.fixture(scope="module")
+def engine():
+    admin = create_engine(DATABASE_URL)
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    eng = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    try:
+        Base.metadata.create_all(eng)
+        _seed(eng)
+        yield eng
+    finally:
+        eng.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+def _seed(eng) -> None:
+    galleries = OWNERS * GALLERIES_PER_OWNER
+    photos = galleries * PHOTOS_PER_GALLERY
+    with eng.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) "
+            "SELECT i, 'user' || i, 'user' || i || '@example.com', 'x' FROM generate_series(1, :n) i"
+        ), {"n": OWNERS})
+        conn.execute(text(
+            "INSERT INTO galleries (id, owner_id, title, is_public, status, created_at) "
+            "SELECT i, 1 + i % :owners, 'gallery ' || i, i % 2 = 0, "
+            "CASE WHEN i % 10 = 0 THEN 'expired' ELSE 'active' END, "
+            "now() - i * interval '1 hour' FROM generate_series(1, :n) i"
+        ), {"n": galleries, "owners": OWNERS})
+        conn.execute(text(
+            "INSERT INTO photos (id, file_id, gallery_id, filename, ext, path_original, order_index) "
+            "SELECT i, md5(i::text), 1 + i % :galleries, 'p' || i || '.jpg', '.jpg', 'o/' || i, i / :galleries "
+            "FROM generate_series(1, :n) i"
+        ), {"n": photos, "galleries": galleries})
+        conn.execute(text(
+            "INSERT INTO photo_renditions (photo_id, kind, size, format, key) "
+            "SELECT p.id, k.kind, '', 'jpeg', k.kind || '/' || p.id "
+            "FROM photos p CROSS JOIN (VALUES ('thumb'), ('preview')) AS k(kind)"
+        ))
+        conn.execute(text(
+            "INSERT INTO favorites (gallery_id, photo_id, selector) "
+            "SELECT gallery_id, id, 'visitor' || (id % 50) FROM photos WHERE id % 3 = 0"
+        ))
+        conn.execute(text(
+            "INSERT INTO whatsapp_messages (from_number, to_number, direction, created_at) "
+            "SELECT '+1' || lpad((i % 500)::text, 10, '0'), '+19999999999', "
+            "CASE WHEN i % 2 = 0 THEN 'incoming' ELSE 'outgoing' END, now() - i * interval '1 minute' "
+            "FROM generate_series(1, :n) i"
+        ), {"n": MESSAGES})
+        stages = list(LeadStage)
+        conn.execute(insert(Lead), [
+            {"id": f"lead-{i}", "phone_number": f"+2{i:010d}", "stage": stages[i % len(stages)]}
+            for i in range(LEADS)
+        ])
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def test_every_hot_query_is_checked(engine):
+    with Session(engine) as db:
+        _, skipped = query_plans.check_plans(db)
+    assert skipped == []
+
+
+def test_hot_queries_use_indexes(engine):
+    with Session(engine) as db:
+        problems, _ = query_plans.check_plans(db)
+    assert problems == [], "sequential scans:\n" + "\n".join(problems)